@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Packages shared by the projects in this repository (request_instrumentation)
+REPO_DIR = BASE_DIR.parent.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -41,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'request_instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +88,15 @@ DATABASES = {
     }
 }
 
+# Per-request query/template/latency instrumentation (the shared
+# request_instrumentation package). Queries repeated this many times in one
+# request are reported as duplicates; set the token to let a Prometheus
+# scraper read /metrics without a staff login.
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_BUFFER_SIZE = 1000
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 3
+INSTRUMENTATION_METRICS_TOKEN = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
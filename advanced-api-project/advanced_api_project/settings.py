@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Packages shared by the projects in this repository (request_instrumentation)
+REPO_DIR = BASE_DIR.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -43,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'request_instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +94,15 @@ DATABASES = {
     }
 }
 
+# Per-request query/template/latency instrumentation (the shared
+# request_instrumentation package). Queries repeated this many times in one
+# request are reported as duplicates; set the token to let a Prometheus
+# scraper read /metrics without a staff login.
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_BUFFER_SIZE = 1000
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 3
+INSTRUMENTATION_METRICS_TOKEN = None
+
 # Test database configuration
 TEST_RUNNER = 'django.test.runner.DiscoverRunner'
 TEST_DATABASE_NAME = BASE_DIR / 'test_db.sqlite3'
@@ -19,5 +19,6 @@ from django.urls import path, include
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('', include('request_instrumentation.urls')),
     path('api/', include('api.urls')),
 ]
@@ -21,6 +21,7 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('', include('request_instrumentation.urls')),
     path('', include('relationship_app.urls')),
     path('bookshelf/', include('bookshelf.urls')),
 ]
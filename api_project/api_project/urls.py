@@ -20,6 +20,7 @@ from rest_framework.authtoken.views import obtain_auth_token
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('', include('request_instrumentation.urls')),
     path('api/', include('api.urls')),  # Include API endpoints
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),  # Token authentication endpoint
 ]
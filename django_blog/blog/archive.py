@@ -0,0 +1,355 @@
+"""
+Bulk import and export of posts and comments.
+
+Records are streamed as NDJSON (one JSON object per line) or CSV with the
+columns in ``FIELDS``. Exports read with ``iterator(chunk_size=...)`` and
+fetch tags once per chunk; imports never hold more than one batch:
+
+* each batch is written with one executemany INSERT per table in its own
+  transaction (``insert_rows``; ``bulk_create`` for rows without an id);
+* authors are matched by username and tags by name with one query per
+  batch for names not seen before (missing tags are created in bulk);
+* records keep their ``id`` so post URLs survive a migration and comments
+  can refer to their post and parent comment (their thread paths are
+  computed on the way in). Ids that already exist are skipped, which makes
+  an interrupted import safe to run again.
+
+Bulk inserts send no signals, so the search index, tag counts, comment
+and reply counts and related posts are rebuilt once at the end (see the
+``blog_import`` command).
+"""
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import connection, connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from taggit.models import Tag
+from taggit.utils import edit_string_for_tags, parse_tags
+
+from .models import COMMENT_PATH_WIDTH, Comment, Post, comment_path_segment
+from .rendering import render_excerpt, render_html
+from .search import tags_by_post
+from .threads import assign_paths
+
+FIELDS = {
+    'posts': ['id', 'title', 'content', 'author', 'published_date', 'updated_at', 'tags'],
+    'comments': ['id', 'post', 'parent', 'author', 'content', 'created_at', 'updated_at'],
+}
+
+POST_COLUMNS = [
+    'id', 'title', 'content', 'content_html', 'excerpt', 'author', 'published_date', 'updated_at',
+    'comment_count', 'comment_activity_at', 'view_count',
+]
+COMMENT_COLUMNS = [
+    'id', 'post', 'author', 'content', 'content_html', 'excerpt', 'created_at', 'updated_at',
+    'parent', 'path', 'depth', 'reply_count',
+]
+
+# Post bodies easily exceed csv's default 128KB field limit
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def _batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _timestamp(value, default):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is None:
+        return default
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def insert_rows(model, names, rows):
+    """
+    INSERT tuples of ``names`` values with one executemany call.
+
+    For large imports building a model instance per row costs several times
+    more than the INSERT itself, so rows go straight to the cursor.
+    """
+    if not rows:
+        return
+    fields = [model._meta.get_field(name) for name in names]
+    # Resolve the connection once instead of through the proxy per value
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+            for row in rows
+        ])
+
+
+@contextmanager
+def keep_timestamps(*models):
+    """Let ``bulk_create`` store the given created/updated times as they are"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+# Export
+
+def export_posts(chunk_size=2000):
+    """Yield one record per post in pk order"""
+    rows = Post.objects.order_by('pk').values_list(
+        'pk', 'title', 'content', 'author__username', 'published_date', 'updated_at',
+    ).iterator(chunk_size=chunk_size)
+    for chunk in _batches(rows, chunk_size):
+        tags = tags_by_post([row[0] for row in chunk])
+        for pk, title, content, author, published, updated in chunk:
+            yield {
+                'id': pk,
+                'title': title,
+                'content': content,
+                'author': author,
+                'published_date': published.isoformat(),
+                'updated_at': updated.isoformat(),
+                'tags': sorted(tags.get(pk, [])),
+            }
+
+
+def export_comments(chunk_size=2000):
+    """Yield one record per comment in pk order"""
+    rows = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'parent_id', 'author__username', 'content', 'created_at', 'updated_at',
+    ).iterator(chunk_size=chunk_size)
+    for pk, post_id, parent_id, author, content, created, updated in rows:
+        yield {
+            'id': pk,
+            'post': post_id,
+            'parent': parent_id,
+            'author': author,
+            'content': content,
+            'created_at': created.isoformat(),
+            'updated_at': updated.isoformat(),
+        }
+
+
+def write_records(stream, fmt, kind, records):
+    """Write ``records`` to the text ``stream``; return the number written"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, FIELDS[kind])
+        writer.writeheader()
+        for record in records:
+            if 'tags' in record:
+                record['tags'] = edit_string_for_tags([Tag(name=name) for name in record['tags']])
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            stream.write(json.dumps(record, ensure_ascii=False))
+            stream.write('\n')
+            count += 1
+    return count
+
+
+# Import
+
+def read_records(stream, fmt):
+    """Yield record dicts from an NDJSON or CSV text stream"""
+    if fmt == 'csv':
+        for record in csv.DictReader(stream):
+            record['tags'] = parse_tags(record.get('tags') or '')
+            yield record
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Importer:
+    """Writes post and comment records in batches and counts the outcome"""
+
+    def __init__(self, batch_size=2000, create_authors=False):
+        self.batch_size = batch_size
+        self.create_authors = create_authors
+        self.created = 0
+        self.skipped = 0
+        self._authors = {}
+        self._tags = {}
+
+    def import_posts(self, records):
+        """Import post records, yielding after each batch"""
+        with keep_timestamps(Post):
+            for batch in _batches(records, self.batch_size):
+                with transaction.atomic():
+                    self._post_batch(batch)
+                yield
+        self._reset_sequences(Post)
+
+    def import_comments(self, records):
+        """Import comment records, yielding after each batch"""
+        with keep_timestamps(Comment):
+            for batch in _batches(records, self.batch_size):
+                with transaction.atomic():
+                    self._comment_batch(batch)
+                yield
+        self._reset_sequences(Comment)
+
+    def _post_batch(self, batch):
+        now = timezone.now()
+        batch = self._new_records(Post, batch)
+        authors = self._author_ids(record['author'] for record in batch)
+        rows, new_posts, tags, new_tags = [], [], [], []
+        for record in batch:
+            author_id = authors.get(record['author'])
+            if author_id is None:
+                self.skipped += 1
+                continue
+            published = _timestamp(record.get('published_date'), now)
+            updated = _timestamp(record.get('updated_at'), published)
+            names = set(record.get('tags') or ())
+            html = render_html(record['content'])
+            excerpt = render_excerpt(record['content'], html)
+            if record.get('id'):
+                pk = int(record['id'])
+                rows.append((
+                    pk, record['title'], record['content'], html, excerpt, author_id, published, updated, 0, None, 0,
+                ))
+                tags.append((pk, names))
+            else:
+                new_posts.append(Post(
+                    title=record['title'], content=record['content'], content_html=html, excerpt=excerpt,
+                    author_id=author_id, published_date=published, updated_at=updated,
+                ))
+                new_tags.append(names)
+        insert_rows(Post, POST_COLUMNS, rows)
+        # Posts without an id need bulk_create to learn the ids assigned to them
+        Post.objects.bulk_create(new_posts)
+        tags += [(post.pk, names) for post, names in zip(new_posts, new_tags)]
+        self.created += len(rows) + len(new_posts)
+
+        tag_ids = self._tag_ids(name for _, names in tags for name in names)
+        content_type_id = ContentType.objects.get_for_model(Post).pk
+        insert_rows(Post.tags.through, ['content_type', 'object_id', 'tag'], [
+            (content_type_id, pk, tag_ids[name]) for pk, names in tags for name in names
+        ])
+
+    def _comment_batch(self, batch):
+        now = timezone.now()
+        batch = self._new_records(Comment, batch)
+        authors = self._author_ids(record['author'] for record in batch)
+        post_ids = {int(record['post']) for record in batch}
+        existing = set(Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True))
+        # Parents come before their replies in an export; earlier batches are in the table
+        parent_ids = {int(record['parent']) for record in batch if record.get('parent')}
+        parents = {
+            pk: (post_id, path)
+            for pk, post_id, path in Comment.objects.filter(pk__in=parent_ids).values_list('pk', 'post_id', 'path')
+        }
+        rows, new_comments = [], []
+        for record in batch:
+            author_id = authors.get(record['author'])
+            post_id = int(record['post'])
+            if author_id is None or post_id not in existing:
+                self.skipped += 1
+                continue
+            parent_id = int(record['parent']) if record.get('parent') else None
+            if parents.get(parent_id, (None,))[0] != post_id:
+                # Replies whose parent did not make it are kept as roots
+                parent_id = None
+            created = _timestamp(record.get('created_at'), now)
+            updated = _timestamp(record.get('updated_at'), created)
+            html = render_html(record['content'])
+            excerpt = render_excerpt(record['content'], html)
+            if record.get('id'):
+                pk = int(record['id'])
+                parent_path = parents[parent_id][1] if parent_id else ''
+                path = parent_path + comment_path_segment(pk)
+                parents[pk] = (post_id, path)
+                rows.append((
+                    pk, post_id, author_id, record['content'], html, excerpt, created, updated,
+                    parent_id, path, len(parent_path) // COMMENT_PATH_WIDTH, 0,
+                ))
+            else:
+                new_comments.append(Comment(
+                    post_id=post_id, author_id=author_id, content=record['content'], content_html=html,
+                    excerpt=excerpt, created_at=created, updated_at=updated, parent_id=parent_id,
+                ))
+        insert_rows(Comment, COMMENT_COLUMNS, rows)
+        # Comments without an id need bulk_create to learn the ids their paths end with
+        if new_comments:
+            assign_paths(Comment.objects.bulk_create(new_comments))
+        self.created += len(rows) + len(new_comments)
+
+    def _new_records(self, model, batch):
+        """Drop records whose id is already taken"""
+        ids = {int(record['id']) for record in batch if record.get('id')}
+        if not ids:
+            return batch
+        taken = set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if not taken:
+            return batch
+        self.skipped += sum(1 for record in batch if record.get('id') and int(record['id']) in taken)
+        return [record for record in batch if not record.get('id') or int(record['id']) not in taken]
+
+    def _author_ids(self, usernames):
+        missing = set(usernames) - self._authors.keys()
+        if missing:
+            found = dict(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+            if self.create_authors and len(found) < len(missing):
+                password = make_password(None)
+                User.objects.bulk_create(
+                    [User(username=name, password=password) for name in missing - found.keys()],
+                    ignore_conflicts=True,
+                )
+                found = dict(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+            self._authors.update(found)
+        return self._authors
+
+    def _tag_ids(self, names):
+        missing = set(names) - self._tags.keys()
+        if missing:
+            self._tags.update(Tag.objects.filter(name__in=missing).values_list('name', 'pk'))
+            new = missing - self._tags.keys()
+            if new:
+                Tag.objects.bulk_create(
+                    [Tag(name=name, slug=Tag().slugify(name)) for name in new], ignore_conflicts=True,
+                )
+                self._tags.update(Tag.objects.filter(name__in=new).values_list('name', 'pk'))
+                # Names whose slug collided with another tag get a numbered slug
+                for name in new - self._tags.keys():
+                    self._tags[name] = Tag.objects.create(name=name).pk
+        return self._tags
+
+    def _reset_sequences(self, model):
+        # Explicit ids do not advance PostgreSQL sequences (SQLite needs nothing)
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
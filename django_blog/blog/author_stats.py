@@ -0,0 +1,65 @@
+"""
+Per-author post and comment totals.
+
+``AuthorStats`` holds one row per author with their number of posts and
+comments and the time they last wrote one, adjusted incrementally by the
+Post and Comment signals (see ``blog.signals``) and by the comment queue,
+so the profile page reads one row instead of counting the author's posts
+and comments on every view. Bulk imports bypass the signals and call
+``rebuild`` (``python manage.py rebuild_author_stats``) afterwards.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .models import AuthorStats, Comment, Post
+
+
+def adjust(user_id, posts=0, comments=0, active=True):
+    """
+    Add ``posts`` and ``comments`` to the author's totals; with ``active``
+    also record now as their latest activity.
+    """
+    changes = {}
+    if posts:
+        changes['post_count'] = F('post_count') + posts
+    if comments:
+        changes['comment_count'] = F('comment_count') + comments
+    if active:
+        changes['last_activity_at'] = timezone.now()
+    if not changes:
+        return
+    if posts > 0 or comments > 0 or active:
+        AuthorStats.objects.bulk_create([AuthorStats(user_id=user_id)], ignore_conflicts=True)
+    # Removals only touch an existing row: the author may be being deleted
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    # Counts never go negative, even if a signal was missed
+    if posts < 0:
+        stats = stats.filter(post_count__gte=-posts)
+    if comments < 0:
+        stats = stats.filter(comment_count__gte=-comments)
+    stats.update(**changes)
+
+
+def for_user(user):
+    """The author's stats row, or an unsaved empty one if they never wrote anything"""
+    try:
+        return AuthorStats.objects.get(user=user)
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def rebuild(batch_size=1000):
+    """Recompute every AuthorStats row from the Post and Comment tables"""
+    totals = {}
+    for model, field in ((Post, 'post_count'), (Comment, 'comment_count')):
+        rows = model.objects.order_by().values('author_id').annotate(total=Count('pk'), latest=Max('updated_at'))
+        for row in rows:
+            stats = totals.setdefault(row['author_id'], AuthorStats(user_id=row['author_id']))
+            setattr(stats, field, row['total'])
+            if stats.last_activity_at is None or row['latest'] > stats.last_activity_at:
+                stats.last_activity_at = row['latest']
+    with transaction.atomic():
+        AuthorStats.objects.all().delete()
+        AuthorStats.objects.bulk_create(totals.values(), batch_size=batch_size)
+    return len(totals)
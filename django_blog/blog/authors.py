@@ -0,0 +1,52 @@
+"""
+Read-through cache of author display fields.
+
+Templates that only need an author's name can resolve it from the cache
+instead of loading the User row. Entries expire after
+``BLOG_AUTHOR_CACHE_TIMEOUT`` seconds and are dropped immediately when the
+user is saved or deleted (see ``blog.signals``).
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .routing import primary_reads
+
+
+def _key(user_id):
+    return f'blog-author:{user_id}'
+
+
+def _timeout():
+    return getattr(settings, 'BLOG_AUTHOR_CACHE_TIMEOUT', 5 * 60)
+
+
+def _fields(user):
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def get_authors(user_ids):
+    """Return {user_id: fields} for ``user_ids``, loading misses in one query"""
+    user_ids = set(user_ids)
+    found = cache.get_many([_key(user_id) for user_id in user_ids])
+    authors = {fields['id']: fields for fields in found.values()}
+    missing = user_ids - authors.keys()
+    if missing:
+        with primary_reads():
+            loaded = {user.pk: _fields(user) for user in User.objects.filter(pk__in=missing)}
+        cache.set_many({_key(user_id): fields for user_id, fields in loaded.items()}, _timeout())
+        authors.update(loaded)
+    return authors
+
+
+def get_author(user_id):
+    """Return the display fields for one user, or None if it does not exist"""
+    return get_authors([user_id]).get(user_id)
+
+
+def invalidate(user_id):
+    cache.delete(_key(user_id))
@@ -0,0 +1,188 @@
+"""
+Search box suggestions from an in-memory prefix index.
+
+``PrefixIndex`` keeps one sorted list of strings per kind (post titles,
+tag names). Each entry is ``"<folded label>\\0<label>\\0<id>"``, so a
+lookup is a ``bisect`` to the first entry at or after the folded prefix
+followed by a scan of at most ``limit`` matches: O(log n + limit) with no
+per-lookup allocation beyond the results, well under a millisecond at a
+million titles (``python manage.py bench_autocomplete``). Labels are
+folded with NFKC, ``casefold()`` and collapsed whitespace, so matching is
+case-insensitive and prefixes match from the start of the title.
+
+The index is loaded once per process, when the WSGI/ASGI application
+starts (``warm()``) or at the latest on the first lookup, and then kept up
+to date by the Post and Tag signals in ``blog.signals`` after each commit.
+Changes made by other processes are picked up by rebuilding in the
+background every ``BLOG_AUTOCOMPLETE_REFRESH`` seconds; lookups keep
+using the previous index until the new one is ready.
+"""
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import close_old_connections
+from taggit.models import Tag
+
+from .models import Post
+from .routing import primary_reads
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = '\0'
+
+
+def _limit():
+    return getattr(settings, 'BLOG_AUTOCOMPLETE_LIMIT', 8)
+
+
+def _refresh_interval():
+    return getattr(settings, 'BLOG_AUTOCOMPLETE_REFRESH', 5 * 60)
+
+
+def fold(text):
+    """Normalize ``text`` for prefix matching"""
+    text = unicodedata.normalize('NFKC', text).replace(SEPARATOR, ' ')
+    return ' '.join(text.casefold().split())
+
+
+class PrefixIndex:
+    """Sorted list of (folded label, label, id) entries supporting prefix lookups"""
+
+    def __init__(self, items=()):
+        self._entries = {ident: self._entry(ident, label) for ident, label in items}
+        self._keys = sorted(self._entries.values())
+
+    @staticmethod
+    def _entry(ident, label):
+        return f'{fold(label)}{SEPARATOR}{label}{SEPARATOR}{ident}'
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, ident, label):
+        """Insert or replace the entry for ``ident``"""
+        entry = self._entry(ident, label)
+        if self._entries.get(ident) == entry:
+            return
+        self.remove(ident)
+        self._entries[ident] = entry
+        insort(self._keys, entry)
+
+    def remove(self, ident):
+        entry = self._entries.pop(ident, None)
+        if entry is None:
+            return
+        i = bisect_left(self._keys, entry)
+        if i < len(self._keys) and self._keys[i] == entry:
+            del self._keys[i]
+
+    def search(self, prefix, limit):
+        """Return up to ``limit`` (id, label) pairs whose folded label starts with ``prefix``"""
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+        keys = self._keys
+        start = bisect_left(keys, prefix)
+        results = []
+        for i in range(start, min(len(keys), start + limit)):
+            if not keys[i].startswith(prefix):
+                break
+            _, label, ident = keys[i].split(SEPARATOR)
+            results.append((int(ident), label))
+        return results
+
+
+class Autocomplete:
+    """The process-wide title and tag indexes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._posts = None
+        self._tags = None
+        self._built_at = 0.0
+        self._refreshing = False
+
+    @staticmethod
+    def _load():
+        # Kept for the life of the process, so read the primary
+        with primary_reads():
+            posts = PrefixIndex(Post.objects.values_list('pk', 'title').iterator(chunk_size=10000))
+            tags = PrefixIndex(Tag.objects.values_list('pk', 'name').iterator(chunk_size=10000))
+        return posts, tags
+
+    def build(self):
+        posts, tags = self._load()
+        with self._lock:
+            self._posts, self._tags = posts, tags
+            self._built_at = time.monotonic()
+            self._refreshing = False
+
+    def _refresh(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Rebuilding the autocomplete index failed')
+            with self._lock:
+                self._refreshing = False
+        finally:
+            close_old_connections()
+
+    def _ensure_built(self):
+        if self._posts is None:
+            with self._build_lock:
+                if self._posts is None:
+                    self.build()
+            return
+        interval = _refresh_interval()
+        with self._lock:
+            if not interval or self._refreshing or time.monotonic() - self._built_at < interval:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name='blog-autocomplete-refresh', daemon=True).start()
+
+    def suggest(self, prefix, limit=None):
+        """Return ``{'tags': [(id, name)], 'posts': [(id, title)]}`` for ``prefix``"""
+        limit = limit or _limit()
+        self._ensure_built()
+        with self._lock:
+            return {
+                'tags': self._tags.search(prefix, limit),
+                'posts': self._posts.search(prefix, limit),
+            }
+
+    def _update(self, kind, method, *args):
+        with self._lock:
+            index = getattr(self, kind)
+            # Not loaded yet: the first build reads the change from the database
+            if index is not None:
+                getattr(index, method)(*args)
+
+    def add_post(self, pk, title):
+        self._update('_posts', 'add', pk, title)
+
+    def remove_post(self, pk):
+        self._update('_posts', 'remove', pk)
+
+    def add_tag(self, pk, name):
+        self._update('_tags', 'add', pk, name)
+
+    def remove_tag(self, pk):
+        self._update('_tags', 'remove', pk)
+
+    def reset(self):
+        with self._lock:
+            self._posts = self._tags = None
+
+
+autocomplete = Autocomplete()
+
+
+def warm():
+    """Load the index in a background thread so the first suggestion is fast"""
+    if getattr(settings, 'BLOG_AUTOCOMPLETE_WARM', True):
+        threading.Thread(target=autocomplete._refresh, name='blog-autocomplete-warm', daemon=True).start()
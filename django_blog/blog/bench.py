@@ -0,0 +1,97 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks generate synthetic data inside a transaction that is always
+rolled back, so they can be pointed at a development database without
+leaving anything behind.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from taggit.models import Tag
+
+from .models import Post
+from .rendering import render_fields
+
+WORDS = (
+    'django python web blog search index query cache model view template '
+    'form tag comment author post database sqlite postgres feed page user '
+    'server request response session static deploy test debug admin field '
+    'signal migration router worker queue thread stream json html markdown'
+).split()
+
+
+class Rollback(Exception):
+    """Raised to unwind the benchmark transaction"""
+
+
+@contextmanager
+def rollback():
+    """Run the block inside a transaction that is always rolled back"""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def timed(func, repeat=5):
+    """Call ``func`` ``repeat`` times and return the median duration in ms"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def bench_user(username='bench-user'):
+    user, _ = User.objects.get_or_create(username=username)
+    return user
+
+
+def make_posts(count, author=None, batch_size=5000, seed=0):
+    """Bulk insert ``count`` synthetic posts and return their pks"""
+    rng = random.Random(seed)
+    author = author or bench_user()
+    pks = []
+    for start in range(0, count, batch_size):
+        batch = [
+            render_fields(Post(
+                title=sentence(rng, 6).capitalize(),
+                content=sentence(rng, 80),
+                author=author,
+            ))
+            for _ in range(min(batch_size, count - start))
+        ]
+        pks.extend(post.pk for post in Post.objects.bulk_create(batch))
+    return pks
+
+
+def tag_posts(post_ids, tags_per_post=3, vocabulary=WORDS, batch_size=10000, seed=0):
+    """Attach ``tags_per_post`` random tags from ``vocabulary`` to each post"""
+    rng = random.Random(seed)
+    existing = {tag.name: tag for tag in Tag.objects.filter(name__in=vocabulary)}
+    missing = [Tag(name=name, slug=name) for name in vocabulary if name not in existing]
+    Tag.objects.bulk_create(missing, ignore_conflicts=True)
+    tag_ids = list(Tag.objects.filter(name__in=vocabulary).values_list('pk', flat=True))
+    through = Post.tags.through
+    content_type = ContentType.objects.get_for_model(Post)
+    rows = []
+    for post_id in post_ids:
+        for tag_id in rng.sample(tag_ids, min(tags_per_post, len(tag_ids))):
+            rows.append(through(content_type=content_type, object_id=post_id, tag_id=tag_id))
+        if len(rows) >= batch_size:
+            through.objects.bulk_create(rows)
+            rows = []
+    through.objects.bulk_create(rows)
@@ -0,0 +1,210 @@
+"""
+Fragment cache for rendered post markup.
+
+Fragments are stored under a key built from the fragment name, the post pk
+and the post's current version stamp. Changing a post only replaces its
+stamp (see ``blog.signals``), so stale fragments are never read again and
+simply expire. A global generation stamp invalidates every fragment at once,
+e.g. when an author renames their account.
+
+Listing fragments and whole pages (``blog.page_cache``) depend on many
+posts, so they are keyed on the listing stamp instead and rebuilt through
+``get_or_build``: one entry per key that remembers the stamp it was built
+for. When it goes stale a single caller takes a short lock and rebuilds it
+while the others keep serving the previous copy, so a post save does not
+send every concurrent request to the database at once.
+
+The cache alias is taken from ``BLOG_FRAGMENT_CACHE`` (default: the
+local-memory ``default`` cache); point it at a Redis or Memcached alias to
+share fragments between processes.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .routing import may_be_stale
+
+GENERATION_KEY = 'blog-frag-generation'
+LISTING_KEY = 'blog-listing-stamp'
+
+# Seconds a rebuild lock is held at most, and how long a caller with no
+# copy to fall back on waits for another caller's rebuild
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 0.5
+
+
+def new_stamp():
+    # Time-based stamps cannot collide with an older stamp even if the
+    # stamp key itself was evicted and has to be recreated.
+    return time.time_ns()
+
+
+def _create_stamp(cache, key):
+    """Store a new stamp under ``key`` unless another process got there first"""
+    stamp = new_stamp()
+    if not cache.add(key, stamp, None):
+        # Fall back to our own stamp if the winner was evicted already
+        stamp = cache.get(key, stamp)
+    return stamp
+
+
+class FragmentCache:
+    """Versioned fragment cache with per-fragment hit/miss counters"""
+
+    def __init__(self, alias=None, timeout=None):
+        self._alias = alias
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    @property
+    def cache(self):
+        return caches[self._alias or getattr(settings, 'BLOG_FRAGMENT_CACHE', 'default')]
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 60 * 60)
+
+    def version_key(self, pk):
+        return f'blog-frag-version:{pk}'
+
+    def _stamps(self, pk):
+        """Return (post stamp, generation stamp), creating missing ones"""
+        keys = [self.version_key(pk), GENERATION_KEY]
+        found = self.cache.get_many(keys)
+        stamps = []
+        for key in keys:
+            if key not in found:
+                found[key] = _create_stamp(self.cache, key)
+            stamps.append(found[key])
+        return stamps
+
+    def key(self, name, pk, vary=()):
+        return self._key(name, pk, self._stamps(pk), vary)
+
+    def _key(self, name, pk, stamps, vary):
+        parts = [name, str(pk), *map(str, stamps), *map(str, vary)]
+        return 'blog-frag:' + ':'.join(parts)
+
+    def get_or_render(self, name, pk, render, vary=()):
+        """Return the cached fragment or call ``render()`` and store the result"""
+        stamps = self._stamps(pk)
+        key = self._key(name, pk, stamps, vary)
+        value = self.cache.get(key)
+        self._record(name, value is not None)
+        if value is None:
+            value = render()
+            # Markup rendered from a lagging replica must not outlive the change
+            if not may_be_stale(*stamps):
+                self.cache.set(key, value, self.timeout)
+        return value
+
+    def get_or_build(self, name, key, stamp, build, timeout=None):
+        """``get_or_build`` on this cache, counted under ``name`` in the stats"""
+        return get_or_build(
+            self.cache, key, stamp, build, timeout or self.timeout,
+            record=lambda hit: self._record(name, hit),
+        )
+
+    def get_or_render_listing(self, name, render):
+        """Return a fragment cached until the listing stamp changes"""
+        return self.get_or_build(name, f'blog-frag:listing:{name}', listing_stamp(), render)
+
+    def generation(self):
+        """Current global generation stamp, replaced by ``invalidate_all()``"""
+        stamp = self.cache.get(GENERATION_KEY)
+        if stamp is None:
+            stamp = _create_stamp(self.cache, GENERATION_KEY)
+        return stamp
+
+    def invalidate(self, pk):
+        self.cache.set(self.version_key(pk), new_stamp(), None)
+
+    def invalidate_all(self):
+        self.cache.set(GENERATION_KEY, new_stamp(), None)
+
+    def _record(self, name, hit):
+        with self._lock:
+            self._stats[name]['hits' if hit else 'misses'] += 1
+
+    def stats(self):
+        """Hit/miss counters for this process, per fragment name and in total"""
+        with self._lock:
+            fragments = {name: dict(counts) for name, counts in self._stats.items()}
+        hits = sum(counts['hits'] for counts in fragments.values())
+        misses = sum(counts['misses'] for counts in fragments.values())
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0,
+            'fragments': fragments,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+def listing_stamp():
+    """
+    Stamp (nanoseconds since the epoch) of the last change that can affect
+    a post listing page. Used for conditional GET on list pages.
+    """
+    stamp = fragment_cache.cache.get(LISTING_KEY)
+    if stamp is None:
+        stamp = _create_stamp(fragment_cache.cache, LISTING_KEY)
+    return stamp
+
+
+def listing_modified():
+    """The listing stamp as an aware datetime"""
+    return datetime.fromtimestamp(listing_stamp() / 1e9, tz=timezone.utc)
+
+
+def bump_listing_stamp():
+    fragment_cache.cache.set(LISTING_KEY, new_stamp(), None)
+
+
+def get_or_build(cache, key, stamp, build, timeout, record=None):
+    """
+    Return the value cached under ``key`` for ``stamp``, calling ``build()``
+    on a miss. Only the caller holding the rebuild lock builds; the others
+    get the previous value or, without one, wait up to ``LOCK_WAIT`` for the
+    new one. ``build()`` may return None for results that must not be cached.
+    """
+    entry = cache.get(key)
+    if entry is not None and entry[0] == stamp:
+        if record:
+            record(True)
+        return entry[1]
+    if record:
+        record(False)
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            value = build()
+            # A replica may not have the change behind a fresh stamp yet
+            if value is not None and not may_be_stale(stamp):
+                cache.set(key, (stamp, value), timeout)
+            return value
+        finally:
+            cache.delete(lock)
+    if entry is not None:
+        return entry[1]
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+    return build()
@@ -0,0 +1,201 @@
+"""
+Asynchronous comment ingestion.
+
+Under comment bursts every synchronous ``Comment.save()`` holds the SQLite
+write lock for its own transaction and request threads queue up behind
+each other. ``CommentQueue`` instead accepts comments into a bounded
+in-process queue and a single writer thread inserts them in batches with
+``bulk_create``, storing their thread paths (``blog.threads``) and applying
+the ``comment_count`` / ``comment_activity_at``, reply count and author
+stats updates the post_save signals would have made (one UPDATE per post,
+parent and author per batch) in the same transaction. Once a batch
+commits it feeds the trending ranking, invalidates the cached fragments of
+the posts it commented on and bumps the listing stamp.
+
+There is exactly one writer and the queue is FIFO, so comments on a post
+are inserted, and therefore ordered, in the order they were accepted.
+When the queue is full ``submit()`` refuses the comment instead of
+blocking the request; callers answer 503 so clients retry later.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import author_stats, threads
+from .caching import bump_listing_stamp, fragment_cache
+from .models import Comment, Post
+from .rendering import render_fields
+from .trending import trending
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class CommentQueue:
+    """Bounded queue of pending comments drained by one background writer"""
+
+    def __init__(self, maxsize=None, batch_size=None, flush_interval=None, worker=True):
+        self.maxsize = maxsize or getattr(settings, 'BLOG_COMMENT_QUEUE_SIZE', 1000)
+        self.batch_size = batch_size or getattr(settings, 'BLOG_COMMENT_BATCH_SIZE', 100)
+        if flush_interval is None:
+            flush_interval = getattr(settings, 'BLOG_COMMENT_FLUSH_INTERVAL', 0.05)
+        self.flush_interval = flush_interval
+        self.worker = worker
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(self.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def submit(self, post_id, author_id, content, parent_id=None):
+        """Queue a comment for writing; return False if the queue is full"""
+        # bulk_create() skips Comment.save(), so render here, in the request
+        # thread, rather than in the single writer
+        comment = render_fields(Comment(post_id=post_id, author_id=author_id, content=content, parent_id=parent_id))
+        try:
+            self._queue.put_nowait(comment)
+        except queue.Full:
+            return False
+        if self.worker:
+            self.start()
+        return True
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='blog-comment-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        """Write everything queued so far and stop the writer thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning('Comment queue still full at shutdown; %d comments not written', self.pending)
+            return
+        thread.join(timeout)
+
+    def join(self):
+        """Block until every queued comment has been processed"""
+        self._queue.join()
+
+    def drain(self):
+        """Write all queued comments in the calling thread"""
+        while True:
+            items = self._collect(block=False)
+            if not items:
+                return
+            self._process(items)
+
+    def _run(self):
+        try:
+            while True:
+                items = self._collect()
+                close_old_connections()
+                if self._process(items):
+                    return
+        finally:
+            connection.close()
+
+    def _collect(self, block=True):
+        """Take up to ``batch_size`` items, waiting ``flush_interval`` at most after the first"""
+        try:
+            items = [self._queue.get(block=block)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size and items[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    items.append(self._queue.get(timeout=remaining))
+                else:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _process(self, items):
+        """Write one batch; return True if it contained the stop marker"""
+        comments = [item for item in items if item is not _STOP]
+        try:
+            if comments:
+                self.write(comments)
+        except Exception:
+            self.dropped += len(comments)
+            logger.exception('Failed to write %d queued comments', len(comments))
+        finally:
+            for _ in items:
+                self._queue.task_done()
+        return len(comments) != len(items)
+
+    def write(self, comments):
+        """Insert ``comments`` and apply their counter updates in one transaction"""
+        try:
+            self._insert(comments)
+        except IntegrityError:
+            # A post or author was deleted while its comment was queued
+            kept = self._existing(comments)
+            self.dropped += len(comments) - len(kept)
+            if kept:
+                self._insert(kept)
+
+    def _insert(self, comments):
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            threads.assign_paths(comments)
+            now = timezone.now()
+            for post_id, count in Counter(comment.post_id for comment in comments).items():
+                Post.objects.filter(pk=post_id).update(
+                    comment_count=F('comment_count') + count, comment_activity_at=now,
+                )
+            for author_id, count in Counter(comment.author_id for comment in comments).items():
+                author_stats.adjust(author_id, comments=count)
+            for parent_id, count in Counter(comment.parent_id for comment in comments if comment.parent_id).items():
+                Comment.objects.filter(pk=parent_id).update(reply_count=F('reply_count') + count)
+            events = [(comment.post_id, comment.created_at) for comment in comments]
+            transaction.on_commit(lambda: trending.add_comments(events))
+            post_ids = {comment.post_id for comment in comments}
+            transaction.on_commit(lambda: _invalidate(post_ids))
+        self.written += len(comments)
+
+    def _existing(self, comments):
+        post_ids = set(Post.objects.filter(pk__in={c.post_id for c in comments}).values_list('pk', flat=True))
+        author_ids = set(User.objects.filter(pk__in={c.author_id for c in comments}).values_list('pk', flat=True))
+        parent_ids = set(Comment.objects.filter(pk__in={c.parent_id for c in comments}).values_list('pk', flat=True))
+        return [
+            Comment(
+                post_id=c.post_id, author_id=c.author_id, content=c.content, parent_id=c.parent_id,
+                content_html=c.content_html, excerpt=c.excerpt,
+            )
+            for c in comments
+            if c.post_id in post_ids and c.author_id in author_ids and (c.parent_id is None or c.parent_id in parent_ids)
+        ]
+
+
+def _invalidate(post_ids):
+    """Drop cached markup for the posts a committed batch commented on"""
+    for post_id in post_ids:
+        fragment_cache.invalidate(post_id)
+    bump_listing_stamp()
+
+
+comment_queue = CommentQueue()
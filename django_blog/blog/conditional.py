@@ -0,0 +1,85 @@
+"""
+Conditional GET (ETag / Last-Modified) for blog pages.
+
+Post detail pages are stamped from ``Post.updated_at`` and
+``Post.comment_activity_at`` with one single-row query, plus the fragment
+cache generation so author renames show up and the listing stamp because
+the related posts panel shows other posts. Listing pages use
+the listing stamp from ``blog.caching``, which signals replace whenever a
+post, its tags or an author name changes, so a 304 needs no query at all.
+
+ETags also include the current user and the full URL because the pages
+show user-specific controls and differ per cursor/query string. Requests
+with pending flash messages are never answered with 304, otherwise the
+message would be lost. Pages read from a replica right after a change get
+no validators, since they may not show the change yet.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.views.decorators.http import condition
+
+from .caching import fragment_cache, listing_modified, listing_stamp
+from .models import Post
+from .routing import may_be_stale
+
+
+def has_pending_messages(request):
+    return len(messages.get_messages(request)) > 0
+
+
+def _etag(request, stamp):
+    user_pk = request.user.pk if request.user.is_authenticated else 0
+    raw = f'{stamp}:{user_pk}:{request.get_full_path()}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _last_modified(request, stamp):
+    # Last-Modified cannot vary by user, so only anonymous pages get one
+    if request.user.is_authenticated:
+        return None
+    return stamp
+
+
+def _post_stamp(request, pk):
+    """Latest change to the post or its comments, memoized on the request"""
+    if not hasattr(request, '_blog_post_stamp'):
+        row = Post.objects.filter(pk=pk).values_list('updated_at', 'comment_activity_at').first()
+        request._blog_post_stamp = max(filter(None, row)) if row else None
+    return request._blog_post_stamp
+
+
+def post_etag(request, pk, **kwargs):
+    if has_pending_messages(request):
+        return None
+    stamp = _post_stamp(request, pk)
+    generation, listing = fragment_cache.generation(), listing_stamp()
+    if stamp is None or may_be_stale(generation, listing):
+        return None
+    return _etag(request, f'{stamp.isoformat()}:{generation}:{listing}')
+
+
+def post_last_modified(request, pk, **kwargs):
+    if has_pending_messages(request):
+        return None
+    stamp = _post_stamp(request, pk)
+    if stamp is None or may_be_stale(listing_stamp()):
+        return None
+    # Author renames are only caught by the ETag, which clients prefer
+    return _last_modified(request, max(stamp, listing_modified()))
+
+
+def listing_etag(request, *args, **kwargs):
+    if has_pending_messages(request) or may_be_stale(listing_stamp()):
+        return None
+    return _etag(request, listing_stamp())
+
+
+def listing_last_modified(request, *args, **kwargs):
+    if has_pending_messages(request) or may_be_stale(listing_stamp()):
+        return None
+    return _last_modified(request, listing_modified())
+
+
+conditional_post = condition(etag_func=post_etag, last_modified_func=post_last_modified)
+conditional_listing = condition(etag_func=listing_etag, last_modified_func=listing_last_modified)
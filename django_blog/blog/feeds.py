@@ -0,0 +1,243 @@
+"""
+Streaming RSS 2.0, Atom and JSON Feed output.
+
+Feeds cover every post, so they are never built in memory: posts are read
+with ``iterator(chunk_size=...)`` and each chunk is rendered and sent on
+its own through a ``StreamingHttpResponse``. While a feed is streamed,
+every rendered chunk is also stored in the cache under a key that includes
+the listing stamp (``blog.caching``), and a manifest with the chunk count
+is written once the last chunk went out. Later requests stream those
+chunks back one at a time without touching the database; the next post
+save, tag change or author rename replaces the stamp and the cached feed
+is simply never read again.
+"""
+import hashlib
+import json
+from itertools import islice
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+
+from . import tag_stats
+from .caching import fragment_cache, listing_modified, listing_stamp
+from .models import Post
+from .search import tags_by_post
+
+
+def _chunk_size():
+    return getattr(settings, 'BLOG_FEED_CHUNK_SIZE', 200)
+
+
+def _timeout():
+    return getattr(settings, 'BLOG_FEED_CACHE_TIMEOUT', 60 * 60)
+
+
+class RSSFeed:
+    content_type = 'application/rss+xml; charset=utf-8'
+
+    def start(self, meta):
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+            f'<title>{escape(meta["title"])}</title>'
+            f'<link>{escape(meta["link"])}</link>'
+            f'<description>{escape(meta["description"])}</description>'
+            f'<atom:link href={quoteattr(meta["feed_url"])} rel="self"/>'
+            f'<lastBuildDate>{rfc2822_date(meta["updated"])}</lastBuildDate>'
+        )
+
+    def item(self, entry, index):
+        categories = ''.join(f'<category>{escape(name)}</category>' for name in entry['tags'])
+        return (
+            f'<item><title>{escape(entry["title"])}</title>'
+            f'<link>{escape(entry["link"])}</link>'
+            f'<guid isPermaLink="true">{escape(entry["link"])}</guid>'
+            f'<dc:creator>{escape(entry["author"])}</dc:creator>'
+            f'<pubDate>{rfc2822_date(entry["published"])}</pubDate>'
+            f'<description>{escape(entry["html"])}</description>{categories}</item>'
+        )
+
+    def end(self):
+        return '</channel></rss>\n'
+
+
+class AtomFeed:
+    content_type = 'application/atom+xml; charset=utf-8'
+
+    def start(self, meta):
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>{escape(meta["title"])}</title>'
+            f'<link href={quoteattr(meta["link"])} rel="alternate"/>'
+            f'<link href={quoteattr(meta["feed_url"])} rel="self"/>'
+            f'<id>{escape(meta["feed_url"])}</id>'
+            f'<subtitle>{escape(meta["description"])}</subtitle>'
+            f'<updated>{rfc3339_date(meta["updated"])}</updated>'
+        )
+
+    def item(self, entry, index):
+        categories = ''.join(f'<category term={quoteattr(name)}/>' for name in entry['tags'])
+        return (
+            f'<entry><title>{escape(entry["title"])}</title>'
+            f'<link href={quoteattr(entry["link"])} rel="alternate"/>'
+            f'<id>{escape(entry["link"])}</id>'
+            f'<author><name>{escape(entry["author"])}</name></author>'
+            f'<published>{rfc3339_date(entry["published"])}</published>'
+            f'<updated>{rfc3339_date(entry["updated"])}</updated>'
+            f'<content type="html">{escape(entry["html"])}</content>{categories}</entry>'
+        )
+
+    def end(self):
+        return '</feed>\n'
+
+
+class JSONFeed:
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def start(self, meta):
+        header = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': meta['title'],
+            'home_page_url': meta['link'],
+            'feed_url': meta['feed_url'],
+            'description': meta['description'],
+        })
+        # Leave the object open so items can be streamed into it
+        return header[:-1] + ', "items": ['
+
+    def item(self, entry, index):
+        item = json.dumps({
+            'id': entry['link'],
+            'url': entry['link'],
+            'title': entry['title'],
+            'content_html': entry['html'],
+            'date_published': entry['published'].isoformat(),
+            'date_modified': entry['updated'].isoformat(),
+            'authors': [{'name': entry['author']}],
+            'tags': entry['tags'],
+        })
+        return item if index == 0 else ',' + item
+
+    def end(self):
+        return ']}\n'
+
+
+FORMATS = {
+    'rss': RSSFeed,
+    'atom': AtomFeed,
+    'json': JSONFeed,
+}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_chunks(request, feed, meta, queryset):
+    """Yield the feed as text chunks: header, one chunk per fetched batch, footer"""
+    yield feed.start(meta)
+    size = _chunk_size()
+    rows = queryset.order_by('-published_date', '-pk').values(
+        'pk', 'title', 'content_html', 'published_date', 'updated_at', 'author__username',
+    ).iterator(chunk_size=size)
+    index = 0
+    for chunk in _chunks(rows, size):
+        tags = tags_by_post([row['pk'] for row in chunk])
+        parts = []
+        for row in chunk:
+            entry = {
+                'title': row['title'],
+                'link': request.build_absolute_uri(reverse('blog:post_detail', args=[row['pk']])),
+                'html': row['content_html'],
+                'published': row['published_date'],
+                'updated': row['updated_at'],
+                'author': row['author__username'],
+                'tags': tags.get(row['pk'], []),
+            }
+            parts.append(feed.item(entry, index))
+            index += 1
+        yield ''.join(parts)
+    yield feed.end()
+
+
+def _scope(tag_name, username):
+    """Return (title, description, queryset) for the requested feed"""
+    if tag_name is not None:
+        found = tag_stats.lookup(tag_name)
+        if found is None:
+            raise Http404('No tag matches the given query.')
+        tag, _ = found
+        title = f'Posts tagged "{tag.name}"'
+        return title, f'Latest posts tagged "{tag.name}"', Post.objects.filter(tags=tag)
+    if username is not None:
+        author = get_object_or_404(User, username=username)
+        title = f'Posts by {author.username}'
+        return title, f'Latest posts by {author.username}', Post.objects.filter(author=author)
+    return 'Django Blog', 'Latest posts', Post.objects.all()
+
+
+def _cache_key(request, fmt):
+    raw = f'{fmt}:{request.get_host()}:{request.path}:{listing_stamp()}'
+    return 'blog-feed:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _cached(cache, key, count, render):
+    for i in range(count):
+        chunk = cache.get(f'{key}:{i}')
+        if chunk is None:
+            # Evicted since the manifest was written: render the rest instead
+            yield from islice(render(), i, None)
+            return
+        yield chunk
+
+
+def _caching(cache, key, chunks):
+    timeout = _timeout()
+    count = 0
+    for chunk in chunks:
+        cache.set(f'{key}:{count}', chunk, timeout)
+        count += 1
+        yield chunk
+    cache.set(key, count, timeout)
+
+
+def feed_response(request, fmt, tag_name=None, username=None):
+    """Stream a feed, from the cache when it was rendered since the last change"""
+    if fmt not in FORMATS:
+        raise Http404('Unknown feed format.')
+    feed = FORMATS[fmt]()
+
+    def render():
+        title, description, queryset = _scope(tag_name, username)
+        meta = {
+            'title': title,
+            'description': description,
+            'link': request.build_absolute_uri(reverse('blog:home')),
+            'feed_url': request.build_absolute_uri(request.path),
+            'updated': listing_modified(),
+        }
+        return render_chunks(request, feed, meta, queryset)
+
+    cache = fragment_cache.cache
+    key = _cache_key(request, fmt)
+    count = cache.get(key)
+    if count is not None:
+        chunks = _cached(cache, key, count, render)
+    else:
+        # render() resolves the tag or author right away, so unknown ones 404
+        chunks = _caching(cache, key, render())
+    return StreamingHttpResponse(chunks, content_type=feed.content_type)
@@ -1,7 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from django.db import transaction
 from .models import Post, Comment
+from .tagging import set_tags
 
 class CustomUserCreationForm(UserCreationForm):
     """Extended UserCreationForm with email field"""
@@ -77,12 +79,10 @@ class PostForm(forms.ModelForm):
     def save(self, commit=True):
         post = super().save(commit=False)
         if commit:
-            post.save()
-            # Set tags using django-taggit
-            post.tags.clear()
-            tag_names = self.cleaned_data.get('tags', [])
-            if tag_names:
-                post.tags.add(*tag_names)
+            with transaction.atomic():
+                post.save()
+                # Only add and remove the tags that actually changed
+                set_tags(post, self.cleaned_data.get('tags', []))
         return post
 
 class CommentForm(forms.ModelForm):
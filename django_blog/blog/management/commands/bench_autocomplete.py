@@ -0,0 +1,49 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.autocomplete import PrefixIndex
+from blog.bench import WORDS, sentence
+
+
+class Command(BaseCommand):
+    help = 'Measure prefix index build, lookup and update times for synthetic post titles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1000000)
+        parser.add_argument('--lookups', type=int, default=20000)
+        parser.add_argument('--limit', type=int, default=8)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        # No database involved: titles are generated in memory
+        titles = [(pk, f'{sentence(rng, 5).capitalize()} {pk}') for pk in range(1, options['titles'] + 1)]
+
+        start = time.perf_counter()
+        index = PrefixIndex(titles)
+        self.stdout.write(f'Built index of {len(index)} titles in {time.perf_counter() - start:.2f}s')
+
+        prefixes = []
+        for _ in range(options['lookups']):
+            word = rng.choice(WORDS)
+            prefixes.append(word[:rng.randint(1, len(word))])
+            prefixes.append(f'{word} {rng.choice(WORDS)[:2]}')
+        self.report('lookup', [lambda p=p: index.search(p, options['limit']) for p in prefixes])
+
+        updates = rng.sample(range(1, options['titles'] + 1), 1000)
+        self.report('retitle', [lambda pk=pk: index.add(pk, sentence(rng, 5)) for pk in updates])
+        self.report('remove', [lambda pk=pk: index.remove(pk) for pk in updates])
+
+    def report(self, label, calls):
+        samples = []
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - start) * 1e6)
+        samples.sort()
+        self.stdout.write(
+            f'{label:<8} median {statistics.median(samples):7.1f}us  '
+            f'p99 {samples[int(len(samples) * 0.99)]:7.1f}us  max {samples[-1]:8.1f}us'
+        )
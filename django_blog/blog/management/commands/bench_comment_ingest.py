@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.bench import bench_user, make_posts, rollback
+from blog.comment_queue import CommentQueue
+from blog.models import Comment
+
+
+class Command(BaseCommand):
+    help = 'Measure sustained comment write throughput, synchronous vs queued batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--posts', type=int, default=5, help='Posts the burst is spread over')
+        parser.add_argument('--batch-sizes', default='10,100,500')
+
+    def handle(self, *args, **options):
+        total, post_count = options['comments'], options['posts']
+        batch_sizes = [int(size) for size in options['batch_sizes'].split(',')]
+        self.stdout.write(f'{total} comments over {post_count} posts')
+        self.stdout.write(f'{"mode":<16} {"comments/s":>11}')
+
+        with rollback():
+            author = bench_user()
+            post_ids = make_posts(post_count, author=author)
+            start = time.perf_counter()
+            for i in range(total):
+                Comment.objects.create(
+                    post_id=post_ids[i % post_count], author=author, content=f'Burst comment {i}',
+                )
+            self.report('sync save()', total, start)
+
+        for batch_size in batch_sizes:
+            with rollback():
+                author = bench_user()
+                post_ids = make_posts(post_count, author=author)
+                # The writer runs in this thread so the rollback covers its writes;
+                # it drains whenever producers have filled the bounded queue.
+                queue = CommentQueue(maxsize=batch_size, batch_size=batch_size, worker=False)
+                start = time.perf_counter()
+                for i in range(total):
+                    if not queue.submit(post_ids[i % post_count], author.pk, f'Burst comment {i}'):
+                        queue.drain()
+                        queue.submit(post_ids[i % post_count], author.pk, f'Burst comment {i}')
+                queue.drain()
+                self.report(f'queued x{batch_size}', total, start)
+
+    def report(self, label, total, start):
+        rate = total / (time.perf_counter() - start)
+        self.stdout.write(f'{label:<16} {rate:>11.0f}')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from blog.bench import make_posts, rollback, timed
+from blog.models import Post
+from blog.pagination import CursorPaginator, encode_cursor
+
+
+class Command(BaseCommand):
+    help = 'Compare OFFSET pagination with keyset pagination at increasing page depths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=200000)
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        per_page = options['per_page']
+        self.stdout.write(f'{"page":>8} {"offset ms":>10} {"cursor ms":>10}')
+        with rollback():
+            make_posts(options['posts'])
+            queryset = Post.objects.for_listing()
+            last_page = options['posts'] // per_page
+            depths = sorted({1, 10, 100, 1000, last_page // 2, last_page} & set(range(1, last_page + 1)))
+            for depth in depths:
+                # Start the cursor from the row that ends the previous page
+                offset = (depth - 1) * per_page
+                token = None
+                if offset:
+                    row = queryset.order_by('-published_date', '-pk').values_list(
+                        'published_date', 'pk')[offset - 1]
+                    token = encode_cursor(row)
+
+                def offset_page():
+                    list(Paginator(queryset.order_by('-published_date', '-pk'), per_page).page(depth))
+
+                def cursor_page():
+                    list(CursorPaginator(queryset, per_page).page(token))
+
+                offset_ms = timed(offset_page, options['repeat'])
+                cursor_ms = timed(cursor_page, options['repeat'])
+                self.stdout.write(f'{depth:>8} {offset_ms:>10.2f} {cursor_ms:>10.2f}')
@@ -0,0 +1,50 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import related, tag_stats
+from blog.bench import make_posts, rollback, tag_posts, timed
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Measure related posts table builds, incremental updates and panel reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=2000, help='Size of the tag vocabulary')
+        parser.add_argument('--tags-per-post', type=int, default=4)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--skip-python', action='store_true', help='Skip the pure Python full build')
+
+    def handle(self, *args, **options):
+        vocabulary = [f'topic-{i}' for i in range(options['tags'])]
+        with rollback():
+            self.stdout.write(
+                f'Creating {options["posts"]} posts with {options["tags_per_post"]} '
+                f'of {len(vocabulary)} tags each...'
+            )
+            post_ids = make_posts(options['posts'])
+            tag_posts(post_ids, options['tags_per_post'], vocabulary=vocabulary)
+            tag_stats.rebuild()
+
+            builders = [('numpy', True)] if related.numpy is not None else []
+            if not options['skip_python']:
+                builders.append(('python', False))
+            for label, use_numpy in builders:
+                start = time.perf_counter()
+                rows = sum(1 for _ in related.build_rows(use_numpy))
+                self.stdout.write(f'full build ({label}): {time.perf_counter() - start:.1f}s, {rows} entries')
+
+            start = time.perf_counter()
+            written = related.rebuild()
+            self.stdout.write(f'rebuild incl. writes: {time.perf_counter() - start:.1f}s, {written} rows')
+
+            rng = random.Random(0)
+            sample = rng.sample(post_ids, options['repeat'])
+            ms = timed(lambda: related.update_post(rng.choice(sample)), options['repeat'])
+            self.stdout.write(f'incremental update: {ms:.1f} ms median')
+            post = Post.objects.get(pk=sample[0])
+            ms = timed(lambda: related.related_posts(post, 5), options['repeat'])
+            self.stdout.write(f'panel query: {ms:.2f} ms median')
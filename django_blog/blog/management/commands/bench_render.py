@@ -0,0 +1,50 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+
+from blog.bench import sentence, timed
+from blog.models import Post
+from blog.rendering import render_fields
+
+# The template snippets as they were before and after the rendered columns
+TEMPLATES = {
+    'listing': (
+        '{% for post in posts %}<p>{{ post.content|truncatewords:30 }}</p>{% endfor %}',
+        '{% for post in posts %}<p>{{ post.excerpt }}</p>{% endfor %}',
+    ),
+    'detail': (
+        '{% for post in posts %}<div>{{ post.content|linebreaks }}</div>{% endfor %}',
+        '{% for post in posts %}<div>{{ post.content_html|safe }}</div>{% endfor %}',
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare template render time using the content filters with the precomputed columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10, help='Posts rendered per page')
+        parser.add_argument('--words', type=int, default=400, help='Words per post body')
+        parser.add_argument('--paragraphs', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        per_paragraph = max(1, options['words'] // options['paragraphs'])
+        # Rendering needs no database: posts are built in memory
+        posts = [
+            render_fields(Post(
+                title=sentence(rng, 6),
+                content='\n\n'.join(sentence(rng, per_paragraph) for _ in range(options['paragraphs'])),
+            ))
+            for _ in range(options['posts'])
+        ]
+        engine = engines['django']
+        self.stdout.write(f'{options["posts"]} posts of {options["words"]} words per page')
+        self.stdout.write(f'{"page":<10} {"filters ms":>11} {"columns ms":>11} {"speedup":>8}')
+        for label, sources in TEMPLATES.items():
+            before, after = (engine.from_string(source) for source in sources)
+            before_ms = timed(lambda: before.render({'posts': posts}), options['repeat'])
+            after_ms = timed(lambda: after.render({'posts': posts}), options['repeat'])
+            self.stdout.write(f'{label:<10} {before_ms:>11.3f} {after_ms:>11.3f} {before_ms / after_ms:>7.1f}x')
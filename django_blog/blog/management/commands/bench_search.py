@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from blog.bench import make_posts, rollback, tag_posts, timed
+from blog.search import LikeSearchBackend, get_search_backend
+
+QUERIES = ['django', 'templ', 'search index', 'python web cache', 'nomatch']
+
+
+class Command(BaseCommand):
+    help = 'Compare indexed full-text search against the LIKE search path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        like = LikeSearchBackend()
+        indexed = get_search_backend()
+        self.stdout.write(f'Indexed backend: {type(indexed).__name__}')
+        self.stdout.write(f'{"posts":>9} {"query":<18} {"like ms":>10} {"index ms":>10} {"speedup":>8}')
+
+        for size in options['sizes']:
+            with rollback():
+                tag_posts(make_posts(size))
+                indexed.rebuild(batch_size=5000)
+                for query in QUERIES:
+                    def run(backend):
+                        return lambda: (backend.count(query), backend.search(query, limit=10))
+                    like_ms = timed(run(like), options['repeat'])
+                    index_ms = timed(run(indexed), options['repeat'])
+                    speedup = like_ms / index_ms if index_ms else float('inf')
+                    self.stdout.write(
+                        f'{size:>9} {query:<18} {like_ms:>10.2f} {index_ms:>10.2f} {speedup:>7.1f}x'
+                    )
+            # The rollback discarded the synthetic posts, so restore the real index
+            indexed.rebuild()
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.bench import bench_user, rollback
+from blog.models import Post
+from blog.tagging import set_tags
+
+
+def clear_and_add(post, names):
+    """The previous PostForm.save behaviour"""
+    post.tags.clear()
+    post.tags.add(*names)
+
+
+class Command(BaseCommand):
+    help = 'Measure post edit throughput for posts with many tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--edits', type=int, default=200)
+
+    def handle(self, *args, **options):
+        tag_count, edits = options['tags'], options['edits']
+        base = [f'tag-{i}' for i in range(tag_count)]
+        scenarios = {
+            'unchanged': lambda i: base,
+            'swap 2 tags': lambda i: base[2:] + [f'new-{i}-a', f'new-{i}-b'],
+        }
+        self.stdout.write(f'{tag_count} tags per post, {edits} edits per run')
+        self.stdout.write(f'{"scenario":<14} {"clear+add /s":>13} {"diff /s":>10}')
+        for label, tags_for_edit in scenarios.items():
+            rates = []
+            for apply in (clear_and_add, set_tags):
+                with rollback():
+                    post = Post.objects.create(title='Bench', content='Body', author=bench_user())
+                    set_tags(post, base)
+                    start = time.perf_counter()
+                    for i in range(edits):
+                        post.save()
+                        apply(post, tags_for_edit(i))
+                    rates.append(edits / (time.perf_counter() - start))
+            self.stdout.write(f'{label:<14} {rates[0]:>13.1f} {rates[1]:>10.1f}')
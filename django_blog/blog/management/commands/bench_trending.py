@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from blog.archive import COMMENT_COLUMNS, insert_rows
+from blog.bench import bench_user, make_posts, rollback, timed
+from blog.models import Comment
+from blog.trending import Trending
+
+
+class Command(BaseCommand):
+    help = 'Measure the trending ranking against aggregating the comments table per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--hours', type=int, default=72, help='Period the comments are spread over')
+        parser.add_argument('--updates', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        total, span = options['comments'], options['hours'] * 60 * 60
+        with rollback():
+            author = bench_user()
+            post_ids = make_posts(options['posts'], author=author)
+            now = timezone.now()
+            start = time.perf_counter()
+            for offset in range(0, total, options['batch_size']):
+                insert_rows(Comment, COMMENT_COLUMNS[1:], [
+                    # A few posts get most of the comments; thread paths play no part here
+                    (post_ids[min(int(rng.paretovariate(1.2)) - 1, len(post_ids) - 1)], author.pk,
+                     'Bench comment', '<p>Bench comment</p>', 'Bench comment', created, created, None, '', 0, 0)
+                    for created in (now - timedelta(seconds=rng.uniform(0, span))
+                                    for _ in range(min(options['batch_size'], total - offset)))
+                ])
+            self.stdout.write(f'Inserted {total} comments in {time.perf_counter() - start:.1f}s')
+
+            since = now - timedelta(hours=24)
+            aggregate_ms = timed(lambda: list(
+                Comment.objects.filter(created_at__gte=since).values('post')
+                .annotate(recent=Count('id')).order_by('-recent')[:20]
+            ), repeat=3)
+            self.stdout.write(f'per-request aggregate (24h counts)  {aggregate_ms:9.1f}ms')
+
+            ranking = Trending()
+            start = time.perf_counter()
+            ranking.build()
+            self.stdout.write(f'ranking build from Comment.created_at {(time.perf_counter() - start) * 1000:8.1f}ms')
+
+            self.report('top 20', [lambda: ranking.top(20) for _ in range(1000)])
+            events = [[(rng.choice(post_ids), timezone.now())] for _ in range(options['updates'])]
+            self.report('new comment', [lambda event=event: ranking.add_comments(event) for event in events])
+            views = [{rng.choice(post_ids): rng.randint(1, 50)} for _ in range(options['updates'])]
+            self.report('view flush', [lambda counts=counts: ranking.add_views(counts) for counts in views])
+
+    def report(self, label, calls):
+        samples = []
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - start) * 1e6)
+        samples.sort()
+        self.stdout.write(
+            f'{label:<12} median {statistics.median(samples):7.1f}us  '
+            f'p99 {samples[int(len(samples) * 0.99)]:7.1f}us  max {samples[-1]:8.1f}us'
+        )
@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import archive
+
+
+class Command(BaseCommand):
+    help = 'Stream posts or comments to an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(archive.FIELDS))
+        parser.add_argument('output', nargs='?', default='-', help='File to write, or - for stdout')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--progress-every', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        kind, output = options['kind'], options['output']
+        fmt = options['format'] or ('csv' if output.endswith('.csv') else 'ndjson')
+        # Progress goes to stderr when the export itself is written to stdout
+        log = self.stderr if output == '-' else self.stdout
+        export = archive.export_posts if kind == 'posts' else archive.export_comments
+        records = self.progress(export(options['chunk_size']), kind, options['progress_every'], log)
+
+        start = time.perf_counter()
+        if output == '-':
+            count = archive.write_records(sys.stdout, fmt, kind, records)
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as stream:
+                count = archive.write_records(stream, fmt, kind, records)
+        elapsed = time.perf_counter() - start
+        log.write(self.style.SUCCESS(
+            f'Successfully exported {count} {kind} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f}/s)'
+        ))
+
+    def progress(self, records, kind, every, log):
+        start = time.perf_counter()
+        for count, record in enumerate(records, 1):
+            yield record
+            if every and count % every == 0:
+                rate = count / (time.perf_counter() - start)
+                log.write(f'Exported {count} {kind} ({rate:.0f}/s)')
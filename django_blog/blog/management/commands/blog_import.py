@@ -0,0 +1,62 @@
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import archive
+from blog.caching import bump_listing_stamp, fragment_cache
+
+# Derived data that bulk inserts bypass, rebuilt after an import
+REBUILD = {
+    'posts': ['rebuild_tag_stats', 'rebuild_search_index', 'rebuild_related_posts', 'rebuild_author_stats'],
+    'comments': ['rebuild_comment_counts', 'rebuild_author_stats'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Bulk load posts or comments from an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(archive.FIELDS))
+        parser.add_argument('input', help='File to read, or - for stdin')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Create users (without a usable password) for unknown usernames instead of skipping',
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Skip rebuilding derived tables, e.g. when more files follow',
+        )
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['input']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        importer = archive.Importer(
+            batch_size=options['batch_size'], create_authors=options['create_authors'],
+        )
+        start = time.perf_counter()
+        try:
+            stream = nullcontext(sys.stdin) if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        with stream as stream:
+            records = archive.read_records(stream, fmt)
+            batches = importer.import_posts(records) if kind == 'posts' else importer.import_comments(records)
+            for _ in batches:
+                rate = importer.created / (time.perf_counter() - start)
+                self.stdout.write(f'Imported {importer.created} {kind}, skipped {importer.skipped} ({rate:.0f}/s)')
+        elapsed = time.perf_counter() - start
+
+        if not options['no_rebuild']:
+            for command in REBUILD[kind]:
+                call_command(command, stdout=self.stdout)
+        fragment_cache.invalidate_all()
+        bump_listing_stamp()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {importer.created} {kind} in {elapsed:.1f}s '
+            f'({importer.created / max(elapsed, 1e-9):.0f}/s), skipped {importer.skipped}'
+        ))
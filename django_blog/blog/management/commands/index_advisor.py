@@ -0,0 +1,133 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog import tag_stats, urls as blog_urls
+from blog.bench import make_posts, rollback, tag_posts
+from blog.models import Comment, Post
+
+# URL names that are not plain GET pages; sitemaps write files and scan
+# every post by design, once per post change
+SKIP = {'logout', 'enqueue_comment', 'add_comment', 'sitemap', 'sitemap_shard'}
+
+# Problems counted in the summary. Index scans are printed as notes only:
+# an ordered index walk with LIMIT or a COUNT(*) over a covering index is
+# expected.
+COUNTED = {'full scan', 'in-memory sort'}
+
+
+def classify(vendor, line):
+    """Return a label for a noteworthy query plan line, or None"""
+    if vendor == 'sqlite':
+        if line.startswith('SCAN'):
+            return 'index scan' if 'INDEX' in line else 'full scan'
+        if 'USE TEMP B-TREE' in line:
+            return 'in-memory sort'
+    elif vendor == 'postgresql':
+        if 'Seq Scan' in line:
+            return 'full scan'
+        if line.lstrip('-> ').startswith('Sort'):
+            return 'in-memory sort'
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Replay the blog URLs and report queries whose plans scan tables or sort in memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample-posts', type=int, default=500,
+            help='Synthetic posts to create (rolled back afterwards) when the database has none',
+        )
+        parser.add_argument('--search', default='django', help='Query string used for the search page')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'index_advisor does not support {connection.vendor}')
+        # A dummy cache makes every page run its cold-cache queries
+        overrides = override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        )
+        flagged = 0
+        with rollback(), overrides:
+            if not Post.objects.exists():
+                self.stdout.write(f'No posts found, creating {options["sample_posts"]} sample posts')
+                self.create_sample(options['sample_posts'])
+            post = Post.objects.order_by('-comment_count').first()
+            comment = Comment.objects.filter(post=post).first() or Comment.objects.create(
+                post=post, author=post.author, content='Index advisor sample comment',
+            )
+            client = Client()
+            client.force_login(post.author)
+            for url in self.urls(post, comment, options['search']):
+                flagged += self.replay(client, url)
+        style = self.style.SUCCESS if not flagged else self.style.WARNING
+        self.stdout.write(style(f'{flagged} queries with full scans or in-memory sorts'))
+
+    def create_sample(self, count):
+        author = User.objects.filter(is_active=True).first() or User.objects.create(username='index-advisor')
+        post_ids = make_posts(count, author=author)
+        tag_posts(post_ids)
+        tag_stats.rebuild()
+        Comment.objects.bulk_create(
+            Comment(post_id=post_ids[i % 10], author=author, content=f'Sample comment {i}')
+            for i in range(200)
+        )
+
+    def urls(self, post, comment, search):
+        tag = post.tags.first()
+        kwargs_for = {
+            'post_id': post.pk,
+            'comment_id': comment.pk,
+            'tag_name': tag.name if tag else 'django',
+            'username': post.author.username,
+            'fmt': 'rss',
+        }
+        for pattern in blog_urls.urlpatterns:
+            if pattern.name in SKIP:
+                continue
+            kwargs = {}
+            for name in pattern.pattern.converters:
+                if name == 'pk':
+                    kwargs[name] = comment.pk if pattern.name.startswith('comment_') else post.pk
+                else:
+                    kwargs[name] = kwargs_for[name]
+            url = reverse(f'{blog_urls.app_name}:{pattern.name}', kwargs=kwargs)
+            if pattern.name == 'search':
+                url += f'?q={search}'
+            yield url
+
+    def replay(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        problems = [(sql, found) for sql in selects for found in self.explain(sql)]
+        self.stdout.write(f'GET {url} -> {response.status_code}, {len(queries)} queries')
+        for sql, (label, detail) in problems:
+            style = self.style.WARNING if label in COUNTED else str
+            self.stdout.write(style(f'  {label}: {detail}'))
+            self.stdout.write(f'    {sql[:160]}')
+        return len({sql for sql, (label, _) in problems if label in COUNTED})
+
+    def explain(self, sql):
+        """Yield (label, plan line) for each noteworthy step of ``sql``'s plan"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                lines = [row[-1] for row in cursor.fetchall()]
+            else:
+                cursor.execute(f'EXPLAIN {sql}')
+                lines = [row[0].strip() for row in cursor.fetchall()]
+        # Full-text lookups scan their virtual table and sort by rank by design
+        if any('VIRTUAL TABLE' in line for line in lines):
+            return
+        for line in lines:
+            label = classify(connection.vendor, line)
+            if label:
+                yield label, line
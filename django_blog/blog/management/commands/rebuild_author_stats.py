@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog import author_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-author post and comment totals shown on profile pages'
+
+    def handle(self, *args, **options):
+        count = author_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt stats for {count} authors'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blog.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized Post.comment_count and Comment.reply_count columns in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Number of post or comment ids updated per UPDATE statement',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        comment_counts = (
+            Comment.objects.filter(post=OuterRef('pk'))
+            .order_by().values('post').annotate(total=Count('pk')).values('total')
+        )
+        updated = self.rebuild(Post, 'comment_count', comment_counts, batch_size, 'posts')
+        reply_counts = (
+            Comment.objects.filter(parent=OuterRef('pk'))
+            .order_by().values('parent').annotate(total=Count('pk')).values('total')
+        )
+        self.rebuild(Comment, 'reply_count', reply_counts, batch_size, 'comments')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt comment counts for {updated} posts')
+        )
+
+    def rebuild(self, model, field, counts, batch_size, label):
+        bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write(f'No {label} to update')
+            return 0
+
+        updated = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            updated += model.objects.filter(pk__gte=start, pk__lt=start + batch_size).update(
+                **{field: Coalesce(Subquery(counts), 0)}
+            )
+            self.stdout.write(f'Updated {updated} {label}')
+        return updated
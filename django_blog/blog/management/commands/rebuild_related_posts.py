@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import related
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related posts table from post tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-numpy', action='store_true', help='Use the pure Python builder')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = related.rebuild(
+            batch_size=options['batch_size'], use_numpy=False if options['no_numpy'] else None,
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully wrote {written} related post entries in {elapsed:.1f}s')
+        )
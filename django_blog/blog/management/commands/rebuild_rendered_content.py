@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Comment, Post
+from blog.rendering import rerender
+
+
+class Command(BaseCommand):
+    help = 'Re-render the content_html and excerpt columns of posts and comments in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--only', choices=['posts', 'comments'],
+            help='Re-render only posts or only comments',
+        )
+
+    def handle(self, *args, **options):
+        models = {'posts': Post, 'comments': Comment}
+        if options['only']:
+            models = {options['only']: models[options['only']]}
+        for label, model in models.items():
+            updated = 0
+            for updated in rerender(model, batch_size=options['batch_size']):
+                self.stdout.write(f'Rendered {updated} {label}')
+            self.stdout.write(self.style.SUCCESS(f'Successfully rendered {updated} {label}'))
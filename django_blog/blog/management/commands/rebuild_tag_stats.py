@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog import tag_stats
+from blog.models import TagStat
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-tag post counts used by tag pages and the tag cloud'
+
+    def handle(self, *args, **options):
+        tag_stats.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt stats for {TagStat.objects.count()} tags')
+        )
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts USING fts5("
+    "title, content, tags, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "INSERT INTO blog_post_fts (rowid, title, content, tags) "
+    "SELECT p.id, p.title, p.content, COALESCE(("
+    "  SELECT group_concat(t.name, ' ') FROM taggit_taggeditem ti "
+    "  JOIN taggit_tag t ON t.id = ti.tag_id "
+    "  JOIN django_content_type ct ON ct.id = ti.content_type_id "
+    "  WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id"
+    "), '') FROM blog_post p",
+]
+SQLITE_DROP = ["DROP TABLE IF EXISTS blog_post_fts"]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS blog_post_search ("
+    "post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS blog_post_search_document_idx "
+    "ON blog_post_search USING GIN (document)",
+    "INSERT INTO blog_post_search (post_id, document) "
+    "SELECT p.id, "
+    "setweight(to_tsvector('english', p.title), 'A') || "
+    "setweight(to_tsvector('english', COALESCE(("
+    "  SELECT string_agg(t.name, ' ') FROM taggit_taggeditem ti "
+    "  JOIN taggit_tag t ON t.id = ti.tag_id "
+    "  JOIN django_content_type ct ON ct.id = ti.content_type_id "
+    "  WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id"
+    "), '')), 'B') || "
+    "setweight(to_tsvector('english', p.content), 'C') "
+    "FROM blog_post p",
+]
+POSTGRES_DROP = ["DROP TABLE IF EXISTS blog_post_search"]
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0005_auto_20220424_2025'),
+        ('blog', '0004_auto_20250824_2220'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_vendor_sql({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}),
+            run_vendor_sql({'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery
+
+
+def populate_timestamps(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    latest = (
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by().values('post').annotate(latest=Max('updated_at')).values('latest')
+    )
+    Post.objects.update(updated_at=F('published_date'), comment_activity_at=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_tagstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_activity_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_timestamps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:40
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 30
+
+
+def render_existing(apps, schema_editor):
+    # A frozen copy of the default (linebreaks) rendering in blog.rendering;
+    # sites with BLOG_MARKDOWN run rebuild_rendered_content afterwards
+    alias = schema_editor.connection.alias
+    for name in ('Post', 'Comment'):
+        model = apps.get_model('blog', name)
+        rows = model._base_manager.using(alias).order_by('pk').only('pk', 'content')
+        last = None
+        while True:
+            batch = list((rows if last is None else rows.filter(pk__gt=last))[:1000])
+            if not batch:
+                break
+            for obj in batch:
+                obj.content_html = linebreaks(obj.content, autoescape=True)
+                obj.excerpt = Truncator(obj.content).words(EXCERPT_WORDS, truncate=' …')
+            model._base_manager.using(alias).bulk_update(batch, ['content_html', 'excerpt'])
+            last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_relatedpost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max
+
+
+def populate_author_stats(apps, schema_editor):
+    AuthorStats = apps.get_model('blog', 'AuthorStats')
+    totals = {}
+    for name, field in (('Post', 'post_count'), ('Comment', 'comment_count')):
+        rows = (
+            apps.get_model('blog', name).objects.order_by()
+            .values('author_id').annotate(total=Count('pk'), latest=Max('updated_at'))
+        )
+        for row in rows:
+            stats = totals.setdefault(row['author_id'], AuthorStats(user_id=row['author_id']))
+            setattr(stats, field, row['total'])
+            if stats.last_activity_at is None or row['latest'] > stats.last_activity_at:
+                stats.last_activity_at = row['latest']
+    AuthorStats.objects.bulk_create(totals.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0013_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blog_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(populate_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copy of blog.models.comment_path_segment
+PATH_WIDTH = 8
+BASE36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(pk):
+    digits = ''
+    while True:
+        pk, digit = divmod(pk, 36)
+        digits = BASE36[digit] + digits
+        if not pk:
+            return digits.rjust(PATH_WIDTH, '0')
+
+
+def existing_comments_as_roots(apps, schema_editor):
+    Comment = apps.get_model('blog', 'Comment')
+    comments = Comment._base_manager.using(schema_editor.connection.alias)
+    rows = comments.filter(path='').order_by('pk').only('pk')
+    last = None
+    while True:
+        batch = list((rows if last is None else rows.filter(pk__gt=last))[:1000])
+        if not batch:
+            return
+        for comment in batch:
+            comment.path, comment.depth = path_segment(comment.pk), 0
+        comments.bulk_update(batch, ['path', 'depth'])
+        last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_post_view_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='blog.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(existing_comments_as_roots, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='blog_comment_post_path_idx'),
+        ),
+    ]
@@ -1,25 +1,94 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.urls import reverse
 from taggit.managers import TaggableManager
+from taggit.models import Tag
+
+from .rendering import render_fields
 
 # Create your models here.
 
+def _with_rendered_fields(obj, update_fields):
+    """Render ``content`` into ``content_html``/``excerpt`` before a save that writes it"""
+    if update_fields is None:
+        render_fields(obj)
+    elif 'content' in update_fields:
+        render_fields(obj)
+        update_fields = {*update_fields, 'content_html', 'excerpt'}
+    return update_fields
+
+def _without_counters(obj, update_fields, counters, force_insert=False):
+    """
+    Leave ``counters``, which are only ever changed in the database, out of a
+    full save of an existing row: an edit must not write back the values it loaded
+    """
+    if update_fields is None and not obj._state.adding and not force_insert:
+        update_fields = [
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name not in counters
+        ]
+    return update_fields
+
+# Comment paths are made of one fixed-width base-36 segment per level
+COMMENT_PATH_WIDTH = 8
+_BASE36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+def comment_path_segment(pk):
+    """``pk`` as a path segment; segments sort in pk order"""
+    digits = ''
+    while True:
+        pk, digit = divmod(pk, 36)
+        digits = _BASE36[digit] + digits
+        if not pk:
+            return digits.rjust(COMMENT_PATH_WIDTH, '0')
+
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Join authors and prefetch tags so post cards render in a fixed number of queries"""
+        return self.select_related('author').prefetch_related('tags')
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     published_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     tags = TaggableManager(blank=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_activity_at = models.DateTimeField(null=True, blank=True, editable=False)
+    content_html = models.TextField(blank=True, editable=False)
+    excerpt = models.TextField(blank=True, editable=False)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    COUNTERS = ('view_count', 'comment_count', 'comment_activity_at')
+    
+    objects = PostQuerySet.as_manager()
     
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        update_fields = _with_rendered_fields(self, kwargs.get('update_fields'))
+        # Views (blog.page_views) and comment totals (blog.signals) are
+        # maintained with UPDATE ... SET col = col + n
+        kwargs['update_fields'] = _without_counters(
+            self, update_fields, self.COUNTERS, kwargs.get('force_insert'),
+        )
+        super().save(*args, **kwargs)
+    
     def get_absolute_url(self):
         return reverse('blog:post_detail', kwargs={'pk': self.pk})
     
     class Meta:
         ordering = ['-published_date']
+        indexes = [
+            # Matches the keyset pagination ordering used by listing views
+            models.Index(fields=['-published_date', '-id'], name='blog_post_published_idx'),
+            # Per-author listings (profile) in the same order
+            models.Index(fields=['author', '-published_date', '-id'], name='blog_post_author_pub_idx'),
+            # The most viewed ranking
+            models.Index(fields=['-view_count', '-id'], name='blog_post_views_idx'),
+        ]
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
@@ -27,9 +96,88 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    content_html = models.TextField(blank=True, editable=False)
+    excerpt = models.TextField(blank=True, editable=False)
+    # Threading (blog/threads.py): the parent's path plus this comment's own
+    # segment, so ordering by path lists a thread depth-first
+    parent = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies', editable=False,
+    )
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    COUNTERS = ('reply_count',)
     
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
     
+    def set_thread_path(self, parent_path=None):
+        """Derive ``path`` and ``depth`` from the pk and the parent's path"""
+        if self.parent_id is None:
+            parent_path = ''
+        elif parent_path is None:
+            parent_path = self.parent.path
+        self.path = parent_path + comment_path_segment(self.pk)
+        self.depth = len(parent_path) // COMMENT_PATH_WIDTH
+    
+    def save(self, *args, **kwargs):
+        update_fields = _with_rendered_fields(self, kwargs.get('update_fields'))
+        # Replies are counted by blog.signals with UPDATE ... SET col = col + n
+        kwargs['update_fields'] = _without_counters(
+            self, update_fields, self.COUNTERS, kwargs.get('force_insert'),
+        )
+        if not self._state.adding or self.path:
+            super().save(*args, **kwargs)
+            return
+        # The path ends with the pk, which is only known once the row exists
+        using = kwargs.get('using') or router.db_for_write(Comment, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            self.set_thread_path()
+            Comment._base_manager.using(using).filter(pk=self.pk).update(path=self.path, depth=self.depth)
+    
+    class Meta:
+        # Queued comments are bulk inserted with near-identical timestamps
+        ordering = ['created_at', 'id']
+        indexes = [
+            # A post's comment list is read in this order
+            models.Index(fields=['post', 'created_at', 'id'], name='blog_comment_post_created_idx'),
+            # Threads and subtrees are path ranges within a post
+            models.Index(fields=['post', 'path'], name='blog_comment_post_path_idx'),
+        ]
+
+class TagStat(models.Model):
+    """Denormalized number of posts per tag, maintained by blog.tag_stats"""
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='blog_stat')
+    post_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f'{self.tag.name}: {self.post_count}'
+
+class AuthorStats(models.Model):
+    """Denormalized per-author totals shown on the profile page, maintained by blog.author_stats"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='blog_stats')
+    post_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f'{self.user_id}: {self.post_count} posts, {self.comment_count} comments'
+
+class RelatedPost(models.Model):
+    """Precomputed tag similarity between two posts, maintained by blog.related"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id}: {self.score:.3f}'
+    
     class Meta:
-        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='blog_relatedpost_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['post', '-score'], name='blog_relatedpost_rank_idx'),
+        ]
@@ -0,0 +1,71 @@
+"""
+Full-page cache for anonymous visitors.
+
+Every anonymous visitor sees the same listing page, so ``cache_anonymous_page``
+stores the rendered response per URL (host, path and query string) and
+replays it until the listing stamp changes, i.e. until a post is created,
+edited or deleted, its tags change or an author is renamed. Rebuilds go
+through ``blog.caching.get_or_build``, so only one request renders a
+page after an invalidation.
+
+Requests that are not a plain anonymous GET/HEAD, and requests with
+pending flash messages (which the page would display and consume), skip
+the cache. Responses that are not 200, set cookies or use a CSRF token are
+never stored.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .caching import fragment_cache, listing_stamp
+from .conditional import has_pending_messages
+
+
+def _timeout():
+    return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 10 * 60)
+
+
+def page_key(request):
+    raw = f'{request.get_host()}:{request.get_full_path()}'
+    return 'blog-page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def cache_anonymous_page(view):
+    """Serve anonymous GET requests for ``view`` from the page cache"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+            or has_pending_messages(request)
+        ):
+            return view(request, *args, **kwargs)
+
+        uncached = []
+
+        def build():
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            if not _cacheable(request, response):
+                uncached.append(response)
+                return None
+            return response.content, response['Content-Type']
+
+        page = fragment_cache.get_or_build('page', page_key(request), listing_stamp(), build, _timeout())
+        if page is None:
+            return uncached[0]
+        content, content_type = page
+        return HttpResponse(content, content_type=content_type)
+    return wrapper
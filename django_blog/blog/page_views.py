@@ -0,0 +1,182 @@
+"""
+Batched post view counting and the "most viewed" ranking.
+
+Counting a view with ``UPDATE blog_post SET view_count = view_count + 1``
+would turn every post page into a write, and on SQLite every reader would
+queue behind the single writer lock. ``ViewCounter`` instead adds the
+view to an in-process ``Counter`` (a dictionary increment under a lock,
+no query), and a background thread flushes the accumulated counts every
+``BLOG_PAGE_VIEW_FLUSH_INTERVAL`` seconds as one statement::
+
+    UPDATE blog_post SET view_count = view_count + CASE WHEN id = 1 THEN 3 ... END
+    WHERE id IN (1, ...)
+
+Larger backlogs are written ``BLOG_PAGE_VIEW_BATCH_SIZE`` posts per
+statement in one transaction. The increments are relative, so processes
+flushing their own counts never overwrite each other; a failed flush puts
+its counts back for the next one. The flusher is started by the WSGI/ASGI
+entry points (``start()``) and flushes what is left at exit; views counted
+by a process that is killed since its last flush are lost.
+
+Flushed counts also feed the trending ranking (``blog.trending``).
+After each flush the writer reads the ``BLOG_MOST_VIEWED`` posts with the
+most views and stores them in the cache, so ``most_viewed()`` is a cache
+read; it only queries when the ranking is missing from the cache.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Case, F, Value, When
+
+from .models import Post
+from .routing import primary_reads
+from .trending import trending
+
+logger = logging.getLogger(__name__)
+
+RANKING_KEY = 'blog-most-viewed'
+
+
+def _ranking_size():
+    return getattr(settings, 'BLOG_MOST_VIEWED', 10)
+
+
+def _ranking_timeout():
+    return getattr(settings, 'BLOG_MOST_VIEWED_TIMEOUT', 60 * 60)
+
+
+class ViewCounter:
+    """Post views counted in memory and written to ``Post.view_count`` in batches"""
+
+    def __init__(self, flush_interval=None, batch_size=None):
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is None:
+            return getattr(settings, 'BLOG_PAGE_VIEW_FLUSH_INTERVAL', 10)
+        return self._flush_interval
+
+    @property
+    def batch_size(self):
+        return self._batch_size or getattr(settings, 'BLOG_PAGE_VIEW_BATCH_SIZE', 100)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sum(self._counts.values())
+
+    def add(self, post_id, count=1):
+        with self._lock:
+            self._counts[post_id] += count
+
+    def discard(self, post_id):
+        with self._lock:
+            self._counts.pop(post_id, None)
+
+    def start(self):
+        """Flush in a background thread every ``flush_interval`` seconds"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='blog-view-flusher', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        """Stop the flusher after writing the views counted so far"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.flush_interval):
+                close_old_connections()
+                self._flush_logged()
+            self._flush_logged()
+        finally:
+            connection.close()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing post view counts failed; retrying with the next flush')
+
+    def flush(self):
+        """Write the pending counts and refresh the ranking; return the number of views written"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+        items = sorted(counts.items())
+        try:
+            with transaction.atomic():
+                for start in range(0, len(items), self.batch_size):
+                    batch = items[start:start + self.batch_size]
+                    increment = Case(*(When(pk=pk, then=Value(count)) for pk, count in batch), default=Value(0))
+                    # Rows deleted since their views were counted simply do not match
+                    Post.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                        view_count=F('view_count') + increment,
+                    )
+        except Exception:
+            with self._lock:
+                self._counts.update(counts)
+            raise
+        trending.add_views(counts)
+        refresh_ranking()
+        return sum(counts.values())
+
+
+view_counter = ViewCounter()
+
+
+def count_view(view):
+    """Count a view of the post ``pk`` for each GET answered 200 or 304"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            view_counter.add(int(kwargs['pk']))
+        return response
+    return wrapper
+
+
+def refresh_ranking():
+    # Shared through the cache, so never read from a lagging replica
+    with primary_reads():
+        ranking = list(
+            Post.objects.filter(view_count__gt=0)
+            .order_by('-view_count', '-pk')
+            .values('pk', 'title', 'view_count')[:_ranking_size()]
+        )
+    cache.set(RANKING_KEY, ranking, _ranking_timeout())
+    return ranking
+
+
+def most_viewed():
+    """Return ``[{'pk', 'title', 'view_count'}]`` for the most viewed posts, as of the last flush"""
+    ranking = cache.get(RANKING_KEY)
+    if ranking is None:
+        ranking = refresh_ranking()
+    return ranking
+
+
+def invalidate_ranking(post_id):
+    ranking = cache.get(RANKING_KEY)
+    if ranking is not None and any(entry['pk'] == post_id for entry in ranking):
+        cache.delete(RANKING_KEY)
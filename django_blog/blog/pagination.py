@@ -0,0 +1,189 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by an opaque token that encodes the ordering values of
+the last (or first) row of the previous page, so fetching page 5000 costs
+the same as fetching page 1 and no COUNT(*) is needed. A cached,
+approximate count is available on request for templates that want one.
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def _json_default(value):
+    # Full-precision ISO strings: DjangoJSONEncoder drops microseconds, which
+    # would make rows sharing a millisecond fall between two pages.
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+def encode_cursor(values, direction=NEXT):
+    """Pack ordering values and a direction into a URL-safe token"""
+    payload = json.dumps({'v': list(values), 'd': direction}, default=_json_default)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (values, direction) for a token, or (None, NEXT) if it is invalid"""
+    if not token:
+        return None, NEXT
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload['v'], payload['d']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None, NEXT
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        return None, NEXT
+    return values, direction
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Build the Q object selecting rows strictly after ``values`` in
+    ``ordering`` (or strictly before it when ``reverse`` is true), e.g. for
+    ('-published_date', '-pk'):
+    published_date <= d AND (published_date < d OR (published_date = d AND pk < p))
+    The redundant bound on the leading column lets the database seek into
+    the index instead of scanning it from the start.
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[i]})
+        for prior, value in zip(ordering[:i], values[:i]):
+            term &= Q(**{prior.lstrip('-'): value})
+        condition |= term
+    leading = ordering[0]
+    bound = 'lte' if leading.startswith('-') != reverse else 'gte'
+    return Q(**{f'{leading.lstrip("-")}__{bound}': values[0]}) & condition
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class CursorPage:
+    """A page of results plus the tokens for its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, paginator=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.paginator = paginator
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def approximate_count(self):
+        return self.paginator.approximate_count() if self.paginator else len(self.object_list)
+
+
+def build_page(rows, per_page, direction, has_cursor, key, paginator=None):
+    """
+    Turn ``per_page + 1`` fetched rows into a CursorPage. ``rows`` are in
+    display order unless ``direction`` is PREVIOUS, in which case they were
+    fetched backwards and are flipped here. ``key`` maps a row to its
+    ordering values.
+    """
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == PREVIOUS:
+        rows.reverse()
+        has_next, has_previous = has_cursor, has_more
+    else:
+        has_next, has_previous = has_more, has_cursor
+    next_cursor = encode_cursor(key(rows[-1]), NEXT) if rows and has_next else None
+    previous_cursor = encode_cursor(key(rows[0]), PREVIOUS) if rows and has_previous else None
+    return CursorPage(rows, next_cursor, previous_cursor, paginator)
+
+
+class CursorPaginator:
+    """
+    Paginate a queryset by a unique ordering, ('-published_date', '-pk') by
+    default. ``page(token)`` accepts the tokens produced by the previous
+    page; an empty or malformed token returns the first page.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-published_date', '-pk')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.model = queryset.model
+
+    def _to_python(self, values):
+        opts = self.model._meta
+        fields = [
+            opts.pk if name == 'pk' else opts.get_field(name)
+            for name in (field.lstrip('-') for field in self.ordering)
+        ]
+        return [field.to_python(value) for field, value in zip(fields, values)]
+
+    def _key(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def page(self, token=None):
+        values, direction = decode_cursor(token)
+        queryset = self.queryset
+        if values is not None:
+            try:
+                values = self._to_python(values)
+            except (ValidationError, TypeError, ValueError):
+                values = None
+        if values is not None and len(values) == len(self.ordering):
+            reverse = direction == PREVIOUS
+            queryset = queryset.filter(keyset_filter(self.ordering, values, reverse))
+        else:
+            values, direction = None, NEXT
+        ordering = reverse_ordering(self.ordering) if direction == PREVIOUS else self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        return build_page(rows, self.per_page, direction, values is not None, self._key, self)
+
+    def approximate_count(self):
+        """
+        Row count cached for ``BLOG_PAGINATION_COUNT_TIMEOUT`` seconds. On
+        PostgreSQL an unfiltered table uses the planner's estimate instead.
+        """
+        queryset = self.queryset.order_by()
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [self.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        sql = str(queryset.query).encode()
+        key = 'blog-count:' + hashlib.md5(sql).hexdigest()
+        timeout = getattr(settings, 'BLOG_PAGINATION_COUNT_TIMEOUT', 300)
+        return cache.get_or_set(key, queryset.count, timeout)
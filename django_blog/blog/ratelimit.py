@@ -0,0 +1,216 @@
+"""
+Token-bucket rate limiting for write endpoints.
+
+``rate_limit(scope)`` limits writes (POST, PUT, PATCH and DELETE requests)
+to a view using the buckets configured for ``scope`` in
+``BLOG_RATE_LIMITS``, e.g.::
+
+    BLOG_RATE_LIMITS = {'comment': {'user': '10/m', 'ip': '30/m'}}
+
+A rate ``N/period`` (period ``s``, ``m``, ``h`` or ``d``) is a bucket
+holding up to N tokens that refills continuously at N per period, so a
+client may burst N requests and then continues at the average rate: the
+limit applies to any sliding window of one period. Every configured
+bucket must have a token for the request to go through; each attempt
+takes one from every bucket that has one, so a client that keeps
+retrying while limited stays limited.
+
+The check runs before the view, and before the user or anything the view
+reads is loaded: ``ip`` buckets are keyed by the client address and
+``user`` buckets by the signed-in user's id, read from the session, so
+every session and browser of a user shares one bucket. Anonymous
+requests fall back to a bucket per session cookie (requests without one
+are limited by IP only). Behind proxies, set ``BLOG_RATE_LIMIT_IP_HEADER`` (e.g.
+``HTTP_X_FORWARDED_FOR``) and ``BLOG_RATE_LIMIT_TRUSTED_PROXIES`` to the
+number of proxies in front of the app: the address added by the outermost
+of them is used, never an entry the client could have written. Rejected
+requests get a plain-text 429 with ``Retry-After``.
+
+``BLOG_RATE_LIMIT_BACKEND`` picks where buckets live:
+``MemoryBackend`` (default) keeps them in this process, so each worker
+limits on its own; ``CacheBackend`` keeps them in the
+``BLOG_RATE_LIMIT_CACHE`` cache alias, shared by every process using it.
+"""
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+LIMITED_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """Return (capacity, tokens per second) for a rate such as ``'10/m'``"""
+    try:
+        count, period = rate.split('/')
+        count = int(count)
+        seconds = PERIODS[period.strip().lower()[0]]
+    except (ValueError, KeyError, IndexError):
+        raise ImproperlyConfigured(f'Invalid rate limit {rate!r}; expected e.g. "10/m"') from None
+    return count, count / seconds
+
+
+def _limits(scope):
+    return getattr(settings, 'BLOG_RATE_LIMITS', {}).get(scope, {})
+
+
+def _client_ip(request):
+    header = getattr(settings, 'BLOG_RATE_LIMIT_IP_HEADER', 'REMOTE_ADDR')
+    if header != 'REMOTE_ADDR':
+        proxies = getattr(settings, 'BLOG_RATE_LIMIT_TRUSTED_PROXIES', 1)
+        entries = [entry.strip() for entry in request.META.get(header, '').split(',') if entry.strip()]
+        # Each trusted proxy appends the address it got the request from;
+        # anything further left was sent by the client and can be forged
+        if proxies >= 1 and len(entries) >= proxies:
+            return entries[-proxies]
+    return request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+def _user_identity(request):
+    """The signed-in user's id, else a hash of the session cookie, else None"""
+    session = getattr(request, 'session', None)
+    # The session's user id, without loading the User row
+    user_id = session.get(SESSION_KEY) if session is not None else None
+    if user_id is not None:
+        return f'id:{user_id}'
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key:
+        return 'session:' + hashlib.sha256(session_key.encode()).hexdigest()[:32]
+    return None
+
+
+def _identities(request, kinds):
+    """Yield (kind, identity) for each bucket kind that applies to ``request``"""
+    for kind in kinds:
+        if kind == 'ip':
+            yield kind, _client_ip(request)
+        elif kind == 'user':
+            identity = _user_identity(request)
+            if identity:
+                yield kind, identity
+        else:
+            raise ImproperlyConfigured(f'Unknown rate limit bucket {kind!r}; use "user" or "ip"')
+
+
+def _take(tokens, updated, capacity, per_second, now):
+    """Refill a bucket and take one token; return (allowed, tokens, retry_after)"""
+    tokens = min(capacity, tokens + (now - updated) * per_second)
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, (1 - tokens) / per_second
+
+
+class MemoryBackend:
+    """Buckets in a dict local to this process"""
+
+    def __init__(self, max_buckets=100000):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, per_second):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            allowed, tokens, retry_after = _take(tokens, updated, capacity, per_second, now)
+            self._buckets[key] = (tokens, now)
+            # Least recently used first; a bucket idle that long is usually full again
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBackend:
+    """
+    Buckets in a shared cache. Updates are read-modify-write, so concurrent
+    requests for the same bucket in different processes can occasionally
+    both take the last token.
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias or getattr(settings, 'BLOG_RATE_LIMIT_CACHE', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def take(self, key, capacity, per_second):
+        now = time.time()
+        key = f'blog-ratelimit:{key}'
+        tokens, updated = self.cache.get(key, (capacity, now))
+        allowed, tokens, retry_after = _take(tokens, updated, capacity, per_second, now)
+        # Expire once the bucket would be full again anyway
+        self.cache.set(key, (tokens, now), math.ceil((capacity - tokens) / per_second) + 1)
+        return allowed, retry_after
+
+
+def get_rate_limit_backend():
+    """The configured backend; one instance per process so memory buckets persist"""
+    path = getattr(settings, 'BLOG_RATE_LIMIT_BACKEND', 'blog.ratelimit.MemoryBackend')
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
+
+
+def check(request, scope):
+    """Take a token from each of the request's buckets for ``scope``; return seconds to wait, or 0"""
+    limits = _limits(scope)
+    if request.method not in LIMITED_METHODS or not limits:
+        return 0
+    backend = get_rate_limit_backend()
+    wait = 0
+    for kind, identity in _identities(request, limits):
+        capacity, per_second = parse_rate(limits[kind])
+        allowed, retry_after = backend.take(f'{scope}:{kind}:{identity}', capacity, per_second)
+        if not allowed:
+            wait = max(wait, retry_after)
+    return wait
+
+
+def _too_many_requests(wait):
+    response = HttpResponse('Too many requests, please slow down.', status=429, content_type='text/plain')
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def rate_limit(scope):
+    """Answer 429 to writes beyond the ``BLOG_RATE_LIMITS[scope]`` buckets before calling the view"""
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Reading the user id may load the session from the database
+                wait = await sync_to_async(check)(request, scope)
+                if wait:
+                    return _too_many_requests(wait)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            wait = check(request, scope)
+            if wait:
+                return _too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,259 @@
+"""
+Related posts ranked by weighted tag overlap.
+
+Two posts are scored with a weighted Jaccard index over their tags, each
+tag weighted by its inverse document frequency ``log(1 + N / df)``, so
+sharing a rare tag counts for more than sharing a common one. Only the
+best ``BLOG_RELATED_POSTS`` (default 10) matches per post are stored in
+``RelatedPost``; the detail page reads its panel with one indexed query.
+
+Tags used by more than ``BLOG_RELATED_MAX_TAG_POSTS`` posts carry little
+weight and would make most posts candidates for each other, so they are
+not used to find candidates (they still count towards the union).
+
+When a post's tags change (see ``blog.signals``) its own list is rebuilt
+after the transaction commits, and it is inserted into or removed from
+the lists of the posts it overlaps. A post that drops out of another
+post's list is not replaced until the next full rebuild, and IDF weights
+drift as tags are used, so ``python manage.py rebuild_related_posts``
+should run periodically. The full rebuild is vectorized with NumPy when
+it is installed and falls back to pure Python otherwise.
+"""
+import heapq
+import math
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import itemgetter, or_
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+
+from . import tag_stats
+from .models import Post, RelatedPost
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+CHUNK_SIZE = 500
+
+_local = threading.local()
+
+
+def _limit():
+    return getattr(settings, 'BLOG_RELATED_POSTS', 10)
+
+
+def _max_tag_posts():
+    return getattr(settings, 'BLOG_RELATED_MAX_TAG_POSTS', 1000)
+
+
+def idf(total_posts, tag_posts):
+    return math.log(1 + total_posts / max(tag_posts, 1))
+
+
+def _tagged():
+    return Post.tags.through.objects.filter(content_type=ContentType.objects.get_for_model(Post))
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def related_posts(post, limit=None):
+    """Return up to ``limit`` related posts for ``post``, best match first"""
+    entries = (
+        RelatedPost.objects.filter(post=post)
+        .select_related('related')
+        .only('related__title', 'related__published_date')
+        .order_by('-score', '-related_id')[:limit or _limit()]
+    )
+    return [entry.related for entry in entries]
+
+
+def schedule(post_id):
+    """Recompute ``post_id`` once the current transaction commits"""
+    # Tag edits send several m2m signals per save; collapse them into one run
+    _local.__dict__.setdefault('pending', set()).add(post_id)
+    transaction.on_commit(_run_pending)
+
+
+def _run_pending():
+    for post_id in _local.__dict__.pop('pending', ()):
+        update_post(post_id)
+
+
+def scores_for(post_id):
+    """Return {other post id: score} for every post sharing a tag with ``post_id``"""
+    counts = {tag_id: count for tag_id, count in tag_stats.snapshot().values()}
+    total = Post.objects.count()
+    weights = defaultdict(lambda: idf(total, 1), {t: idf(total, count) for t, count in counts.items()})
+    tagged = _tagged()
+    tags = list(tagged.filter(object_id=post_id).values_list('tag_id', flat=True))
+    searchable = [tag_id for tag_id in tags if counts.get(tag_id, 0) <= _max_tag_posts()]
+
+    shared = defaultdict(float)
+    candidates = tagged.filter(tag_id__in=searchable).exclude(object_id=post_id)
+    for other, tag_id in candidates.values_list('object_id', 'tag_id').iterator():
+        shared[other] += weights[tag_id]
+    totals = defaultdict(float)
+    for chunk in _chunks(shared):
+        for other, tag_id in tagged.filter(object_id__in=chunk).values_list('object_id', 'tag_id'):
+            totals[other] += weights[tag_id]
+
+    own = sum(weights[tag_id] for tag_id in tags)
+    return {other: weight / (own + totals[other] - weight) for other, weight in shared.items()}
+
+
+def update_post(post_id):
+    """Rebuild ``post_id``'s related list and its entries in other posts' lists"""
+    limit = _limit()
+    scores = scores_for(post_id)
+    with transaction.atomic():
+        RelatedPost.objects.filter(Q(post_id=post_id) | Q(related_id=post_id)).delete()
+        if not Post.objects.filter(pk=post_id).exists():
+            return
+        best = heapq.nlargest(limit, scores.items(), key=itemgetter(1, 0))
+        rows = [RelatedPost(post_id=post_id, related_id=other, score=score) for other, score in best]
+
+        lists = defaultdict(list)
+        for chunk in _chunks(scores):
+            entries = RelatedPost.objects.filter(post_id__in=chunk)
+            for owner, related_id, score in entries.values_list('post_id', 'related_id', 'score'):
+                lists[owner].append((score, related_id))
+        evicted = []
+        for other, score in scores.items():
+            entries = lists[other]
+            if len(entries) >= limit:
+                lowest = min(entries)
+                if (score, post_id) <= lowest:
+                    continue
+                evicted.append(Q(post_id=other, related_id=lowest[1]))
+            rows.append(RelatedPost(post_id=other, related_id=post_id, score=score))
+        for chunk in _chunks(evicted, 200):
+            RelatedPost.objects.filter(reduce(or_, chunk)).delete()
+        RelatedPost.objects.bulk_create(rows)
+
+
+def _python_rows(pairs, weights, limit, max_tag_posts):
+    tags_of = defaultdict(list)
+    posts_of = defaultdict(list)
+    for post_id, tag_id in pairs:
+        tags_of[post_id].append(tag_id)
+        posts_of[tag_id].append(post_id)
+    totals = {post_id: sum(weights[tag_id] for tag_id in tags) for post_id, tags in tags_of.items()}
+    for post_id, tags in tags_of.items():
+        shared = defaultdict(float)
+        for tag_id in tags:
+            posts = posts_of[tag_id]
+            if len(posts) > max_tag_posts:
+                continue
+            weight = weights[tag_id]
+            for other in posts:
+                shared[other] += weight
+        shared.pop(post_id, None)
+        own = totals[post_id]
+        scored = ((weight / (own + totals[other] - weight), other) for other, weight in shared.items())
+        for score, other in heapq.nlargest(limit, scored):
+            yield post_id, other, score
+
+
+def _numpy_rows(pairs, weights, limit, max_tag_posts, block_size=1000):
+    np = numpy
+    pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    post_ids, post_idx = np.unique(pairs[:, 0], return_inverse=True)
+    tag_ids, tag_idx = np.unique(pairs[:, 1], return_inverse=True)
+    n = len(post_ids)
+    tag_weight = np.array([weights[tag_id] for tag_id in tag_ids.tolist()])
+    totals = np.bincount(post_idx, weights=tag_weight[tag_idx], minlength=n)
+    df = np.bincount(tag_idx, minlength=len(tag_ids))
+
+    # Posting lists (posts per tag) in CSR form
+    tag_posts = post_idx[np.argsort(tag_idx, kind='stable')]
+    tag_ptr = np.concatenate(([0], np.cumsum(df)))
+
+    # (post, tag) entries that generate candidates, grouped by post
+    usable = df[tag_idx] <= max_tag_posts
+    order = np.argsort(post_idx[usable], kind='stable')
+    src_post = post_idx[usable][order]
+    src_tag = tag_idx[usable][order]
+
+    for start in range(0, n, block_size):
+        lo, hi = np.searchsorted(src_post, [start, start + block_size])
+        posts, tags = src_post[lo:hi], src_tag[lo:hi]
+        lengths = df[tags]
+        count = int(lengths.sum())
+        if not count:
+            continue
+        # Expand every (post, tag) entry into (post, other post sharing the tag)
+        src = np.repeat(posts, lengths)
+        offsets = np.repeat(tag_ptr[tags] - (np.cumsum(lengths) - lengths), lengths) + np.arange(count)
+        dst = tag_posts[offsets]
+        weight = np.repeat(tag_weight[tags], lengths)
+        keep = src != dst
+        keys = src[keep] * n + dst[keep]
+        weight = weight[keep]
+        if not len(keys):
+            # Every candidate in the block was the post itself
+            continue
+
+        # Sum shared weight per pair
+        order = np.argsort(keys, kind='stable')
+        keys, weight = keys[order], weight[order]
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        shared = np.add.reduceat(weight, first)
+        keys = keys[first]
+        a, b = keys // n, keys % n
+        score = shared / (totals[a] + totals[b] - shared)
+
+        # Best ``limit`` per post: score descending, higher post id on ties.
+        # Scores are in (0, 1], so ``2a - score`` orders by post, then score;
+        # reversing first makes the stable sort keep higher ids ahead on ties.
+        a, b, score = a[::-1], b[::-1], score[::-1]
+        order = np.argsort(a * 2.0 - score, kind='stable')
+        a, b, score = a[order], b[order], score[order]
+        starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+        rank = np.arange(len(a)) - np.repeat(starts, np.diff(np.r_[starts, len(a)]))
+        keep = rank < limit
+        yield from zip(
+            post_ids[a[keep]].tolist(), post_ids[b[keep]].tolist(), score[keep].tolist(),
+        )
+
+
+def build_rows(use_numpy=None):
+    """Yield (post id, related post id, score) for the whole table"""
+    pairs = list(_tagged().values_list('object_id', 'tag_id').iterator())
+    if not pairs:
+        return iter(())
+    df = defaultdict(int)
+    for _, tag_id in pairs:
+        df[tag_id] += 1
+    total = Post.objects.count()
+    weights = {tag_id: idf(total, count) for tag_id, count in df.items()}
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    builder = _numpy_rows if use_numpy else _python_rows
+    return builder(pairs, weights, _limit(), _max_tag_posts())
+
+
+def rebuild(batch_size=5000, use_numpy=None):
+    """Recompute every RelatedPost row; return the number of rows written"""
+    written = 0
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        batch = []
+        for post_id, related_id, score in build_rows(use_numpy):
+            batch.append(RelatedPost(post_id=post_id, related_id=related_id, score=score))
+            if len(batch) >= batch_size:
+                RelatedPost.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        RelatedPost.objects.bulk_create(batch)
+        written += len(batch)
+    return written
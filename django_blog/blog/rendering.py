@@ -0,0 +1,170 @@
+"""
+Rendered post and comment content.
+
+Post and comment bodies are rendered once, when they are saved, into
+``content_html`` (shown on detail pages and in feeds) and ``excerpt``
+(plain text, the first ``BLOG_EXCERPT_WORDS`` words, shown on listing
+cards), so templates no longer run ``linebreaks`` and ``truncatewords``
+on every view.
+
+By default the text is rendered like the ``linebreaks`` filter: escaped,
+with paragraphs and line breaks. With ``BLOG_MARKDOWN = True`` and the
+``markdown`` package installed it is rendered as Markdown instead, and
+the result is passed through ``sanitize``, which keeps an allowlist of
+tags and attributes, so raw HTML in a post cannot inject scripts.
+
+Code that writes rows without ``Model.save()`` (bulk inserts and
+updates) calls ``render_fields``. After changing these settings, or for
+rows written before the columns existed, ``python manage.py
+rebuild_rendered_content`` re-renders everything in batches.
+"""
+from html import escape, unescape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils.html import linebreaks, strip_tags
+from django.utils.text import Truncator
+
+try:
+    import markdown
+except ImportError:  # pragma: no cover - optional dependency
+    markdown = None
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'del', 'em', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'strong',
+    'sub', 'sup', 'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'img': {'src', 'alt', 'title'},
+    'td': {'align'},
+    'th': {'align'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto'}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Elements dropped together with everything inside them
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'textarea'}
+
+
+def _use_markdown():
+    return getattr(settings, 'BLOG_MARKDOWN', False) and markdown is not None
+
+
+def _excerpt_words():
+    return getattr(settings, 'BLOG_EXCERPT_WORDS', 30)
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        kept = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and urlsplit(value.strip()).scheme.lower() not in ALLOWED_SCHEMES:
+                continue
+            kept.append(f' {name}="{escape(value)}"')
+        if tag == 'a':
+            kept.append(' rel="nofollow"')
+        self.parts.append(f'<{tag}{"".join(kept)}>')
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open and self.open[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open:
+            return
+        # Close anything left open inside this element
+        while self.open:
+            name = self.open.pop()
+            self.parts.append(f'</{name}>')
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        return ''.join(self.parts + [f'</{name}>' for name in reversed(self.open)])
+
+
+def sanitize(html):
+    """Keep only allowlisted tags, attributes and URL schemes; escape everything else"""
+    parser = _Sanitizer()
+    parser.feed(html)
+    return parser.result()
+
+
+def render_html(text):
+    """Render a post or comment body to safe HTML"""
+    if _use_markdown():
+        return sanitize(markdown.markdown(text, extensions=['extra', 'sane_lists']))
+    return linebreaks(text, autoescape=True)
+
+
+def render_excerpt(text, html=None):
+    """Plain-text excerpt: the first ``BLOG_EXCERPT_WORDS`` words of the body"""
+    if _use_markdown():
+        text = unescape(strip_tags(html if html is not None else render_html(text)))
+    return Truncator(text).words(_excerpt_words(), truncate=' …')
+
+
+def render_fields(obj):
+    """Fill ``content_html`` and ``excerpt`` on a Post or Comment from its content"""
+    obj.content_html = render_html(obj.content)
+    obj.excerpt = render_excerpt(obj.content, obj.content_html)
+    return obj
+
+
+def rerender(model, batch_size=1000, using=None):
+    """
+    Re-render ``content_html`` and ``excerpt`` for every row of ``model``,
+    ``batch_size`` rows per UPDATE batch, walking the primary key. Yields
+    the running number of rows updated after each batch.
+    """
+    connection = connections[using or router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} = %s, {} = %s WHERE {} = %s'.format(
+        quote(model._meta.db_table), quote('content_html'), quote('excerpt'), quote(model._meta.pk.column),
+    )
+    rows = model._base_manager.using(connection.alias).order_by('pk').values_list('pk', 'content')
+    last = None
+    updated = 0
+    while True:
+        batch = list((rows if last is None else rows.filter(pk__gt=last))[:batch_size])
+        if not batch:
+            return
+        params = []
+        for pk, content in batch:
+            html = render_html(content)
+            params.append((html, render_excerpt(content, html), pk))
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        last = batch[-1][0]
+        updated += len(batch)
+        yield updated
@@ -0,0 +1,141 @@
+"""
+Read-replica routing.
+
+Views decorated with ``replica_reads`` run their queries, and render their
+template, against one of the aliases in ``BLOG_READ_REPLICAS`` (picked
+once per request so every query sees the same snapshot). Everything else,
+and every write, uses ``default``. Sessions are always read from the
+primary because a login writes the row the next request reads.
+
+Replicas lag behind the primary, so after a client writes it is pinned to
+the primary for ``BLOG_REPLICA_PIN_SECONDS`` (default 5): ``ReplicaPinMiddleware``
+sets a cookie holding the time the pin expires on responses to unsafe
+requests and to any request that wrote, and ``replica_reads`` ignores the
+replicas while the cookie is valid.
+
+Shared caches must not be filled with data older than the change that
+invalidated them: cache fillers read through ``primary_reads()``, and
+fragments or ETags whose stamp is younger than the pin window are not
+stored or sent while reading from a replica (``may_be_stale``).
+
+With no replicas configured the router and decorator change nothing.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'blog_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias chosen by replica_reads for the current request, if any
+_read_alias = ContextVar('blog_read_alias', default=None)
+# Set by ReplicaPinMiddleware; records whether the request wrote
+_writes = ContextVar('blog_writes', default=None)
+
+
+def _replicas():
+    return getattr(settings, 'BLOG_READ_REPLICAS', [])
+
+
+def _pin_seconds():
+    return getattr(settings, 'BLOG_REPLICA_PIN_SECONDS', 5)
+
+
+def is_pinned(request):
+    """True while the client's pin-to-primary cookie has not expired"""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def may_be_stale(*stamps):
+    """
+    True if this request reads from a replica and one of ``stamps`` (cache
+    stamps in nanoseconds, see ``blog.caching``) is recent enough that the
+    replica may not have the change behind it yet.
+    """
+    if _read_alias.get() is None:
+        return False
+    cutoff = time.time_ns() - _pin_seconds() * 10 ** 9
+    return any(stamp > cutoff for stamp in stamps)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, e.g. to fill a shared cache"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def replica_reads(view):
+    """Send the view's reads to a replica unless the client is pinned to the primary"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replicas = _replicas()
+        if not replicas or request.method not in SAFE_METHODS or is_pinned(request):
+            return view(request, *args, **kwargs)
+        token = _read_alias.set(random.choice(replicas))
+        try:
+            response = view(request, *args, **kwargs)
+            # Template responses query lazily; render while still routed
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Routes reads inside ``replica_reads`` views to a replica and all writes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.app_label == 'sessions':
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None:
+            writes.append(model._meta.label)
+        # Objects read from a replica must still be saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Pin clients that just wrote to the primary for ``BLOG_REPLICA_PIN_SECONDS``"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = []
+        token = _writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _writes.reset(token)
+        if _replicas() and (writes or request.method not in SAFE_METHODS):
+            seconds = _pin_seconds()
+            response.set_cookie(
+                PIN_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds,
+                httponly=True, samesite='Lax',
+            )
+        return response
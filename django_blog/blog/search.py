@@ -0,0 +1,325 @@
+"""
+Full-text search for blog posts.
+
+Posts are indexed into an inverted index that is kept up to date by the
+signal handlers in ``blog.signals``. SQLite uses an FTS5 virtual table and
+PostgreSQL a ``tsvector`` column with a GIN index; any other database falls
+back to the original ``icontains`` search.
+
+The backend can be forced with the ``BLOG_SEARCH_BACKEND`` setting, e.g.
+``'blog.search.LikeSearchBackend'``.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .pagination import NEXT, PREVIOUS, build_page, decode_cursor, keyset_filter
+
+FTS_TABLE = 'blog_post_fts'
+PG_TABLE = 'blog_post_search'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split a user query into lowercase word tokens, dropping operators"""
+    return TOKEN_RE.findall(query.lower())
+
+
+def tags_by_post(post_ids):
+    """Return {post_id: [tag names]} for the given posts in one query"""
+    tags = {}
+    rows = Post.tags.through.objects.filter(
+        content_type__app_label='blog',
+        content_type__model='post',
+        object_id__in=post_ids,
+    ).values_list('object_id', 'tag__name')
+    for post_id, name in rows:
+        tags.setdefault(post_id, []).append(name)
+    return tags
+
+
+def tag_names_by_post(post_ids):
+    """Return {post_id: 'tag1 tag2'} for the given posts in one query"""
+    return {post_id: ' '.join(tags) for post_id, tags in tags_by_post(post_ids).items()}
+
+
+class BaseSearchBackend:
+    """Interface shared by all search backends"""
+    using = 'default'
+
+    @property
+    def read_using(self):
+        """Alias searches read from: a replica inside ``replica_reads`` views"""
+        return router.db_for_read(Post)
+
+    def index_post(self, post):
+        """Add or refresh a single post in the index"""
+
+    def remove_post(self, pk):
+        """Drop a post from the index"""
+
+    def rebuild(self, batch_size=1000):
+        """Re-index every post"""
+
+    def search(self, query, limit=10):
+        """Return the pks of the best ``limit`` posts matching ``query``"""
+        return [pk for pk, key in self.search_page(query, limit)]
+
+    def search_page(self, query, limit=10, after=None, reverse=False):
+        """
+        Return up to ``limit`` (pk, key) hits in rank order, starting strictly
+        after the hit whose key is ``after`` (or walking backwards from it when
+        ``reverse`` is true). Keys are JSON-serializable and opaque to callers.
+        """
+        raise NotImplementedError
+
+    def parse_key(self, values):
+        """Validate a key taken from a client cursor, raising ValueError if bad"""
+        score, pk = values
+        return [float(score), int(pk)]
+
+    def count(self, query):
+        """Return the total number of posts matching ``query``"""
+        raise NotImplementedError
+
+    def _documents(self, batch_size):
+        """Yield lists of (pk, title, content, tags) tuples for all posts"""
+        queryset = Post.objects.order_by('pk').values_list('pk', 'title', 'content')
+        batch = []
+        for row in queryset.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield self._with_tags(batch)
+                batch = []
+        if batch:
+            yield self._with_tags(batch)
+
+    def _with_tags(self, rows):
+        tags = tag_names_by_post([row[0] for row in rows])
+        return [(pk, title, content, tags.get(pk, '')) for pk, title, content in rows]
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Unindexed ``icontains`` search across title, content and tag names"""
+    ordering = ['-published_date', '-pk']
+
+    def _queryset(self, query):
+        return Post.objects.filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(tags__name__icontains=query)
+        ).distinct().order_by(*self.ordering)
+
+    def search_page(self, query, limit=10, after=None, reverse=False):
+        if not query:
+            return []
+        queryset = self._queryset(query)
+        if after is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, after, reverse))
+        if reverse:
+            queryset = queryset.order_by('published_date', 'pk')
+        rows = queryset.values_list('pk', 'published_date')[:limit]
+        return [(pk, [published.isoformat(), pk]) for pk, published in rows]
+
+    def parse_key(self, values):
+        published, pk = values
+        published = parse_datetime(published)
+        if published is None:
+            raise ValueError('Invalid published_date in cursor')
+        return [published, int(pk)]
+
+    def count(self, query):
+        if not query:
+            return 0
+        return self._queryset(query).count()
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 index ranked with bm25 (title > tags > content)"""
+    rank = f'bm25({FTS_TABLE}, 10.0, 1.0, 5.0)'
+
+    def match_expression(self, query):
+        # Every token becomes a quoted prefix query so that user input can
+        # never be parsed as FTS5 syntax; tokens are implicitly ANDed.
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def index_post(self, post):
+        tags = ' '.join(post.tags.names())
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)',
+                [post.pk, post.title, post.content, tags],
+            )
+
+    def remove_post(self, pk):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+    def rebuild(self, batch_size=1000):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for batch in self._documents(batch_size):
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)',
+                    batch,
+                )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+    def search_page(self, query, limit=10, after=None, reverse=False):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        # bm25 is lower-is-better, so hits are ordered by ascending score
+        sql = f'SELECT rowid, {self.rank} AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [match]
+        if after is not None:
+            op = '<' if reverse else '>'
+            sql = (
+                f'SELECT rowid, score FROM ({sql}) '
+                f'WHERE score {op} %s OR (score = %s AND rowid {op} %s)'
+            )
+            params += [after[0], after[0], after[1]]
+        direction = 'DESC' if reverse else 'ASC'
+        sql += f' ORDER BY score {direction}, rowid {direction} LIMIT %s'
+        with connections[self.read_using].cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [(pk, [score, pk]) for pk, score in cursor.fetchall()]
+
+    def count(self, query):
+        match = self.match_expression(query)
+        if not match:
+            return 0
+        with connections[self.read_using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [match],
+            )
+            return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """PostgreSQL ``tsvector`` index ranked with ts_rank_cd"""
+    config = 'english'
+    document = (
+        "setweight(to_tsvector(%(config)s, %(title)s), 'A') || "
+        "setweight(to_tsvector(%(config)s, %(tags)s), 'B') || "
+        "setweight(to_tsvector(%(config)s, %(content)s), 'C')"
+    )
+
+    def tsquery(self, query):
+        return ' & '.join(f'{token}:*' for token in tokenize(query))
+
+    def _upsert(self, cursor, pk, title, content, tags):
+        cursor.execute(
+            f'INSERT INTO {PG_TABLE} (post_id, document) VALUES (%(pk)s, {self.document}) '
+            f'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+            {'pk': pk, 'config': self.config, 'title': title, 'content': content, 'tags': tags},
+        )
+
+    def index_post(self, post):
+        with connections[self.using].cursor() as cursor:
+            self._upsert(cursor, post.pk, post.title, post.content, ' '.join(post.tags.names()))
+
+    def remove_post(self, pk):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {PG_TABLE} WHERE post_id = %s', [pk])
+
+    def rebuild(self, batch_size=1000):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'TRUNCATE {PG_TABLE}')
+            for batch in self._documents(batch_size):
+                for row in batch:
+                    self._upsert(cursor, *row)
+
+    def search_page(self, query, limit=10, after=None, reverse=False):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return []
+        # Negate the rank so that, as with bm25, lower scores sort first
+        sql = (
+            f'SELECT post_id, -ts_rank_cd(document, q)::float8 AS score '
+            f'FROM {PG_TABLE}, to_tsquery(%s, %s) q WHERE document @@ q'
+        )
+        params = [self.config, tsquery]
+        if after is not None:
+            op = '<' if reverse else '>'
+            sql = (
+                f'SELECT post_id, score FROM ({sql}) hits '
+                f'WHERE score {op} %s OR (score = %s AND post_id {op} %s)'
+            )
+            params += [after[0], after[0], after[1]]
+        direction = 'DESC' if reverse else 'ASC'
+        sql += f' ORDER BY score {direction}, post_id {direction} LIMIT %s'
+        with connections[self.read_using].cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [(pk, [score, pk]) for pk, score in cursor.fetchall()]
+
+    def count(self, query):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return 0
+        with connections[self.read_using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {PG_TABLE} WHERE document @@ to_tsquery(%s, %s)',
+                [self.config, tsquery],
+            )
+            return cursor.fetchone()[0]
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    """Return the configured backend, defaulting to the one for the database vendor"""
+    path = getattr(settings, 'BLOG_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    vendor = connections['default'].vendor
+    return VENDOR_BACKENDS.get(vendor, LikeSearchBackend)()
+
+
+class SearchPaginator:
+    """
+    Keyset paginator over search hits, producing the same CursorPage objects
+    as ``blog.pagination.CursorPaginator``. Only one page of hits is read
+    from the index per request; the total is counted on demand and cached.
+    """
+
+    def __init__(self, query, per_page, backend=None, queryset=None):
+        self.query = query
+        self.per_page = per_page
+        self.backend = backend or get_search_backend()
+        self.queryset = queryset if queryset is not None else Post.objects.all()
+
+    def page(self, token=None):
+        values, direction = decode_cursor(token)
+        if values is not None:
+            try:
+                values = self.backend.parse_key(values)
+            except (TypeError, ValueError):
+                values, direction = None, NEXT
+        hits = self.backend.search_page(
+            self.query, self.per_page + 1, after=values, reverse=direction == PREVIOUS,
+        )
+        page = build_page(hits, self.per_page, direction, values is not None, lambda hit: hit[1], self)
+        pks = [pk for pk, key in page.object_list]
+        posts = self.queryset.in_bulk(pks)
+        page.object_list = [posts[pk] for pk in pks if pk in posts]
+        return page
+
+    def approximate_count(self):
+        digest = hashlib.md5(f'{type(self.backend).__name__}:{self.query}'.encode()).hexdigest()
+        timeout = getattr(settings, 'BLOG_PAGINATION_COUNT_TIMEOUT', 300)
+        return cache.get_or_set(f'blog-search-count:{digest}', lambda: self.backend.count(self.query), timeout)
@@ -0,0 +1,199 @@
+"""
+Signal handlers that keep derived blog data (search index, counters,
+caches) in sync with Post, Comment and tag changes.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from taggit.models import Tag
+
+from . import author_stats, authors, page_views, related, tag_stats
+from .autocomplete import autocomplete
+from .caching import bump_listing_stamp, fragment_cache
+from .models import Comment, Post
+from .search import get_search_backend
+from .trending import trending
+
+
+@receiver(post_save, sender=Post)
+def index_post_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index_post(instance)
+    fragment_cache.invalidate(instance.pk)
+    bump_listing_stamp()
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_index(sender, instance, **kwargs):
+    get_search_backend().remove_post(instance.pk)
+    fragment_cache.invalidate(instance.pk)
+    bump_listing_stamp()
+
+
+@receiver(post_save, sender=Post)
+def refresh_most_viewed_on_edit(sender, instance, created, **kwargs):
+    # The ranking shows titles; new posts have no views yet
+    if not created:
+        page_views.invalidate_ranking(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def forget_post_views(sender, instance, **kwargs):
+    page_views.view_counter.discard(instance.pk)
+    page_views.invalidate_ranking(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_post_on_tag_change(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        get_search_backend().index_post(instance)
+        fragment_cache.invalidate(instance.pk)
+        bump_listing_stamp()
+
+
+@receiver(post_save, sender=User)
+def invalidate_fragments_on_user_change(sender, instance, update_fields=None, **kwargs):
+    # Cards show author usernames; logins only touch last_login
+    if update_fields is None or 'username' in update_fields:
+        fragment_cache.invalidate_all()
+        bump_listing_stamp()
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    posts = Post.objects.filter(pk=instance.post_id)
+    if created:
+        posts.update(comment_count=F('comment_count') + 1, comment_activity_at=timezone.now())
+    else:
+        posts.update(comment_activity_at=timezone.now())
+
+
+@receiver(post_save, sender=Comment)
+def increment_reply_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.parent_id:
+        Comment.objects.filter(pk=instance.parent_id).update(reply_count=F('reply_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_reply_count(sender, instance, **kwargs):
+    # When a whole subtree is deleted the parent may already be gone
+    if instance.parent_id:
+        Comment.objects.filter(pk=instance.parent_id, reply_count__gt=0).update(reply_count=F('reply_count') - 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    posts = Post.objects.filter(pk=instance.post_id)
+    posts.update(comment_activity_at=timezone.now())
+    posts.filter(comment_count__gt=0).update(comment_count=F('comment_count') - 1)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_tag_stats(sender, instance, action, pk_set=None, **kwargs):
+    if not isinstance(instance, Post):
+        return
+    if action == 'post_add':
+        tag_stats.adjust(pk_set, 1)
+    elif action == 'post_remove':
+        tag_stats.adjust(pk_set, -1)
+    elif action == 'pre_clear':
+        # clear() does not report which tags it removes, so remember them
+        instance._cleared_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        tag_stats.adjust(getattr(instance, '_cleared_tag_ids', ()), -1)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_related_posts(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        related.schedule(instance.pk)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_tags_before_delete(sender, instance, **kwargs):
+    # Deleting a post removes its TaggedItem rows without m2m signals
+    instance._deleted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def update_tag_stats_on_delete(sender, instance, **kwargs):
+    tag_stats.adjust(getattr(instance, '_deleted_tag_ids', ()), -1)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_on_tag_change(sender, created=False, **kwargs):
+    tag_stats.invalidate()
+    # Cards and post bodies show tag names; a new tag is on no cached page yet
+    if not created:
+        fragment_cache.invalidate_all()
+        bump_listing_stamp()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_cache(sender, instance, **kwargs):
+    authors.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def suggest_post_title(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pk, title = instance.pk, instance.title
+        transaction.on_commit(lambda: autocomplete.add_post(pk, title))
+
+
+@receiver(post_delete, sender=Post)
+def forget_post_title(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.remove_post(pk))
+
+
+@receiver(post_save, sender=Tag)
+def suggest_tag_name(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pk, name = instance.pk, instance.name
+        transaction.on_commit(lambda: autocomplete.add_tag(pk, name))
+
+
+@receiver(post_delete, sender=Tag)
+def forget_tag_name(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.remove_tag(pk))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def count_author_writes(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        field = 'posts' if sender is Post else 'comments'
+        author_stats.adjust(instance.author_id, **{field: 1})
+    else:
+        author_stats.adjust(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def uncount_author_writes(sender, instance, **kwargs):
+    field = 'posts' if sender is Post else 'comments'
+    author_stats.adjust(instance.author_id, active=False, **{field: -1})
+
+
+@receiver(post_save, sender=Comment)
+def count_trending_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        events = [(instance.post_id, instance.created_at)]
+        transaction.on_commit(lambda: trending.add_comments(events))
+
+
+@receiver(post_delete, sender=Post)
+def forget_trending_post(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: trending.remove_post(pk))
@@ -0,0 +1,210 @@
+"""
+Sitemap index for the posts, sharded and cached on disk.
+
+Posts are split into shards by primary key, ``BLOG_SITEMAP_SHARD_SIZE``
+(the protocol's limit of 50,000) per shard, so a post always stays in the
+same shard and a change rewrites only that shard's file. The shards to
+write are streamed in one ``values_list('pk', 'updated_at').iterator()``
+query, each into a temporary file in ``BLOG_SITEMAP_DIR`` that then
+replaces the old one, and served from disk with the latest ``updated_at``
+in them as Last-Modified.
+
+URLs are built from ``BLOG_SITEMAP_BASE_URL``, the site's canonical scheme
+and host. Without it they use the requested scheme and host, and every
+base URL gets its own directory of files, so requests for different hosts
+never invalidate each other's shards (``ALLOWED_HOSTS`` bounds how many).
+
+Which shards changed is decided from a fingerprint per shard: post count,
+sum of pks and latest ``updated_at``, read for all shards with one GROUP
+BY query. A manifest next to the files records the fingerprints the files
+were written for. Post saves, deletes and imports replace the listing stamp
+(``blog.caching``), so each process compares fingerprints only once per
+listing stamp: while it is unchanged a request reads nothing but the
+manifest, and after a change only shards whose fingerprint differs are
+written again, by whichever process notices first.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime
+from itertools import groupby, islice
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Max, Q, Sum
+from django.urls import reverse
+from django.utils.feedgenerator import rfc3339_date
+from django.views.decorators.http import condition
+
+from .caching import listing_stamp
+from .models import Post
+from .routing import primary_reads
+
+MANIFEST = 'manifest.json'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+# Reversed once and formatted per post: 50,000 reverse() calls per shard add up
+PK_PLACEHOLDER = 2147483647
+
+# One thread writes the files at a time; other processes writing the same
+# shard only repeat the work, since each file is replaced in one rename
+_lock = threading.Lock()
+# {base url: listing stamp} this process last compared fingerprints for
+_checked = {}
+
+
+def _root():
+    return str(getattr(settings, 'BLOG_SITEMAP_DIR', os.path.join(settings.BASE_DIR, 'sitemaps')))
+
+
+def _directory(base_url):
+    return os.path.join(_root(), re.sub(r'[^a-z0-9.-]+', '_', base_url.lower()))
+
+
+def base_url(request):
+    """Scheme and host the sitemap URLs start with, without a trailing slash"""
+    configured = getattr(settings, 'BLOG_SITEMAP_BASE_URL', '')
+    return (configured or f'{request.scheme}://{request.get_host()}').rstrip('/')
+
+
+def _shard_size():
+    return getattr(settings, 'BLOG_SITEMAP_SHARD_SIZE', 50000)
+
+
+def _chunk_size():
+    return getattr(settings, 'BLOG_SITEMAP_CHUNK_SIZE', 2000)
+
+
+def shard_path(shard, base_url):
+    return os.path.join(_directory(base_url), f'sitemap-{shard}.xml')
+
+
+def shard_fingerprints(size):
+    """Return {shard: [post count, pk sum, latest updated_at]} for every non-empty shard"""
+    shard = ExpressionWrapper((F('pk') - 1) / size, output_field=IntegerField())
+    rows = (
+        Post.objects.order_by().annotate(shard=shard).values('shard')
+        .annotate(count=Count('pk'), pks=Sum('pk'), latest=Max('updated_at'))
+        .values_list('shard', 'count', 'pks', 'latest')
+    )
+    return {str(shard): [count, pks, rfc3339_date(latest)] for shard, count, pks, latest in rows}
+
+
+def _write_atomic(path, write):
+    """Call ``write(stream)`` on a temporary file, then rename it to ``path``"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as stream:
+            write(stream)
+        # mkstemp() files are private; let a front-end server read them too
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write_shards(shards, size, base_url):
+    """Stream the posts of ``shards`` in one query, writing each shard's file in turn"""
+    url = base_url + reverse('blog:post_detail', args=[PK_PLACEHOLDER]).replace(str(PK_PLACEHOLDER), '{}', 1)
+    ranges = Q()
+    for shard in shards:
+        ranges |= Q(pk__gt=shard * size, pk__lte=(shard + 1) * size)
+    rows = Post.objects.filter(ranges).order_by('pk').values_list('pk', 'updated_at').iterator(chunk_size=_chunk_size())
+
+    for shard, shard_rows in groupby(rows, key=lambda row: (row[0] - 1) // size):
+        def write(stream):
+            stream.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n')
+            while True:
+                chunk = list(islice(shard_rows, _chunk_size()))
+                if not chunk:
+                    break
+                stream.write(''.join(
+                    f'<url><loc>{escape(url.format(pk))}</loc><lastmod>{rfc3339_date(updated)}</lastmod></url>\n'
+                    for pk, updated in chunk
+                ))
+            stream.write('</urlset>\n')
+
+        _write_atomic(shard_path(shard, base_url), write)
+
+
+def read_manifest(base_url):
+    try:
+        with open(os.path.join(_directory(base_url), MANIFEST), encoding='utf-8') as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return {}
+
+
+def sync(base_url, force=False):
+    """
+    Bring the shard files for ``base_url`` (scheme and host, no trailing
+    slash) up to date and return their manifest
+    """
+    stamp = listing_stamp()
+    if not force and _checked.get(base_url) == stamp:
+        manifest = read_manifest(base_url)
+        if manifest:
+            return manifest
+    with _lock:
+        size = _shard_size()
+        manifest = read_manifest(base_url)
+        if force or manifest.get('shard_size') != size:
+            manifest = {'shards': {}}
+        elif _checked.get(base_url) == stamp:
+            return manifest
+        os.makedirs(_directory(base_url), exist_ok=True)
+        # The files are kept until the next post change, so read the primary
+        with primary_reads():
+            fingerprints = shard_fingerprints(size)
+            changed = [
+                shard for shard, fingerprint in fingerprints.items()
+                if manifest['shards'].get(shard) != fingerprint or not os.path.exists(shard_path(shard, base_url))
+            ]
+            if changed:
+                write_shards(sorted(int(shard) for shard in changed), size, base_url)
+        for shard in manifest['shards'].keys() - fingerprints.keys():
+            try:
+                os.unlink(shard_path(shard, base_url))
+            except FileNotFoundError:
+                pass
+        if changed or fingerprints != manifest['shards'] or 'base_url' not in manifest:
+            manifest = {'base_url': base_url, 'shard_size': size, 'shards': fingerprints}
+            path = os.path.join(_directory(base_url), MANIFEST)
+            _write_atomic(path, lambda stream: json.dump(manifest, stream))
+        _checked[base_url] = stamp
+    return manifest
+
+
+def reset():
+    """Compare fingerprints again on the next request"""
+    _checked.clear()
+
+
+def render_index(manifest):
+    entries = ''.join(
+        f'<sitemap><loc>{escape(manifest["base_url"] + reverse("blog:sitemap_shard", args=[shard]))}</loc>'
+        f'<lastmod>{fingerprint[2]}</lastmod></sitemap>\n'
+        for shard, fingerprint in sorted(manifest['shards'].items(), key=lambda item: int(item[0]))
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{XMLNS}">\n{entries}</sitemapindex>\n'
+
+
+def manifest_for(request):
+    """The synced manifest for the request's base URL, memoized on the request"""
+    if not hasattr(request, '_blog_sitemap'):
+        request._blog_sitemap = sync(base_url(request))
+    return request._blog_sitemap
+
+
+def sitemap_last_modified(request, shard=None):
+    shards = manifest_for(request)['shards']
+    if shard is not None:
+        shards = {str(shard): shards[str(shard)]} if str(shard) in shards else {}
+    if not shards:
+        return None
+    return max(datetime.fromisoformat(fingerprint[2]) for fingerprint in shards.values())
+
+
+conditional_sitemap = condition(last_modified_func=sitemap_last_modified)
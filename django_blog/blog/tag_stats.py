@@ -0,0 +1,109 @@
+"""
+Per-tag post counts and the tag cloud.
+
+``TagStat`` rows are adjusted incrementally from the taggit m2m signals
+(see ``blog.signals``) instead of aggregating TaggedItem rows per request.
+Readers use a cached snapshot ``{name: (tag_id, post_count)}``, so a tag
+page resolves its tag and count with a dictionary lookup. Changes drop the
+snapshot once they commit.
+"""
+import math
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from taggit.models import Tag
+
+from .models import Post, TagStat
+from .routing import primary_reads
+
+SNAPSHOT_KEY = 'blog-tag-stats'
+CLOUD_WEIGHTS = 5
+
+
+def _timeout():
+    return getattr(settings, 'BLOG_TAG_STATS_TIMEOUT', 60 * 60)
+
+
+def snapshot():
+    """Return the cached {tag name: (tag_id, post_count)} mapping"""
+    data = cache.get(SNAPSHOT_KEY)
+    if data is None:
+        # The snapshot is shared, so never build it from a lagging replica
+        with primary_reads():
+            rows = TagStat.objects.values_list('tag__name', 'tag_id', 'post_count')
+            data = {name: (tag_id, count) for name, tag_id, count in rows}
+        cache.set(SNAPSHOT_KEY, data, _timeout())
+    return data
+
+
+def invalidate():
+    cache.delete(SNAPSHOT_KEY)
+
+
+def lookup(name):
+    """Return (Tag, post_count) for ``name``, or None if the tag is unknown"""
+    found = snapshot().get(name)
+    if found is None:
+        return None
+    tag_id, count = found
+    return Tag(pk=tag_id, name=name), count
+
+
+def cloud(limit=None):
+    """
+    Tags with at least one post, most used first, each with a 1-5 weight
+    on a log scale for sizing in templates.
+    """
+    entries = sorted(
+        ((name, count) for name, (tag_id, count) in snapshot().items() if count > 0),
+        key=lambda entry: (-entry[1], entry[0]),
+    )
+    if limit:
+        entries = entries[:limit]
+    if not entries:
+        return []
+    high = math.log(entries[0][1] + 1)
+    low = math.log(entries[-1][1] + 1)
+    spread = (high - low) or 1
+    return [
+        {
+            'name': name,
+            'count': count,
+            'weight': 1 + round((math.log(count + 1) - low) / spread * (CLOUD_WEIGHTS - 1)),
+        }
+        for name, count in entries
+    ]
+
+
+def adjust(tag_ids, delta):
+    """Add ``delta`` to the post count of every tag in ``tag_ids``"""
+    tag_ids = list(tag_ids or ())
+    if not tag_ids:
+        return
+    TagStat.objects.bulk_create(
+        [TagStat(tag_id=tag_id) for tag_id in tag_ids], ignore_conflicts=True,
+    )
+    stats = TagStat.objects.filter(tag_id__in=tag_ids)
+    if delta < 0:
+        stats = stats.filter(post_count__gte=-delta)
+    stats.update(post_count=F('post_count') + delta)
+    # Until the counts commit, a reader would cache the old ones again
+    transaction.on_commit(invalidate)
+
+
+def rebuild():
+    """Recompute every TagStat row from the TaggedItem table"""
+    content_type = ContentType.objects.get_for_model(Post)
+    counts = (
+        Post.tags.through.objects.filter(content_type=content_type)
+        .values('tag_id').annotate(total=Count('object_id', distinct=True))
+    )
+    TagStat.objects.all().delete()
+    TagStat.objects.bulk_create(
+        [TagStat(tag_id=row['tag_id'], post_count=row['total']) for row in counts],
+        batch_size=1000,
+    )
+    invalidate()
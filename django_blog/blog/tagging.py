@@ -0,0 +1,89 @@
+"""
+Bulk tag helpers.
+
+taggit's ``add()`` runs a get_or_create per tag and ``clear()`` deletes
+every through row, so re-saving a post with 50 tags costs hundreds of
+queries even when nothing changed. These helpers diff the tag set and write
+only the changes in bulk, sending the same m2m_changed signals taggit does
+so search indexes, tag stats and caches stay in sync.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+from taggit.models import Tag
+
+from .autocomplete import autocomplete
+from .models import Post
+
+
+def resolve_tags(names):
+    """
+    Return {name: Tag} for ``names``, creating the missing tags with one
+    bulk insert. Names whose slug clashes with another tag fall back to
+    taggit's own save(), which picks a unique slug. The bulk insert sends no
+    post_save, so new tags are added to the search suggestions here.
+    """
+    names = list(dict.fromkeys(names))
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        slugs = {}
+        for name in missing:
+            slugs.setdefault(Tag().slugify(name), name)
+        taken = set(Tag.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=slug) for slug, name in slugs.items() if slug not in taken],
+            ignore_conflicts=True,
+        )
+        created = list(Tag.objects.filter(name__in=missing))
+        tags.update((tag.name, tag) for tag in created)
+        transaction.on_commit(lambda: _suggest(created))
+        for name in missing:
+            if name not in tags:
+                tags[name], _ = Tag.objects.get_or_create(name=name)
+    return tags
+
+
+def _suggest(tags):
+    for tag in tags:
+        autocomplete.add_tag(tag.pk, tag.name)
+
+
+def _send(post, action, pk_set, using):
+    m2m_changed.send(
+        sender=Post.tags.through, action=action, instance=post, reverse=False,
+        model=Tag, pk_set=pk_set, using=using,
+    )
+
+
+def set_tags(post, names):
+    """Make ``names`` the post's tags, touching only rows that change"""
+    through = Post.tags.through
+    using = router.db_for_write(through, instance=post)
+    content_type = ContentType.objects.get_for_model(Post)
+    rows = through.objects.using(using).filter(content_type=content_type, object_id=post.pk)
+    current = dict(rows.values_list('tag__name', 'tag_id'))
+    wanted = set(names)
+    removed = {tag_id for name, tag_id in current.items() if name not in wanted}
+    added = [name for name in dict.fromkeys(names) if name not in current]
+    if not removed and not added:
+        return
+
+    with transaction.atomic(using=using):
+        if removed:
+            _send(post, 'pre_remove', removed, using)
+            rows.filter(tag_id__in=removed).delete()
+            _send(post, 'post_remove', removed, using)
+        if added:
+            tags = resolve_tags(added)
+            added_ids = {tags[name].pk for name in added}
+            _send(post, 'pre_add', added_ids, using)
+            through.objects.using(using).bulk_create(
+                [through(content_type=content_type, object_id=post.pk, tag_id=tag_id) for tag_id in added_ids],
+                ignore_conflicts=True,
+            )
+            _send(post, 'post_add', added_ids, using)
+
+    prefetched = getattr(post, '_prefetched_objects_cache', None)
+    if prefetched:
+        prefetched.pop('tags', None)
@@ -0,0 +1,91 @@
+from django import template
+
+from .. import authors
+from ..caching import fragment_cache
+
+register = template.Library()
+
+
+class PostFragmentNode(template.Node):
+    def __init__(self, nodelist, name, post, vary):
+        self.nodelist = nodelist
+        self.name = name
+        self.post = post
+        self.vary = vary
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        post = self.post.resolve(context)
+        vary = [value.resolve(context) for value in self.vary]
+        return fragment_cache.get_or_render(
+            name, post.pk, lambda: self.nodelist.render(context), vary,
+        )
+
+
+@register.tag
+def postfragment(parser, token):
+    """
+    Cache the enclosed markup until the post changes:
+
+        {% postfragment 'card' post [extra vary values...] %}
+            ...
+        {% endpostfragment %}
+
+    Only put markup in here that depends on the post itself (and the vary
+    values), never on the current user or request.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name and a post")
+    nodelist = parser.parse(('endpostfragment',))
+    parser.delete_first_token()
+    return PostFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
+
+
+class ListingFragmentNode(template.Node):
+    def __init__(self, nodelist, name):
+        self.nodelist = nodelist
+        self.name = name
+
+    def render(self, context):
+        return fragment_cache.get_or_render_listing(
+            self.name.resolve(context), lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag
+def listingfragment(parser, token):
+    """
+    Cache the enclosed markup until any post, tag or author name changes:
+
+        {% listingfragment 'home-posts' %}
+            ...
+        {% endlistingfragment %}
+
+    Querysets used only inside the block are not evaluated on a hit. As with
+    postfragment, nothing user- or request-specific belongs in here.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name")
+    nodelist = parser.parse(('endlistingfragment',))
+    parser.delete_first_token()
+    return ListingFragmentNode(nodelist, parser.compile_filter(bits[1]))
+
+
+@register.filter
+def author_name(obj):
+    """
+    Username of ``obj.author`` for a post or comment. Uses the joined User
+    when the queryset already selected it, otherwise the author cache.
+    """
+    field = type(obj)._meta.get_field('author')
+    if field.is_cached(obj):
+        return obj.author.username
+    author = authors.get_author(obj.author_id)
+    return author['username'] if author else ''
@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from taggit.models import Tag
+
+from . import archive, tag_stats
+from .models import Comment, Post
+from .search import get_search_backend
+
+
+class ArchiveTests(TestCase):
+    """Tests for the blog_import / blog_export commands."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        call_command(*args, stdout=out)
+        return out.getvalue()
+
+    def make_content(self):
+        first = Post.objects.create(title='First, post', content='Line one\nline "two"', author=self.user)
+        first.tags.add('django', 'web dev')
+        second = Post.objects.create(title='Second', content='Body', author=self.reader)
+        nice = Comment.objects.create(post=first, author=self.reader, content='Nice post')
+        Comment.objects.create(post=first, author=self.user, content='Thanks', parent=nice)
+        return first, second
+
+    def snapshot(self):
+        posts = [
+            (post.pk, post.title, post.content, post.content_html, post.excerpt, post.author.username,
+             post.published_date, post.updated_at, sorted(post.tags.names()), post.comment_count)
+            for post in Post.objects.order_by('pk')
+        ]
+        comments = list(Comment.objects.order_by('pk').values_list(
+            'pk', 'post_id', 'author__username', 'content', 'content_html', 'created_at', 'updated_at',
+            'parent_id', 'path', 'depth', 'reply_count',
+        ))
+        return posts, comments
+
+    def round_trip(self, ext):
+        self.make_content()
+        before = self.snapshot()
+        self.run_command('blog_export', 'posts', self.path(f'posts.{ext}'))
+        self.run_command('blog_export', 'comments', self.path(f'comments.{ext}'))
+        Post.objects.all().delete()
+        Tag.objects.all().delete()
+
+        self.run_command('blog_import', 'posts', self.path(f'posts.{ext}'))
+        output = self.run_command('blog_import', 'comments', self.path(f'comments.{ext}'))
+        self.assertIn('Successfully imported 2 comments', output)
+        self.assertEqual(self.snapshot(), before)
+        # Derived data was rebuilt after the bulk inserts
+        self.assertEqual(tag_stats.lookup('web dev')[1], 1)
+        self.assertEqual(len(get_search_backend().search('two')), 1)
+
+    def test_ndjson_round_trip_keeps_ids_dates_tags_and_authors(self):
+        self.round_trip('ndjson')
+
+    def test_csv_round_trip_keeps_ids_dates_tags_and_authors(self):
+        self.round_trip('csv')
+
+    def test_export_writes_one_json_object_per_line(self):
+        first, _ = self.make_content()
+        self.run_command('blog_export', 'posts', self.path('posts.ndjson'), '--chunk-size', '1')
+        with open(self.path('posts.ndjson'), encoding='utf-8') as stream:
+            records = [json.loads(line) for line in stream]
+        self.assertEqual([record['id'] for record in records], list(Post.objects.order_by('pk').values_list('pk', flat=True)))
+        self.assertEqual(records[0]['tags'], ['django', 'web dev'])
+        self.assertEqual(records[0]['author'], 'writer')
+
+    def test_rerun_skips_existing_ids(self):
+        self.make_content()
+        self.run_command('blog_export', 'posts', self.path('posts.ndjson'))
+        output = self.run_command('blog_import', 'posts', self.path('posts.ndjson'), '--no-rebuild')
+        self.assertIn('Successfully imported 0 posts', output)
+        self.assertIn('skipped 2', output)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_unknown_authors_are_skipped_or_created(self):
+        records = [
+            {'title': 'Known', 'content': 'Body', 'author': 'writer', 'tags': ['python']},
+            {'title': 'Unknown', 'content': 'Body', 'author': 'newcomer', 'tags': ['python', 'Python']},
+        ]
+        importer = archive.Importer()
+        list(importer.import_posts(iter(records)))
+        self.assertEqual((importer.created, importer.skipped), (1, 1))
+
+        importer = archive.Importer(create_authors=True)
+        list(importer.import_posts(iter(records[1:])))
+        author = User.objects.get(username='newcomer')
+        self.assertFalse(author.has_usable_password())
+        post = Post.objects.get(title='Unknown')
+        # Missing timestamps default to the import time
+        self.assertIsNotNone(post.published_date)
+        # Tags whose slug collides with an existing tag still get created
+        self.assertEqual(sorted(post.tags.names()), ['Python', 'python'])
+
+    def test_comments_on_missing_posts_are_skipped(self):
+        first, _ = self.make_content()
+        records = [
+            {'post': first.pk, 'author': 'reader', 'content': 'Kept', 'created_at': '2020-01-02T03:04:05'},
+            {'post': 999, 'author': 'reader', 'content': 'Orphan'},
+        ]
+        importer = archive.Importer()
+        list(importer.import_comments(iter(records)))
+        self.assertEqual((importer.created, importer.skipped), (1, 1))
+        kept = Comment.objects.get(content='Kept')
+        self.assertEqual(kept.created_at, datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+
+    def test_queries_per_batch_do_not_depend_on_batch_size(self):
+        def records(prefix, count):
+            return [
+                {'id': None, 'title': f'{prefix} {i}', 'content': 'Body', 'author': 'writer', 'tags': ['bulk']}
+                for i in range(count)
+            ]
+
+        # Warm the author and tag lookups
+        list(archive.Importer().import_posts(iter(records('warm', 1))))
+        importer = archive.Importer(batch_size=50)
+        list(importer.import_posts(iter(records('warm', 1))))
+        # per batch: savepoint, post insert, tagged item insert, release
+        with self.assertNumQueries(2 * 4):
+            list(importer.import_posts(iter(records('bulk', 100))))
+        self.assertEqual(Post.objects.filter(tags__name='bulk').count(), 102)
@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import authors
+from .models import Comment, Post
+
+
+class AuthorCacheTests(TestCase):
+    """Tests for the author cache and per-request object loading."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Owned', content='Body', author=self.user)
+
+    def test_read_through_and_invalidation(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(authors.get_author(self.user.pk)['username'], 'writer')
+        with self.assertNumQueries(0):
+            authors.get_author(self.user.pk)
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(authors.get_author(self.user.pk)['username'], 'renamed')
+
+    def test_bulk_lookup_loads_misses_once(self):
+        other = User.objects.create_user(username='other')
+        authors.get_author(self.user.pk)
+        with self.assertNumQueries(1):
+            found = authors.get_authors([self.user.pk, other.pk])
+        self.assertEqual({fields['username'] for fields in found.values()}, {'writer', 'other'})
+
+    def post_queries(self, method, url):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url)
+        selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "blog_post"' in q['sql']]
+        return response, selects
+
+    def test_update_view_loads_post_once(self):
+        response, selects = self.post_queries('get', reverse('blog:post_update', args=[self.post.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(selects), 1)
+
+    def test_delete_confirmation_loads_post_once(self):
+        response, selects = self.post_queries('get', reverse('blog:post_delete', args=[self.post.pk]))
+        self.assertContains(response, 'writer')
+        self.assertEqual(len(selects), 1)
+
+    def test_other_users_are_still_forbidden(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content='Mine only')
+        intruder = User.objects.create_user(username='intruder', password='pass12345')
+        self.client.force_login(intruder)
+        self.assertEqual(self.client.get(reverse('blog:post_update', args=[self.post.pk])).status_code, 403)
+        self.assertEqual(self.client.post(reverse('blog:comment_delete', args=[comment.pk])).status_code, 403)
@@ -0,0 +1,119 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from taggit.models import Tag
+
+from .autocomplete import PrefixIndex, autocomplete
+from .forms import PostForm
+from .models import Post
+
+
+class PrefixIndexTests(TestCase):
+    """Tests for the sorted-array prefix index."""
+
+    def test_prefix_matches_are_sorted_and_capped(self):
+        index = PrefixIndex([(1, 'Django tips'), (2, 'django ORM'), (3, 'Djangonauts'), (4, 'Flask')])
+        self.assertEqual(index.search('DJANGO', 10), [(2, 'django ORM'), (1, 'Django tips'), (3, 'Djangonauts')])
+        self.assertEqual(index.search('django', 2), [(2, 'django ORM'), (1, 'Django tips')])
+        self.assertEqual(index.search('django  t', 10), [(1, 'Django tips')])
+        self.assertEqual(index.search('zz', 10), [])
+        self.assertEqual(index.search('   ', 10), [])
+
+    def test_add_replace_and_remove(self):
+        index = PrefixIndex([(1, 'Alpha')])
+        index.add(2, 'Alphabet')
+        index.add(1, 'Omega')
+        self.assertEqual(index.search('alpha', 10), [(2, 'Alphabet')])
+        self.assertEqual(index.search('o', 10), [(1, 'Omega')])
+        index.remove(1)
+        index.remove(99)
+        self.assertEqual(index.search('o', 10), [])
+        self.assertEqual(len(index), 1)
+
+    def test_unicode_folding(self):
+        index = PrefixIndex([(1, 'Straße ﬁtness'), (2, 'Ünïcode')])
+        self.assertEqual(index.search('STRASSE FI', 10), [(1, 'Straße ﬁtness')])
+        self.assertEqual(index.search('ünï', 10), [(2, 'Ünïcode')])
+
+
+class SuggestViewTests(TestCase):
+    """Tests for the search suggestion endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Django caching', content='Body', author=self.user)
+        self.post.tags.add('django')
+        self.url = reverse('blog:search_suggest')
+
+    def suggest(self, q):
+        return json.loads(self.client.get(self.url, {'q': q}).content)
+
+    def test_suggests_tags_and_titles(self):
+        data = self.suggest('dja')
+        self.assertEqual(data['tags'], [{'name': 'django', 'url': reverse('blog:posts_by_tag', args=['django'])}])
+        self.assertEqual(data['posts'], [
+            {'title': 'Django caching', 'url': reverse('blog:post_detail', args=[self.post.pk])},
+        ])
+        self.assertEqual(self.suggest(''), {'query': '', 'tags': [], 'posts': []})
+
+    def test_lookups_do_not_query_once_built(self):
+        self.suggest('d')
+        with self.assertNumQueries(0):
+            self.suggest('django c')
+
+    def test_index_follows_post_and_tag_changes(self):
+        self.suggest('d')
+        with self.captureOnCommitCallbacks(execute=True):
+            created = Post.objects.create(title='Deploying Django', content='Body', author=self.user)
+            created.tags.add('deploy')
+            self.post.title = 'Caching in Django'
+            self.post.save()
+        with self.assertNumQueries(0):
+            data = self.suggest('d')
+        self.assertEqual([tag['name'] for tag in data['tags']], ['deploy', 'django'])
+        self.assertEqual([post['title'] for post in data['posts']], ['Deploying Django'])
+        self.assertEqual(self.suggest('caching')['posts'][0]['title'], 'Caching in Django')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created.delete()
+            Tag.objects.filter(name='deploy').delete()
+        data = self.suggest('d')
+        self.assertEqual([tag['name'] for tag in data['tags']], ['django'])
+        self.assertEqual(data['posts'], [])
+
+    def test_tags_created_by_the_post_form_are_indexed(self):
+        self.suggest('z')
+        form = PostForm(data={'title': 'Zebras', 'content': 'Body', 'tags': 'zebratag, django'})
+        form.instance.author = self.user
+        self.assertTrue(form.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            form.save()
+        with self.assertNumQueries(0):
+            data = self.suggest('zebra')
+        self.assertEqual([tag['name'] for tag in data['tags']], ['zebratag'])
+
+    def test_rolled_back_changes_are_not_indexed(self):
+        self.suggest('d')
+        with self.captureOnCommitCallbacks(execute=False):
+            Post.objects.create(title='Draft that never committed', content='Body', author=self.user)
+        self.assertEqual(self.suggest('draft')['posts'], [])
+
+    @override_settings(BLOG_AUTOCOMPLETE_LIMIT=2)
+    def test_results_are_capped(self):
+        for i in range(5):
+            Post.objects.create(title=f'Django part {i}', content='Body', author=self.user)
+        self.assertEqual(len(self.suggest('django')['posts']), 2)
+
+    @override_settings(BLOG_AUTOCOMPLETE_REFRESH=60)
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        self.suggest('d')
+        with mock.patch('blog.autocomplete.time.monotonic', return_value=10 ** 9), \
+                mock.patch('blog.autocomplete.threading.Thread') as thread:
+            self.suggest('d')
+        thread.return_value.start.assert_called_once()
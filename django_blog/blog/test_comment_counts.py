@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Comment, Post
+
+
+class CommentCountTests(TestCase):
+    """Tests for the denormalized Post.comment_count column and comment rendering."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Counted', content='Body', author=self.user)
+        self.client.force_login(self.user)
+
+    def comment_count(self):
+        return Post.objects.values_list('comment_count', flat=True).get(pk=self.post.pk)
+
+    def test_create_views_increment(self):
+        self.client.post(reverse('blog:comment_create', args=[self.post.pk]),
+                         {'content': 'A comment that is long enough.'})
+        self.client.post(reverse('blog:add_comment', args=[self.post.pk]),
+                         {'content': 'Another comment that is long enough.'})
+        self.assertEqual(self.comment_count(), 2)
+
+    def test_update_keeps_count(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content='Original content')
+        self.client.post(reverse('blog:comment_update', args=[comment.pk]),
+                         {'content': 'Edited content that is long enough.'})
+        self.assertEqual(self.comment_count(), 1)
+
+    def test_editing_a_loaded_post_keeps_comment_totals(self):
+        post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, author=self.user, content='Arrived after the load')
+        post.title = 'Edited'
+        post.save()
+        self.assertEqual(self.comment_count(), 1)
+        self.assertIsNotNone(Post.objects.values_list('comment_activity_at', flat=True).get(pk=self.post.pk))
+
+    def test_delete_views_decrement(self):
+        first = Comment.objects.create(post=self.post, author=self.user, content='First comment')
+        second = Comment.objects.create(post=self.post, author=self.user, content='Second comment')
+        self.client.post(reverse('blog:comment_delete', args=[first.pk]))
+        self.client.post(reverse('blog:delete_comment', args=[second.pk]))
+        self.assertEqual(self.comment_count(), 0)
+
+    def test_rebuild_command(self):
+        Comment.objects.create(post=self.post, author=self.user, content='First comment')
+        Post.objects.update(comment_count=42)
+        call_command('rebuild_comment_counts', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.comment_count(), 1)
+
+    def test_detail_queries_do_not_grow_with_comments(self):
+        def detail_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('blog:post_detail', args=[self.post.pk]))
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        Comment.objects.create(post=self.post, author=self.user, content='First comment')
+        baseline = detail_queries()
+        for i in range(20):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(post=self.post, author=author, content=f'Comment number {i}')
+        self.assertEqual(detail_queries(), baseline)
+        response = self.client.get(reverse('blog:post_detail', args=[self.post.pk]))
+        self.assertContains(response, 'Comments (21)')
@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .caching import fragment_cache, listing_stamp
+from .comment_queue import CommentQueue
+from .models import Comment, Post
+from .rendering import render_excerpt, render_html
+
+
+class CommentQueueTests(TestCase):
+    """Tests for batched comment writes, run in the test thread."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = Post.objects.create(title='Busy', content='Body', author=self.user)
+        self.other = Post.objects.create(title='Quiet', content='Body', author=self.user)
+        self.queue = CommentQueue(maxsize=50, batch_size=20, worker=False)
+
+    def test_batches_keep_per_post_order_and_counters(self):
+        for i in range(30):
+            post = self.post if i % 3 else self.other
+            self.queue.submit(post.pk, self.user.pk, f'Comment number {i}')
+        # per batch: one bulk insert, one thread path update, one counter
+        # update per post, one author stats upsert (insert-or-ignore and
+        # update), savepoint and release
+        with self.assertNumQueries(2 * (1 + 1 + 2 + 2 + 2)):
+            self.queue.drain()
+        self.assertEqual(self.queue.written, 30)
+        self.assertEqual(
+            list(self.post.comments.values_list('content', flat=True)),
+            [f'Comment number {i}' for i in range(30) if i % 3],
+        )
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.post.comment_count, self.other.comment_count), (20, 10))
+        self.assertIsNotNone(self.post.comment_activity_at)
+
+    def test_queued_comments_are_rendered(self):
+        self.queue.submit(self.post.pk, self.user.pk, 'Queued **comment** text')
+        self.queue.drain()
+        comment = self.post.comments.get()
+        self.assertEqual(comment.content_html, render_html('Queued **comment** text'))
+        self.assertNotEqual(comment.content_html, '')
+        self.assertEqual(comment.excerpt, render_excerpt('Queued **comment** text', comment.content_html))
+        self.assertNotEqual(comment.excerpt, '')
+
+    def test_committed_batches_invalidate_caches(self):
+        stamp = listing_stamp()
+        versions = [fragment_cache.key('card', post.pk) for post in (self.post, self.other)]
+        self.queue.submit(self.post.pk, self.user.pk, 'Queued comment text')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.queue.drain()
+        # Nothing changes until the batch commits
+        self.assertEqual(listing_stamp(), stamp)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(listing_stamp(), stamp)
+        self.assertNotEqual(fragment_cache.key('card', self.post.pk), versions[0])
+        self.assertEqual(fragment_cache.key('card', self.other.pk), versions[1])
+
+    def test_full_queue_refuses_submissions(self):
+        queue = CommentQueue(maxsize=2, worker=False)
+        self.assertTrue(queue.submit(self.post.pk, self.user.pk, 'first comment'))
+        self.assertTrue(queue.submit(self.post.pk, self.user.pk, 'second comment'))
+        self.assertFalse(queue.submit(self.post.pk, self.user.pk, 'third comment'))
+
+    def test_enqueue_view(self):
+        self.client.force_login(self.user)
+        url = reverse('blog:enqueue_comment', args=[self.post.pk])
+        with mock.patch('blog.views.comment_queue', self.queue):
+            response = self.client.post(url, {'content': 'Queued comment text'})
+            self.assertRedirects(response, reverse('blog:post_detail', args=[self.post.pk]))
+            self.assertEqual(self.queue.pending, 1)
+            self.queue.drain()
+        self.assertTrue(self.post.comments.filter(content='Queued comment text').exists())
+
+    def test_enqueue_view_rejects_invalid_and_full(self):
+        url = reverse('blog:enqueue_comment', args=[self.post.pk])
+        self.assertEqual(self.client.post(url, {'content': 'Anonymous comment'}).status_code, 302)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(reverse('blog:enqueue_comment', args=[999]), {'content': 'x' * 20}).status_code, 404)
+        full = CommentQueue(maxsize=1, worker=False)
+        with mock.patch('blog.views.comment_queue', full):
+            self.client.post(url, {'content': 'short'})
+            self.assertEqual(full.pending, 0)
+            self.client.post(url, {'content': 'fills the queue'})
+            response = self.client.post(url, {'content': 'does not fit'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+    @override_settings(BLOG_COMMENT_INGEST='async')
+    def test_detail_form_posts_to_queue_in_async_mode(self):
+        response = self.client.get(reverse('blog:post_detail', args=[self.post.pk]))
+        self.assertEqual(response.context['comment_url'], reverse('blog:enqueue_comment', args=[self.post.pk]))
+
+
+class CommentWriterThreadTests(TransactionTestCase):
+    """Tests that need committed data: the writer thread and FK failures."""
+
+    def test_worker_writes_in_submission_order(self):
+        user = User.objects.create_user(username='reader')
+        post = Post.objects.create(title='Busy', content='Body', author=user)
+        queue = CommentQueue(batch_size=7, flush_interval=0.01)
+        for i in range(25):
+            self.assertTrue(queue.submit(post.pk, user.pk, f'Comment {i}'))
+        queue.join()
+        queue.stop()
+        self.assertEqual(
+            list(post.comments.values_list('content', flat=True)),
+            [f'Comment {i}' for i in range(25)],
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 25)
+
+    def test_comments_for_deleted_posts_are_dropped(self):
+        user = User.objects.create_user(username='reader')
+        kept = Post.objects.create(title='Kept', content='Body', author=user)
+        gone = Post.objects.create(title='Gone', content='Body', author=user)
+        queue = CommentQueue(worker=False)
+        queue.submit(kept.pk, user.pk, 'kept comment')
+        queue.submit(gone.pk, user.pk, 'orphaned comment')
+        gone.delete()
+        queue.drain()
+        self.assertEqual((queue.written, queue.dropped), (1, 1))
+        self.assertEqual(list(Comment.objects.values_list('content', flat=True)), ['kept comment'])
+
+    def test_replies_to_deleted_comments_are_dropped(self):
+        user = User.objects.create_user(username='reader')
+        post = Post.objects.create(title='Busy', content='Body', author=user)
+        kept = Comment.objects.create(post=post, author=user, content='kept comment')
+        gone = Comment.objects.create(post=post, author=user, content='deleted comment')
+        queue = CommentQueue(worker=False)
+        queue.submit(post.pk, user.pk, 'kept reply', kept.pk)
+        queue.submit(post.pk, user.pk, 'orphaned reply', gone.pk)
+        gone.delete()
+        queue.drain()
+        self.assertEqual((queue.written, queue.dropped), (1, 1))
+        self.assertEqual(list(kept.replies.values_list('content', flat=True)), ['kept reply'])
+        kept.refresh_from_db()
+        self.assertEqual(kept.reply_count, 1)
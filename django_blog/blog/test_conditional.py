@@ -0,0 +1,95 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Comment, Post
+
+
+class ConditionalGetTests(TestCase):
+    """Tests for ETag/Last-Modified handling on post and listing pages."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Cached', content='Body', author=self.user)
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+        self.detail_url = reverse('blog:post_detail', args=[self.post.pk])
+
+    def revalidate(self, url, response):
+        headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+        if response.has_header('Last-Modified'):
+            headers['HTTP_IF_MODIFIED_SINCE'] = response['Last-Modified']
+        return self.client.get(url, **headers)
+
+    def test_anonymous_detail_not_modified_with_one_query(self):
+        first = self.client.get(self.detail_url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('Last-Modified'))
+        with self.assertNumQueries(1):
+            second = self.revalidate(self.detail_url, first)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+
+    def test_authenticated_detail_not_modified_without_comment_queries(self):
+        self.client.force_login(self.user)
+        first = self.client.get(self.detail_url)
+        self.assertFalse(first.has_header('Last-Modified'))
+        # session, user and the post stamp
+        with self.assertNumQueries(3):
+            second = self.revalidate(self.detail_url, first)
+        self.assertEqual(second.status_code, 304)
+
+    def test_etag_varies_by_user(self):
+        anonymous = self.client.get(self.detail_url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_activity_changes_detail(self):
+        first = self.client.get(self.detail_url)
+        Comment.objects.create(post=self.post, author=self.user, content='Second')
+        second = self.revalidate(self.detail_url, first)
+        self.assertEqual(second.status_code, 200)
+        self.assertContains(second, 'Second')
+
+    def test_comment_delete_and_post_edit_change_detail(self):
+        first = self.client.get(self.detail_url)
+        self.post.comments.get().delete()
+        second = self.revalidate(self.detail_url, first)
+        self.assertEqual(second.status_code, 200)
+        self.post.title = 'Edited'
+        self.post.save()
+        self.assertEqual(self.revalidate(self.detail_url, second).status_code, 200)
+
+    def test_listing_not_modified_without_queries(self):
+        for url in (reverse('blog:home'), reverse('blog:post_list')):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            with self.assertNumQueries(0):
+                second = self.revalidate(url, first)
+            self.assertEqual(second.status_code, 304)
+
+    def test_listing_changes_on_new_post_and_tag_edit(self):
+        url = reverse('blog:post_list')
+        first = self.client.get(url)
+        Post.objects.create(title='Newer', content='Body', author=self.user)
+        second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, 200)
+        self.post.tags.add('django')
+        self.assertEqual(self.revalidate(url, second).status_code, 200)
+
+    def test_cursor_pages_have_distinct_etags(self):
+        url = reverse('blog:post_list')
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url + '?cursor=x', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_pending_messages_skip_conditional_response(self):
+        self.client.force_login(self.user)
+        first = self.client.get(self.detail_url)
+        self.client.post(reverse('blog:post_update', args=[self.post.pk]), {'title': 'Saved', 'content': 'Body', 'tags': ''})
+        # The update queued a success message and changed the post
+        response = self.revalidate(self.detail_url, first)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'Post updated successfully!')
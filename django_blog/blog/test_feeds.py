@@ -0,0 +1,107 @@
+import gc
+import json
+import tracemalloc
+from xml.etree import ElementTree
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Post
+
+
+def read(response):
+    return b''.join(response.streaming_content)
+
+
+@override_settings(BLOG_FEED_CHUNK_SIZE=5)
+class FeedTests(TestCase):
+    """Tests for the streaming RSS, Atom and JSON feeds."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.other = User.objects.create_user(username='other')
+        for i in range(12):
+            post = Post.objects.create(title=f'Post {i} <&>', content=f'Body {i}', author=self.user)
+            if i % 3 == 0:
+                post.tags.add('django')
+        Post.objects.create(title='Elsewhere', content='Body', author=self.other)
+
+    def test_rss_lists_every_post(self):
+        response = self.client.get(reverse('blog:feed', args=['rss']))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/rss+xml; charset=utf-8')
+        items = ElementTree.fromstring(read(response)).findall('channel/item')
+        self.assertEqual(len(items), 13)
+        self.assertEqual(items[0].findtext('title'), 'Elsewhere')
+        self.assertEqual(items[1].findtext('title'), 'Post 11 <&>')
+
+    def test_atom_tag_feed(self):
+        response = self.client.get(reverse('blog:tag_feed', args=['django', 'atom']))
+        ns = {'atom': 'http://www.w3.org/2005/Atom'}
+        entries = ElementTree.fromstring(read(response)).findall('atom:entry', ns)
+        self.assertEqual([entry.findtext('atom:title', namespaces=ns) for entry in entries],
+                         ['Post 9 <&>', 'Post 6 <&>', 'Post 3 <&>', 'Post 0 <&>'])
+        self.assertEqual(entries[0].find('atom:category', ns).get('term'), 'django')
+
+    def test_json_author_feed(self):
+        response = self.client.get(reverse('blog:author_feed', args=['other', 'json']))
+        feed = json.loads(read(response))
+        self.assertEqual(feed['version'], 'https://jsonfeed.org/version/1.1')
+        self.assertEqual([item['title'] for item in feed['items']], ['Elsewhere'])
+
+    def test_unknown_scope_or_format(self):
+        self.assertEqual(self.client.get(reverse('blog:tag_feed', args=['missing', 'rss'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('blog:author_feed', args=['nobody', 'rss'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('blog:feed', args=['xml'])).status_code, 404)
+
+    def test_cached_until_next_post_save(self):
+        url = reverse('blog:feed', args=['json'])
+        first = read(self.client.get(url))
+        with self.assertNumQueries(0):
+            self.assertEqual(read(self.client.get(url)), first)
+        Post.objects.create(title='Fresh', content='Body', author=self.user)
+        self.assertEqual(json.loads(read(self.client.get(url)))['items'][0]['title'], 'Fresh')
+
+    def test_evicted_chunk_is_rendered_again(self):
+        url = reverse('blog:feed', args=['rss'])
+        first = read(self.client.get(url))
+        cache.delete_many([key for key in cache._cache if key.endswith(':2')])
+        self.assertEqual(read(self.client.get(url)), first)
+
+    def test_conditional_get(self):
+        url = reverse('blog:feed', args=['atom'])
+        response = self.client.get(url)
+        read(response)
+        with self.assertNumQueries(0):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    @override_settings(
+        BLOG_FEED_CHUNK_SIZE=20,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    )
+    def test_peak_memory_does_not_grow_with_feed_size(self):
+        # The dummy cache keeps the in-process cache out of the measurement
+        def peak(username, count):
+            author = User.objects.create_user(username=username)
+            Post.objects.bulk_create(
+                Post(title=f'Bulk {i}', content='word ' * 200, author=author) for i in range(count)
+            )
+            chunks = iter(self.client.get(reverse('blog:author_feed', args=[username, 'rss'])).streaming_content)
+            # Skip the header and first chunk, which warm up per-process caches
+            next(chunks), next(chunks)
+            tracemalloc.start()
+            for _ in chunks:
+                # Collect query cycles now so the peak reflects live data only
+                gc.collect()
+            _, high = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return high
+
+        small = peak('small', 100)
+        large = peak('large', 1000)
+        # 10x the posts, but only one chunk is held at a time
+        self.assertLess(large, small * 1.5)
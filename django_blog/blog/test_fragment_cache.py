@@ -0,0 +1,79 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from taggit.models import Tag
+
+from .caching import fragment_cache
+from .models import Post
+
+
+class FragmentCacheTests(TestCase):
+    """Tests for cached post cards and post bodies."""
+
+    def setUp(self):
+        cache.clear()
+        fragment_cache.reset_stats()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Cached', content='Original body', author=self.user)
+        self.post.tags.add('django')
+
+    def card_stats(self, name='card'):
+        return fragment_cache.stats()['fragments'].get(name, {'hits': 0, 'misses': 0})
+
+    def test_card_is_served_from_cache(self):
+        self.client.get(reverse('blog:post_list'))
+        self.client.get(reverse('blog:post_list'))
+        self.assertEqual(self.card_stats(), {'hits': 1, 'misses': 1})
+
+    def test_post_save_invalidates(self):
+        self.client.get(reverse('blog:post_list'))
+        self.post.content = 'Edited body'
+        self.post.save()
+        response = self.client.get(reverse('blog:post_list'))
+        self.assertContains(response, 'Edited body')
+        self.assertEqual(self.card_stats()['misses'], 2)
+
+    def test_tag_change_invalidates_detail_body(self):
+        url = reverse('blog:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        self.post.tags.add('python')
+        response = self.client.get(url)
+        self.assertContains(response, 'python')
+        self.assertEqual(self.card_stats('body'), {'hits': 0, 'misses': 2})
+
+    def test_username_change_invalidates_all(self):
+        self.client.get(reverse('blog:home'))
+        self.user.username = 'renamed'
+        self.user.save()
+        response = self.client.get(reverse('blog:home'))
+        self.assertContains(response, 'By renamed')
+
+    def test_tag_rename_invalidates_all(self):
+        url = reverse('blog:post_list')
+        first = self.client.get(url)
+        self.assertContains(first, 'django')
+        tag = Tag.objects.get(name='django')
+        tag.name = 'djangoproject'
+        tag.save()
+        # The listing changed, so the old validator no longer matches
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, 'djangoproject')
+        tag.delete()
+        self.assertNotContains(self.client.get(url), 'djangoproject')
+
+    def test_tag_card_varies_by_tag(self):
+        self.post.tags.add('python')
+        django_page = self.client.get(reverse('blog:posts_by_tag', args=['django']))
+        python_page = self.client.get(reverse('blog:posts_by_tag', args=['python']))
+        self.assertContains(django_page, '<span class="tag-link current-tag">django</span>', html=True)
+        self.assertContains(python_page, '<span class="tag-link current-tag">python</span>', html=True)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('blog:cache_stats')).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('blog:cache_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_ratio', response.json())
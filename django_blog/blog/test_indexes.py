@@ -0,0 +1,49 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from .management.commands.index_advisor import classify
+from .models import Comment, Post
+
+
+class CompositeIndexTests(TestCase):
+    """Tests that author and comment listings are served in index order."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.post = Post.objects.create(title='Indexed', content='Body', author=self.user)
+
+    def plan(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {queryset.query}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoSort(self, queryset):
+        plan = self.plan(queryset)
+        self.assertFalse([line for line in plan if 'TEMP B-TREE' in line], plan)
+
+    def test_author_posts_use_index_order(self):
+        self.assertNoSort(Post.objects.filter(author=self.user).order_by('-published_date', '-id'))
+
+    def test_post_comments_use_index_order(self):
+        self.assertNoSort(Comment.objects.filter(post=self.post))
+
+    def test_classify(self):
+        self.assertEqual(classify('sqlite', 'SCAN blog_post'), 'full scan')
+        self.assertEqual(classify('sqlite', 'SCAN blog_post USING INDEX blog_post_published_idx'), 'index scan')
+        self.assertEqual(classify('sqlite', 'USE TEMP B-TREE FOR ORDER BY'), 'in-memory sort')
+        self.assertIsNone(classify('sqlite', 'SEARCH blog_post USING INTEGER PRIMARY KEY (rowid=?)'))
+        self.assertEqual(classify('postgresql', '->  Sort  (cost=1.0..2.0 rows=1 width=8)'), 'in-memory sort')
+
+    def test_index_advisor_replays_urls(self):
+        Post.objects.all().delete()
+        out = StringIO()
+        call_command('index_advisor', sample_posts=30, stdout=out)
+        output = out.getvalue()
+        self.assertIn('GET /profile/ -> 200', output)
+        self.assertIn('queries with full scans or in-memory sorts', output)
+        # Sample data is rolled back
+        self.assertFalse(Post.objects.exists())
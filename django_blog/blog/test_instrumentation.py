@@ -0,0 +1,116 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+
+from request_instrumentation import Recorder, recorder
+
+from .models import Post
+
+
+def titles_one_by_one(request):
+    """A deliberate N+1: one query per post"""
+    ids = Post.objects.values_list('pk', flat=True)
+    return HttpResponse(', '.join(Post.objects.get(pk=pk).title for pk in ids))
+
+
+urlpatterns = [
+    path('n-plus-one/', titles_one_by_one, name='n_plus_one'),
+    path('', include('django_blog.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class InstrumentationTests(TestCase):
+    """Tests for the instrumentation middleware and its two endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        recorder.reset()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        for i in range(4):
+            Post.objects.create(title=f'Post {i}', content='Body', author=self.user)
+
+    def test_records_queries_and_timings_per_url_name(self):
+        self.client.get(reverse('blog:post_list'))
+        record = recorder.recent[-1]
+        self.assertEqual(record['url_name'], 'blog:post_list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['template_ms'])
+        self.assertEqual(record['duplicates'], [])
+
+    def test_duplicate_queries_are_flagged_with_stack(self):
+        with self.assertLogs('request_instrumentation', 'WARNING'):
+            self.client.get('/n-plus-one/')
+        record = recorder.recent[-1]
+        self.assertEqual(record['queries'], 5)
+        [duplicate] = record['duplicates']
+        self.assertEqual(duplicate['count'], 4)
+        self.assertIn('titles_one_by_one', ''.join(duplicate['stack']))
+
+    def test_unresolved_requests_are_grouped(self):
+        self.client.get('/no-such-page/')
+        self.assertEqual(recorder.recent[-1]['url_name'], 'unresolved')
+        self.assertEqual(recorder.recent[-1]['status'], 404)
+
+    def test_ring_buffer_keeps_latest_requests(self):
+        small = Recorder(size=3)
+        for i in range(5):
+            small.add({
+                'url_name': 'page', 'path': f'/{i}/', 'status': 200, 'queries': i,
+                'db_ms': 1.0, 'template_ms': 1.0, 'total_ms': 2.0, 'duplicates': [],
+            })
+        self.assertEqual([record['path'] for record in small.recent], ['/2/', '/3/', '/4/'])
+        # Running totals still count every request
+        self.assertIn('django_http_requests_total{url_name="page"} 5', small.prometheus())
+
+    def test_summary_is_staff_only(self):
+        self.client.get(reverse('blog:post_list'))
+        url = reverse('instrumentation')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        summary = json.loads(self.client.get(url).content)
+        self.assertEqual(summary['urls']['blog:post_list']['requests'], 1)
+        # The endpoint itself is not recorded
+        self.assertNotIn('instrumentation', summary['urls'])
+
+    def test_summary_lists_recent_duplicates(self):
+        with self.assertLogs('request_instrumentation', 'WARNING'):
+            self.client.get('/n-plus-one/')
+        self.client.force_login(self.staff)
+        summary = json.loads(self.client.get(reverse('instrumentation')).content)
+        self.assertEqual(summary['urls']['n_plus_one']['requests_with_duplicates'], 1)
+        self.assertEqual(summary['duplicates'][0]['url_name'], 'n_plus_one')
+
+    def test_metrics_in_prometheus_format(self):
+        self.client.get(reverse('blog:post_list'))
+        with self.assertLogs('request_instrumentation', 'WARNING'):
+            self.client.get('/n-plus-one/')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE django_http_queries_total counter', body)
+        self.assertIn('django_http_requests_total{url_name="blog:post_list"} 1', body)
+        self.assertIn('django_http_duplicate_queries_total{url_name="n_plus_one"} 4', body)
+        self.assertIn('django_http_responses_total{url_name="n_plus_one",status="2xx"} 1', body)
+
+    @override_settings(INSTRUMENTATION_METRICS_TOKEN='scrape-secret')
+    def test_metrics_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-secre').status_code, 401)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_can_be_disabled(self):
+        self.client.get(reverse('blog:post_list'))
+        self.assertEqual(len(recorder.recent), 0)
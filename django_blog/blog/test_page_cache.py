@@ -0,0 +1,129 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from . import caching
+from .caching import fragment_cache, get_or_build
+from .models import Post
+from .page_cache import page_key
+
+
+class PageCacheTests(TestCase):
+    """Tests for the anonymous home page cache and the cached posts fragment."""
+
+    def setUp(self):
+        cache.clear()
+        fragment_cache.reset_stats()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Cached title', content='Body', author=self.user)
+        self.url = reverse('blog:home')
+
+    def test_anonymous_page_is_served_without_queries(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertContains(second, 'Cached title')
+
+    def test_post_changes_invalidate_the_page(self):
+        self.client.get(self.url)
+        created = Post.objects.create(title='Brand new', content='Body', author=self.user)
+        self.assertContains(self.client.get(self.url), 'Brand new')
+        created.title = 'Renamed post'
+        created.save()
+        self.assertContains(self.client.get(self.url), 'Renamed post')
+        created.delete()
+        self.assertNotContains(self.client.get(self.url), 'Renamed post')
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get(self.url)
+        self.client.get(self.url, {'utm_source': 'feed'})
+        self.assertEqual(fragment_cache.stats()['fragments']['page'], {'hits': 0, 'misses': 2})
+
+    def test_pending_messages_bypass_the_cache(self):
+        self.client.get(self.url)
+        storage = CookieStorage(RequestFactory().get(self.url))
+        self.client.cookies['messages'] = storage._encode([Message(messages.INFO, 'Flash for this visitor')])
+        self.assertContains(self.client.get(self.url), 'Flash for this visitor')
+        # Shown once, and never stored in the shared copy
+        self.assertNotContains(self.client.get(self.url), 'Flash for this visitor')
+
+    def test_authenticated_header_is_live_and_posts_fragment_is_shared(self):
+        other = User.objects.create_user(username='reader', password='pass12345')
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(self.url), 'Hello, writer!')
+        self.client.force_login(other)
+        # session and user only: the posts section comes from the fragment cache
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Hello, reader!')
+        self.assertContains(response, 'Cached title')
+        self.assertEqual(fragment_cache.stats()['fragments']['home-posts'], {'hits': 1, 'misses': 1})
+
+    def test_authenticated_pages_are_not_page_cached(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.assertIsNone(cache.get(page_key(RequestFactory().get(self.url))))
+
+    def test_stale_page_is_served_while_another_request_rebuilds(self):
+        self.client.get(self.url)
+        key = page_key(RequestFactory().get(self.url))
+        cache.add(f'{key}:lock', 1)
+        Post.objects.create(title='Not yet visible', content='Body', author=self.user)
+        with self.assertNumQueries(0):
+            self.assertNotContains(self.client.get(self.url), 'Not yet visible')
+        cache.delete(f'{key}:lock')
+        self.assertContains(self.client.get(self.url), 'Not yet visible')
+
+
+class GetOrBuildTests(TestCase):
+    """Tests for stampede protection in blog.caching.get_or_build."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_build(cache, 'key', 1, build, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_stale_value_served_while_locked(self):
+        cache.set('key', (1, 'old'))
+        cache.add('key:lock', 1)
+        self.assertEqual(get_or_build(cache, 'key', 2, lambda: 'new', 60), 'old')
+        cache.delete('key:lock')
+        self.assertEqual(get_or_build(cache, 'key', 2, lambda: 'new', 60), 'new')
+        self.assertEqual(cache.get('key'), (2, 'new'))
+
+    def test_gives_up_waiting_for_a_stuck_rebuild(self):
+        cache.add('key:lock', 1)
+        with mock.patch.object(caching, 'LOCK_WAIT', 0.02):
+            self.assertEqual(get_or_build(cache, 'key', 1, lambda: 'built', 60), 'built')
+
+    def test_none_is_not_cached(self):
+        self.assertIsNone(get_or_build(cache, 'key', 1, lambda: None, 60))
+        self.assertIsNone(cache.get('key'))
+        self.assertIsNone(cache.get('key:lock'))
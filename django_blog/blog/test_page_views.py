@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import page_views
+from .models import Post
+from .page_views import ViewCounter, view_counter
+
+
+class ViewCounterTests(TestCase):
+    """Tests for batched post view counting and the most viewed ranking."""
+
+    def setUp(self):
+        cache.clear()
+        view_counter.flush()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Body', author=self.user) for i in range(3)]
+
+    def view(self, post, **extra):
+        return self.client.get(reverse('blog:post_detail', args=[post.pk]), **extra)
+
+    def view_counts(self):
+        return list(Post.objects.order_by('pk').values_list('view_count', flat=True))
+
+    def test_views_are_counted_in_memory(self):
+        self.view(self.posts[0])
+        response = self.view(self.posts[0], HTTP_IF_NONE_MATCH=self.view(self.posts[0])['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.client.get(reverse('blog:post_detail', args=[9999]))
+        self.assertEqual(view_counter.pending, 3)
+        self.assertEqual(self.view_counts(), [0, 0, 0])
+
+    def test_flush_writes_one_update(self):
+        for post, views in zip(self.posts, (3, 1, 0)):
+            for _ in range(views):
+                self.view(post)
+        # savepoint, the UPDATE, release, and the ranking query
+        with self.assertNumQueries(4):
+            self.assertEqual(view_counter.flush(), 4)
+        self.assertEqual(self.view_counts(), [3, 1, 0])
+        self.assertEqual(view_counter.flush(), 0)
+        self.view(self.posts[1])
+        view_counter.flush()
+        self.assertEqual(self.view_counts(), [3, 2, 0])
+
+    def test_large_backlogs_are_batched(self):
+        counter = ViewCounter(batch_size=2)
+        for post in self.posts:
+            counter.add(post.pk, 2)
+        with self.assertNumQueries(2 + 2 + 1):
+            counter.flush()
+        self.assertEqual(self.view_counts(), [2, 2, 2])
+
+    def test_failed_flush_keeps_the_counts(self):
+        view_counter.add(self.posts[0].pk, 5)
+        with mock.patch('blog.page_views.Post.objects.filter', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                view_counter.flush()
+        view_counter.add(self.posts[0].pk)
+        view_counter.flush()
+        self.assertEqual(self.view_counts(), [6, 0, 0])
+
+    def test_deleted_posts(self):
+        view_counter.add(self.posts[0].pk)
+        view_counter.add(self.posts[1].pk)
+        view_counter.flush()
+        deleted_pk = self.posts[1].pk
+        self.posts[1].delete()
+        view_counter.add(self.posts[0].pk)
+        view_counter.add(deleted_pk)
+        self.assertEqual(view_counter.pending, 2)
+        # Counted after the delete: flushing just matches no row
+        view_counter.flush()
+        view_counter.add(self.posts[0].pk)
+        view_counter.add(deleted_pk)
+        self.assertEqual(view_counter.pending, 2)
+        self.assertEqual([entry['pk'] for entry in page_views.most_viewed()], [self.posts[0].pk])
+
+    @override_settings(BLOG_MOST_VIEWED=2)
+    def test_most_viewed_page(self):
+        for post, views in zip(self.posts, (1, 3, 2)):
+            view_counter.add(post.pk, views)
+        view_counter.flush()
+        # Served from the ranking stored by the flush
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('blog:most_viewed'))
+        self.assertEqual(
+            [(post['title'], post['view_count']) for post in response.context['posts']],
+            [('Post 1', 3), ('Post 2', 2)],
+        )
+        self.assertContains(response, '3 views')
+
+        # self.posts[1] was loaded before its views were flushed; saving it keeps them
+        self.posts[1].title = 'Renamed'
+        self.posts[1].save()
+        self.assertEqual(page_views.most_viewed()[0], {'pk': self.posts[1].pk, 'title': 'Renamed', 'view_count': 3})
+
+    def test_background_flusher(self):
+        counter = ViewCounter(flush_interval=60)
+        with mock.patch.object(counter, 'flush') as flush:
+            counter.start()
+            counter.stop()
+        flush.assert_called_once()
@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Post
+from .pagination import CursorPaginator, encode_cursor
+from .search import SearchPaginator
+
+
+class CursorPaginationTests(TestCase):
+    """Tests for keyset pagination of posts and search results."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        for i in range(25):
+            Post.objects.create(title=f'Django post {i}', content='Body', author=self.user)
+        # Give several posts the same timestamp so the pk tie-breaker matters
+        Post.objects.filter(pk__lte=6).update(published_date=timezone.now())
+        self.expected = list(Post.objects.order_by('-published_date', '-pk').values_list('pk', flat=True))
+
+    def walk(self, paginator):
+        """Follow next cursors to the end, then previous cursors back to the start"""
+        forward, pages = [], []
+        page = paginator.page()
+        while True:
+            pages.append([post.pk for post in page])
+            forward.extend(pages[-1])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        backward = [[post.pk for post in page]]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backward.append([post.pk for post in page])
+        return forward, pages, backward[::-1]
+
+    def test_walks_every_post_once_in_both_directions(self):
+        forward, pages, backward = self.walk(CursorPaginator(Post.objects.all(), 10))
+        self.assertEqual(forward, self.expected)
+        self.assertEqual(pages, backward)
+
+    def test_search_walks_every_hit_once(self):
+        forward, pages, backward = self.walk(SearchPaginator('django', 10))
+        self.assertEqual(sorted(forward), sorted(self.expected))
+        self.assertEqual(pages, backward)
+
+    @override_settings(BLOG_SEARCH_BACKEND='blog.search.LikeSearchBackend')
+    def test_like_search_walks_every_hit_once(self):
+        forward, pages, backward = self.walk(SearchPaginator('django', 10))
+        self.assertEqual(forward, self.expected)
+        self.assertEqual(pages, backward)
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = [post.pk for post in paginator.page()]
+        for token in ['garbage', encode_cursor(['not-a-date', 'x']), encode_cursor([1])]:
+            with self.subTest(token=token):
+                self.assertEqual([post.pk for post in paginator.page(token)], first)
+        response = self.client.get(reverse('blog:search'), {'q': 'django', 'cursor': encode_cursor(['x', 'y'])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_list_uses_cursor(self):
+        response = self.client.get(reverse('blog:post_list'))
+        page_obj = response.context['page_obj']
+        self.assertEqual([post.pk for post in response.context['posts']], self.expected[:10])
+        response = self.client.get(reverse('blog:post_list'), {'cursor': page_obj.next_cursor})
+        self.assertEqual([post.pk for post in response.context['posts']], self.expected[10:20])
+        self.assertContains(response, 'About 25 posts')
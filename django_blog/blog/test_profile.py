@@ -0,0 +1,113 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import author_stats
+from .comment_queue import CommentQueue
+from .models import AuthorStats, Comment, Post
+from .views import PROFILE_POSTS_PER_PAGE
+
+
+class AuthorStatsTests(TestCase):
+    """Tests for the denormalized per-author totals."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.other = User.objects.create_user(username='reader', password='pass12345')
+
+    def stats(self, user=None):
+        return AuthorStats.objects.get(user=user or self.user)
+
+    def test_counts_follow_posts_and_comments(self):
+        post = Post.objects.create(title='Post', content='Body', author=self.user)
+        Post.objects.create(title='Second', content='Body', author=self.user)
+        comment = Comment.objects.create(post=post, author=self.user, content='Own comment')
+        Comment.objects.create(post=post, author=self.other, content='Reply')
+        self.assertEqual((self.stats().post_count, self.stats().comment_count), (2, 1))
+        self.assertEqual((self.stats(self.other).post_count, self.stats(self.other).comment_count), (0, 1))
+
+        comment.delete()
+        post.delete()  # also deletes the other author's comment
+        self.assertEqual((self.stats().post_count, self.stats().comment_count), (1, 0))
+        self.assertEqual(self.stats(self.other).comment_count, 0)
+
+    def test_edits_update_last_activity(self):
+        post = Post.objects.create(title='Post', content='Body', author=self.user)
+        AuthorStats.objects.update(last_activity_at=timezone.now() - timedelta(days=1))
+        post.save()
+        self.assertGreater(self.stats().last_activity_at, timezone.now() - timedelta(minutes=1))
+
+    def test_deleting_an_author(self):
+        post = Post.objects.create(title='Post', content='Body', author=self.user)
+        Comment.objects.create(post=post, author=self.user, content='Own comment')
+        self.user.delete()
+        self.assertFalse(AuthorStats.objects.filter(user_id=self.user.pk).exists())
+
+    def test_queued_comments_are_counted(self):
+        post = Post.objects.create(title='Post', content='Body', author=self.user)
+        queue = CommentQueue()
+        queue.write([Comment(post_id=post.pk, author_id=self.other.pk, content='Queued') for _ in range(3)])
+        self.assertEqual(self.stats(self.other).comment_count, 3)
+
+    def test_rebuild(self):
+        post = Post.objects.create(title='Post', content='Body', author=self.user)
+        Comment.objects.bulk_create([Comment(post=post, author=self.other, content='Bulk') for _ in range(2)])
+        AuthorStats.objects.all().delete()
+        self.assertEqual(author_stats.rebuild(), 2)
+        self.assertEqual(self.stats().post_count, 1)
+        self.assertEqual(self.stats(self.other).comment_count, 2)
+        self.assertEqual(self.stats().last_activity_at, post.updated_at)
+
+
+class ProfilePostsTests(TestCase):
+    """Tests for the paginated profile post history."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.other = User.objects.create_user(username='reader', password='pass12345')
+        # Newest first, so 'Post 000' heads the history
+        Post.objects.bulk_create([
+            Post(title=f'Post {i:03}', content='Body', author=self.user)
+            for i in reversed(range(PROFILE_POSTS_PER_PAGE * 2 + 5))
+        ])
+        Post.objects.create(title='Someone else', content='Body', author=self.other)
+        author_stats.rebuild()
+        self.client.force_login(self.user)
+
+    def test_profile_shows_first_page_and_stats(self):
+        # session, user, stats row, one page of posts
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('blog:profile'))
+        self.assertContains(response, 'Post 000')
+        self.assertNotContains(response, f'Post {PROFILE_POSTS_PER_PAGE:03}')
+        self.assertNotContains(response, 'Someone else')
+        self.assertContains(response, f'<strong>{PROFILE_POSTS_PER_PAGE * 2 + 5}</strong> posts')
+        self.assertIsNotNone(response.context['page_obj'].next_cursor)
+
+    def test_fragment_endpoint_walks_the_history(self):
+        cursor = self.client.get(reverse('blog:profile')).context['page_obj'].next_cursor
+        titles = []
+        while cursor:
+            with self.assertNumQueries(3):
+                data = json.loads(self.client.get(reverse('blog:profile_posts'), {'cursor': cursor}).content)
+            titles += [line.split('>')[-1] for line in data['html'].split('</a></h4>')[:-1]]
+            cursor = data['next_cursor']
+        self.assertEqual(titles, [f'Post {i:03}' for i in range(PROFILE_POSTS_PER_PAGE, PROFILE_POSTS_PER_PAGE * 2 + 5)])
+
+    def test_author_without_stats_row(self):
+        self.client.force_login(self.other)
+        AuthorStats.objects.filter(user=self.other).delete()
+        response = self.client.get(reverse('blog:profile'))
+        self.assertContains(response, '<strong>0</strong> posts')
+        self.assertContains(response, 'Never')
+
+    def test_fragment_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('blog:profile_posts')).status_code, 302)
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Post
+
+# Maximum number of queries each listing page may run, independent of how
+# many posts are shown. Raise a budget only together with a matching change.
+QUERY_BUDGETS = {
+    'home': 2,
+    'post_list': 3,
+    'posts_by_tag': 3,
+    'search': 4,
+    'profile': 5,
+}
+
+
+class ListingQueryBudgetTests(TestCase):
+    """Regression tests that fail when a listing page goes over its query budget."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.add_posts(12)
+
+    def add_posts(self, count):
+        # Every post gets its own author and tag so per-row lookups would show up
+        for i in range(Post.objects.count(), Post.objects.count() + count):
+            author = self.user if i % 2 else User.objects.create_user(username=f'author{i}')
+            post = Post.objects.create(title=f'Post about django {i}', content='Body text', author=author)
+            post.tags.add('django', f'tag{i}')
+
+    def request_queries(self, name, url, params=None):
+        # Measure the worst case, with cached counts and fragments cold
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), QUERY_BUDGETS[name],
+            f'{name} ran {len(queries)} queries:\n' + '\n'.join(q['sql'] for q in queries),
+        )
+        return len(queries)
+
+    def pages(self):
+        return [
+            ('home', reverse('blog:home'), None),
+            ('post_list', reverse('blog:post_list'), None),
+            ('posts_by_tag', reverse('blog:posts_by_tag', args=['django']), None),
+            ('search', reverse('blog:search'), {'q': 'django'}),
+        ]
+
+    def test_anonymous_listings_within_budget(self):
+        for name, url, params in self.pages():
+            with self.subTest(page=name):
+                self.request_queries(name, url, params)
+
+    def test_profile_within_budget(self):
+        self.client.force_login(self.user)
+        self.request_queries('profile', reverse('blog:profile'))
+
+    def test_query_count_does_not_grow_with_posts(self):
+        before = {name: self.request_queries(name, url, params) for name, url, params in self.pages()}
+        self.add_posts(8)
+        after = {name: self.request_queries(name, url, params) for name, url, params in self.pages()}
+        self.assertEqual(before, after)
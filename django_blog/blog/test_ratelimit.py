@@ -0,0 +1,136 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Comment, Post
+from .ratelimit import get_rate_limit_backend, parse_rate
+
+LIMITS = {
+    'comment': {'user': '2/m', 'ip': '3/m'},
+    'post': {'user': '1/m'},
+    'register': {'ip': '1/h'},
+}
+
+
+@override_settings(BLOG_RATE_LIMITS=LIMITS)
+class RateLimitTests(TestCase):
+    """Tests for the write rate limits on comment, post and registration views."""
+
+    def setUp(self):
+        cache.clear()
+        get_rate_limit_backend().clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.user)
+        self.client.force_login(self.user)
+        self.comment_url = reverse('blog:comment_create', args=[self.post.pk])
+
+    def comment(self, client=None, **extra):
+        return (client or self.client).post(self.comment_url, {'content': 'A thoughtful comment'}, **extra)
+
+    def test_user_bucket(self):
+        self.assertEqual(self.comment().status_code, 302)
+        self.assertEqual(self.comment().status_code, 302)
+        # Rejected after reading the session, before the user or the post are loaded
+        with self.assertNumQueries(1):
+            response = self.comment()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Comment.objects.count(), 2)
+
+    @override_settings(BLOG_RATE_LIMITS={'comment': {'user': '2/m'}})
+    def test_user_bucket_is_shared_by_sessions(self):
+        self.assertEqual(self.comment().status_code, 302)
+        # Logging in again, or from another browser, does not give a fresh bucket
+        other_browser = self.client_class()
+        other_browser.force_login(self.user)
+        self.assertEqual(self.comment(other_browser).status_code, 302)
+        self.client.logout()
+        self.client.force_login(self.user)
+        self.assertEqual(self.comment().status_code, 429)
+        self.assertEqual(self.comment(other_browser).status_code, 429)
+
+    def test_ip_bucket_is_shared_by_sessions(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        other_client = self.client_class()
+        other_client.force_login(other)
+        self.assertEqual(self.comment().status_code, 302)
+        self.assertEqual(self.comment().status_code, 302)
+        self.assertEqual(self.comment(other_client).status_code, 302)
+        self.assertEqual(self.comment(other_client).status_code, 429)
+        # Another address has its own bucket
+        third = self.client_class()
+        third.force_login(User.objects.create_user(username='third', password='pass12345'))
+        self.assertEqual(self.comment(third, REMOTE_ADDR='10.0.0.2').status_code, 302)
+
+    @override_settings(BLOG_RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR', BLOG_RATE_LIMIT_TRUSTED_PROXIES=2)
+    def test_forwarded_for_entries_from_the_client_are_ignored(self):
+        self.client.logout()
+        for i in range(3):
+            # The client forges a new leftmost entry each time; the two proxies append theirs
+            forwarded = f'203.0.113.{i}, 198.51.100.7, 10.0.0.1'
+            self.assertEqual(self.comment(HTTP_X_FORWARDED_FOR=forwarded).status_code, 302)
+        self.assertEqual(self.comment(HTTP_X_FORWARDED_FOR='203.0.113.9, 198.51.100.7, 10.0.0.1').status_code, 429)
+        self.assertEqual(self.comment(HTTP_X_FORWARDED_FOR='198.51.100.8, 10.0.0.1').status_code, 302)
+
+    def test_tokens_refill_over_time(self):
+        with mock.patch('blog.ratelimit.time.time', return_value=1000.0):
+            self.comment()
+            self.comment()
+            self.assertEqual(self.comment().status_code, 429)
+        with mock.patch('blog.ratelimit.time.time', return_value=1030.0):
+            self.assertEqual(self.comment().status_code, 302)
+            self.assertEqual(self.comment().status_code, 429)
+
+    def test_reads_are_not_limited(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.comment_url).status_code, 200)
+
+    def test_views_have_separate_scopes(self):
+        self.comment()
+        self.comment()
+        post_url = reverse('blog:post_create')
+        self.assertEqual(self.client.post(post_url, {'title': 'New', 'content': 'Body'}).status_code, 302)
+        self.assertEqual(self.client.post(post_url, {'title': 'Again', 'content': 'Body'}).status_code, 429)
+        add_url = reverse('blog:add_comment', args=[self.post.pk])
+        self.assertEqual(self.client.post(add_url, {'content': 'A thoughtful comment'}).status_code, 429)
+
+    def test_register_is_limited_per_ip(self):
+        self.client.logout()
+        data = {'username': 'newbie', 'email': 'n@example.com', 'password1': 'Str0ng-pass!', 'password2': 'Str0ng-pass!'}
+        self.assertEqual(self.client.post(reverse('blog:register'), data).status_code, 302)
+        self.client.logout()
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('blog:register'), {**data, 'username': 'another'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+
+    def test_queued_comments_are_limited(self):
+        url = reverse('blog:enqueue_comment', args=[self.post.pk])
+        with mock.patch('blog.views.comment_queue.submit', return_value=True):
+            self.assertEqual(self.client.post(url, {'content': 'A thoughtful comment'}).status_code, 302)
+            self.assertEqual(self.client.post(url, {'content': 'A thoughtful comment'}).status_code, 302)
+            self.assertEqual(self.client.post(url, {'content': 'A thoughtful comment'}).status_code, 429)
+
+    @override_settings(BLOG_RATE_LIMIT_BACKEND='blog.ratelimit.CacheBackend')
+    def test_cache_backend(self):
+        self.comment()
+        self.comment()
+        self.assertEqual(self.comment().status_code, 429)
+        # The buckets live in the cache, not in this process
+        cache.clear()
+        self.assertEqual(self.comment().status_code, 302)
+
+    @override_settings(BLOG_RATE_LIMITS={})
+    def test_unconfigured_views_are_not_limited(self):
+        for _ in range(4):
+            self.assertEqual(self.comment().status_code, 302)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/m'), (10, 10 / 60))
+        self.assertEqual(parse_rate('5/hour'), (5, 5 / 3600))
+        with self.assertRaises(ImproperlyConfigured):
+            parse_rate('ten per minute')
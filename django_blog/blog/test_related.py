@@ -0,0 +1,84 @@
+from unittest import skipIf
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import related
+from .models import Post, RelatedPost
+
+
+class RelatedPostsTests(TestCase):
+    """Tests for tag-overlap scoring and the related posts table."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.posts = {}
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, tags in [
+                ('a', ['python', 'django', 'rare']),
+                ('b', ['python', 'django']),
+                ('c', ['rare']),
+                ('d', ['cooking']),
+                ('e', ['python']),
+            ]:
+                post = Post.objects.create(title=f'Post {name}', content='Body', author=self.user)
+                post.tags.add(*tags)
+                self.posts[name] = post
+
+    def table(self):
+        return {
+            (post_id, related_id): round(score, 9)
+            for post_id, related_id, score in RelatedPost.objects.values_list('post_id', 'related_id', 'score')
+        }
+
+    def titles(self, name):
+        return [post.title for post in related.related_posts(self.posts[name])]
+
+    def test_rare_shared_tags_rank_higher(self):
+        related.rebuild(use_numpy=False)
+        self.assertEqual(self.titles('a'), ['Post b', 'Post c', 'Post e'])
+        self.assertEqual(self.titles('c'), ['Post a'])
+        self.assertEqual(self.titles('d'), [])
+
+    def test_incremental_updates_match_full_rebuild(self):
+        incremental = self.table()
+        related.rebuild(use_numpy=False)
+        self.assertEqual(incremental, self.table())
+
+    def test_tag_change_updates_both_directions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['d'].tags.add('rare')
+        self.assertIn('Post d', self.titles('c'))
+        self.assertIn('Post c', self.titles('d'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['d'].tags.remove('rare')
+        self.assertNotIn('Post d', self.titles('c'))
+
+    @override_settings(BLOG_RELATED_POSTS=1)
+    def test_lists_keep_only_best_matches(self):
+        related.rebuild(use_numpy=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            twin = Post.objects.create(title='Post twin', content='Body', author=self.user)
+            twin.tags.add('python', 'django')
+        self.assertEqual(self.titles('b'), ['Post twin'])
+        self.assertEqual(RelatedPost.objects.filter(post=self.posts['b']).count(), 1)
+
+    @skipIf(related.numpy is None, 'NumPy is not installed')
+    def test_numpy_builder_matches_python(self):
+        related.rebuild(use_numpy=False)
+        expected = self.table()
+        related.rebuild(use_numpy=True)
+        self.assertEqual(self.table(), expected)
+
+    @skipIf(related.numpy is None, 'NumPy is not installed')
+    def test_numpy_builder_without_shared_tags(self):
+        Post.objects.exclude(pk=self.posts['d'].pk).delete()
+        self.assertEqual(related.rebuild(use_numpy=True), 0)
+
+    def test_detail_panel(self):
+        response = self.client.get(reverse('blog:post_detail', args=[self.posts['c'].pk]))
+        self.assertContains(response, 'Related Posts')
+        self.assertEqual([post.title for post in response.context['related_posts']], ['Post a'])
@@ -0,0 +1,100 @@
+import io
+from unittest import skipIf
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template.defaultfilters import linebreaks_filter, truncatewords
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import rendering
+from .models import Comment, Post
+from .rendering import sanitize
+
+BODY = 'First <b>paragraph</b> & more.\n\n' + ' '.join(f'word{i}' for i in range(40))
+
+
+class RenderedContentTests(TestCase):
+    """Tests for the content_html and excerpt columns."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Rendered', content=BODY, author=self.user)
+
+    def test_save_matches_the_template_filters(self):
+        self.assertEqual(self.post.content_html, linebreaks_filter(BODY))
+        self.assertEqual(self.post.excerpt, truncatewords(BODY, 30))
+        comment = Comment.objects.create(post=self.post, author=self.user, content='Line one\nline <two>')
+        self.assertEqual(comment.content_html, '<p>Line one<br>line &lt;two&gt;</p>')
+
+    def test_partial_saves(self):
+        self.post.content = 'Edited'
+        self.post.save(update_fields=['content'])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.content_html, self.post.excerpt), ('<p>Edited</p>', 'Edited'))
+        # Saves that do not write the content leave the rendered columns alone
+        Post.objects.filter(pk=self.post.pk).update(content_html='<p>kept</p>')
+        self.post.title = 'Retitled'
+        self.post.save(update_fields=['title'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content_html, '<p>kept</p>')
+
+    def test_templates_use_the_columns(self):
+        Post.objects.filter(pk=self.post.pk).update(content_html='<p>from the column</p>', excerpt='Short excerpt')
+        self.assertContains(self.client.get(reverse('blog:post_detail', args=[self.post.pk])), '<p>from the column</p>')
+        self.assertContains(self.client.get(reverse('blog:post_list')), 'Short excerpt')
+
+    def test_rebuild_command_backfills_in_batches(self):
+        Comment.objects.create(post=self.post, author=self.user, content='A comment')
+        Post.objects.bulk_create([Post(title=f'Bulk {i}', content=f'Bulk body {i}', author=self.user) for i in range(4)])
+        Post.objects.update(content_html='', excerpt='')
+        Comment.objects.update(content_html='')
+        out = io.StringIO()
+        call_command('rebuild_rendered_content', batch_size=2, stdout=out)
+        self.assertIn('Rendered 4 posts', out.getvalue())
+        self.assertIn('Successfully rendered 5 posts', out.getvalue())
+        for post in Post.objects.all():
+            self.assertEqual(post.content_html, linebreaks_filter(post.content))
+            self.assertEqual(post.excerpt, truncatewords(post.content, 30))
+        self.assertEqual(Comment.objects.get().content_html, '<p>A comment</p>')
+
+    @override_settings(BLOG_EXCERPT_WORDS=3)
+    def test_excerpt_length_is_configurable(self):
+        post = Post.objects.create(title='Short', content='one two three four five', author=self.user)
+        self.assertEqual(post.excerpt, 'one two three …')
+
+    @skipIf(rendering.markdown is None, 'markdown is not installed')
+    @override_settings(BLOG_MARKDOWN=True)
+    def test_markdown(self):
+        post = Post.objects.create(
+            title='Markdown', content='# Title\n\nSome *emphasis* <script>alert(1)</script>', author=self.user,
+        )
+        self.assertIn('<h1>Title</h1>', post.content_html)
+        self.assertIn('<em>emphasis</em>', post.content_html)
+        self.assertNotIn('script', post.content_html)
+        self.assertEqual(post.excerpt, 'Title Some emphasis')
+
+
+class SanitizeTests(TestCase):
+    """Tests for the allowlist HTML sanitizer used on Markdown output."""
+
+    def test_keeps_allowed_markup(self):
+        html = '<p>A <strong>bold</strong> <a href="https://example.com/?a=1&amp;b=2" title="t">link</a></p>'
+        self.assertEqual(
+            sanitize(html),
+            '<p>A <strong>bold</strong> <a href="https://example.com/?a=1&amp;b=2" title="t" rel="nofollow">link</a></p>',
+        )
+
+    def test_removes_scripts_handlers_and_unsafe_urls(self):
+        html = (
+            '<p onclick="steal()">Hi<script>alert(1)</script></p>'
+            '<a href="javascript:alert(1)">x</a><img src="data:image/png;base64,AAA" alt="i">'
+            '<iframe src="https://evil.example"><b>inside</b></iframe><style>p {}</style>'
+        )
+        self.assertEqual(sanitize(html), '<p>Hi</p><a rel="nofollow">x</a><img alt="i">')
+
+    def test_escapes_text_and_closes_unbalanced_tags(self):
+        self.assertEqual(sanitize('<p><em>1 &lt; 2 </p>'), '<p><em>1 &lt; 2 </em></p>')
+        self.assertEqual(sanitize('<div>text</div></em>'), 'text')
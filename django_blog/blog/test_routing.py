@@ -0,0 +1,113 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .caching import GENERATION_KEY, LISTING_KEY, fragment_cache
+from .models import Post
+from .ratelimit import get_rate_limit_backend
+from .rendering import render_fields
+from .routing import PIN_COOKIE
+from .search import SQLiteFTSBackend, get_search_backend
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """Tests for replica reads against two separate SQLite databases."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        get_rate_limit_backend().clear()
+        fragment_cache.reset_stats()
+        # The replica is deliberately out of date: it has the user but only
+        # an older post, so each page shows which database it read from.
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        User.objects.using('replica').bulk_create([User(pk=self.user.pk, username='writer', password=self.user.password)])
+        self.primary = Post.objects.create(title='Fresh on primary', content='Body', author=self.user)
+        self.primary.tags.add('django')
+        self.stale = render_fields(
+            Post(pk=self.primary.pk + 1, title='Stale on replica', content='Replicated body', author=self.user)
+        )
+        Post.objects.using('replica').bulk_create([self.stale])
+
+    def test_listing_pages_read_from_replica(self):
+        for url in [reverse('blog:home'), reverse('blog:post_list')]:
+            response = self.client.get(url)
+            self.assertContains(response, 'Stale on replica')
+            self.assertNotContains(response, 'Fresh on primary')
+
+    def test_detail_page_reads_from_replica(self):
+        self.assertEqual(self.client.get(reverse('blog:post_detail', args=[self.primary.pk])).status_code, 404)
+        response = self.client.get(reverse('blog:post_detail', args=[self.stale.pk]))
+        self.assertContains(response, 'Replicated body')
+
+    def test_tag_page_and_search_read_from_replica(self):
+        response = self.client.get(reverse('blog:posts_by_tag', args=['django']))
+        self.assertNotContains(response, 'Fresh on primary')
+        if isinstance(get_search_backend(), SQLiteFTSBackend):
+            replica_index = SQLiteFTSBackend()
+            replica_index.using = 'replica'
+            replica_index.index_post(self.stale)
+        response = self.client.get(reverse('blog:search'), {'q': 'body'})
+        self.assertContains(response, 'Stale on replica')
+        self.assertNotContains(response, 'Fresh on primary')
+
+    def test_other_views_use_primary(self):
+        response = self.client.get(reverse('blog:tag_cloud'))
+        self.assertContains(response, 'django')
+
+    @override_settings(BLOG_READ_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        self.assertContains(self.client.get(reverse('blog:home')), 'Fresh on primary')
+
+    def test_writes_pin_client_to_primary(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('blog:post_create'), {'title': 'Just written', 'content': 'New body'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Post.objects.filter(title='Just written').exists())
+        self.assertFalse(Post.objects.using('replica').filter(title='Just written').exists())
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        # Read-your-own-writes: the follow-up page comes from the primary
+        self.assertContains(self.client.get(reverse('blog:home')), 'Just written')
+
+    def test_pin_expires(self):
+        self.client.cookies[PIN_COOKIE] = str(time.time() - 1)
+        self.assertContains(self.client.get(reverse('blog:home')), 'Stale on replica')
+        self.client.cookies[PIN_COOKIE] = str(time.time() + 60)
+        self.assertContains(self.client.get(reverse('blog:home')), 'Fresh on primary')
+
+    def test_reads_do_not_pin(self):
+        response = self.client.get(reverse('blog:home'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(BLOG_REPLICA_PIN_SECONDS=30)
+    def test_pin_window_is_configurable(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('blog:post_create'), {'title': 'Just written', 'content': 'New body'})
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 30)
+
+    def test_logged_in_pages_read_session_from_primary(self):
+        # The session row only exists on the primary
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('blog:home'))
+        self.assertEqual(response.context['user'].pk, self.user.pk)
+        self.assertContains(response, 'Stale on replica')
+
+    def test_recent_changes_are_not_cached_from_replica(self):
+        url = reverse('blog:post_detail', args=[self.stale.pk])
+        # Post saves just replaced the stamps: the replica may still be behind
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(fragment_cache.stats()['misses'], 1)
+        self.client.get(url)
+        self.assertEqual(fragment_cache.stats()['misses'], 2)
+
+        old = time.time_ns() - 60 * 10 ** 9
+        cache.set_many({LISTING_KEY: old, GENERATION_KEY: old, fragment_cache.version_key(self.stale.pk): old}, None)
+        self.assertTrue(self.client.get(url).has_header('ETag'))
+        self.client.get(url)
+        self.assertEqual(fragment_cache.stats()['hits'], 1)
@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Post
+from .search import LikeSearchBackend, SearchPaginator, get_search_backend
+
+
+class SearchIndexTests(TestCase):
+    """Tests for the full-text search index and the search view."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.django_post = Post.objects.create(
+            title='Django tips', content='Working with querysets.', author=self.user)
+        self.django_post.tags.add('python')
+        self.other_post = Post.objects.create(
+            title='Gardening', content='Tomatoes and a little django in the footnote.', author=self.user)
+
+    def test_prefix_match(self):
+        backend = get_search_backend()
+        self.assertIn(self.django_post.pk, backend.search('djan'))
+
+    def test_title_match_ranks_first(self):
+        backend = get_search_backend()
+        self.assertEqual(backend.search('django'), [self.django_post.pk, self.other_post.pk])
+
+    def test_tags_are_indexed(self):
+        backend = get_search_backend()
+        self.assertEqual(backend.search('python'), [self.django_post.pk])
+        self.django_post.tags.remove('python')
+        self.assertEqual(backend.search('python'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        backend = get_search_backend()
+        self.other_post.title = 'Composting'
+        self.other_post.content = 'Nothing about frameworks.'
+        self.other_post.save()
+        self.assertEqual(backend.search('django'), [self.django_post.pk])
+        self.django_post.delete()
+        self.assertEqual(backend.count('django'), 0)
+
+    def test_query_syntax_is_escaped(self):
+        backend = get_search_backend()
+        self.assertEqual(backend.search('"django* -('), [self.django_post.pk, self.other_post.pk])
+        self.assertEqual(backend.search('***'), [])
+
+    def test_results_paginate(self):
+        for i in range(15):
+            Post.objects.create(title=f'Paged django {i}', content='body', author=self.user)
+        first = self.client.get(reverse('blog:search'), {'q': 'django'})
+        self.assertEqual(first.context['results_count'], 17)
+        cursor = first.context['page_obj'].next_cursor
+        second = self.client.get(reverse('blog:search'), {'q': 'django', 'cursor': cursor})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(second.context['posts']), 7)
+        seen = {post.pk for post in first.context['posts']} | {post.pk for post in second.context['posts']}
+        self.assertEqual(len(seen), 17)
+        self.assertFalse(second.context['page_obj'].has_next())
+
+    @override_settings(BLOG_SEARCH_BACKEND='blog.search.LikeSearchBackend')
+    def test_like_backend_setting(self):
+        paginator = SearchPaginator('footnote', 10)
+        self.assertIsInstance(paginator.backend, LikeSearchBackend)
+        self.assertEqual([post.pk for post in paginator.page()], [self.other_post.pk])
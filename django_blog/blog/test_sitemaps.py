@@ -0,0 +1,133 @@
+import io
+import os
+import re
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from . import sitemaps
+from .models import Post
+
+
+class SitemapTests(TestCase):
+    """Tests for the sharded, disk-cached sitemap index."""
+
+    def setUp(self):
+        cache.clear()
+        sitemaps.reset()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        settings = override_settings(
+            BLOG_SITEMAP_DIR=self.dir.name, BLOG_SITEMAP_SHARD_SIZE=2, ALLOWED_HOSTS=['testserver', '.example.com'],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(username='writer')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Body', author=self.user) for i in range(5)]
+
+    def shard_of(self, post):
+        return (post.pk - 1) // 2
+
+    def locs(self, response):
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return re.findall(r'<loc>([^<]+)</loc>', content.decode())
+
+    def test_index_lists_one_sitemap_per_shard(self):
+        response = self.client.get(reverse('blog:sitemap'))
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        shards = sorted({self.shard_of(post) for post in self.posts})
+        self.assertEqual(self.locs(response), [
+            f'http://testserver{reverse("blog:sitemap_shard", args=[shard])}' for shard in shards
+        ])
+        latest = max(post.updated_at for post in self.posts)
+        self.assertEqual(response['Last-Modified'], http_date(latest.timestamp()))
+
+    def test_shards_list_their_posts_and_answer_if_modified_since(self):
+        post = self.posts[0]
+        url = reverse('blog:sitemap_shard', args=[self.shard_of(post)])
+        response = self.client.get(url)
+        in_shard = [p for p in self.posts if self.shard_of(p) == self.shard_of(post)]
+        self.assertEqual(self.locs(response), [
+            f'http://testserver{reverse("blog:post_detail", args=[p.pk])}' for p in in_shard
+        ])
+        modified = response['Last-Modified']
+        self.assertEqual(modified, http_date(max(p.updated_at for p in in_shard).timestamp()))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+        self.assertEqual(self.client.get(reverse('blog:sitemap_shard', args=[99])).status_code, 404)
+
+    def test_only_changed_shards_are_written_again(self):
+        self.client.get(reverse('blog:sitemap'))
+        # Unchanged listing stamp: no queries, nothing written
+        with self.assertNumQueries(0), mock.patch.object(sitemaps, 'write_shards') as write:
+            self.client.get(reverse('blog:sitemap'))
+        write.assert_not_called()
+
+        edited = self.posts[2]
+        edited.title = 'Edited'
+        edited.save()
+        with mock.patch.object(sitemaps, 'write_shards', wraps=sitemaps.write_shards) as write:
+            self.client.get(reverse('blog:sitemap'))
+        write.assert_called_once()
+        self.assertEqual(write.call_args.args[0], [self.shard_of(edited)])
+
+        # A new process sees the files on disk are current
+        sitemaps.reset()
+        with mock.patch.object(sitemaps, 'write_shards') as write:
+            self.client.get(reverse('blog:sitemap'))
+        write.assert_not_called()
+
+    def test_shards_emptied_by_deletes_are_removed(self):
+        self.client.get(reverse('blog:sitemap'))
+        shard = self.shard_of(self.posts[-1])
+        path = sitemaps.shard_path(shard, 'http://testserver')
+        self.assertTrue(os.path.exists(path))
+        Post.objects.filter(pk__in=[post.pk for post in self.posts if self.shard_of(post) == shard]).delete()
+        response = self.client.get(reverse('blog:sitemap'))
+        self.assertNotIn(f'http://testserver{reverse("blog:sitemap_shard", args=[shard])}', self.locs(response))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.client.get(reverse('blog:sitemap_shard', args=[shard])).status_code, 404)
+
+    def test_other_hosts_get_their_own_files(self):
+        self.client.get(reverse('blog:sitemap'))
+        shard = self.shard_of(self.posts[0])
+        response = self.client.get(reverse('blog:sitemap_shard', args=[shard]), HTTP_HOST='blog.example.com')
+        locs = self.locs(response)
+        self.assertTrue(locs)
+        self.assertTrue(all(loc.startswith('http://blog.example.com/') for loc in locs))
+        # Alternating hosts and schemes keeps both sets of files valid
+        with mock.patch.object(sitemaps, 'write_shards') as write:
+            for secure in (False, True, False, True):
+                self.client.get(reverse('blog:sitemap'), secure=secure)
+                self.client.get(reverse('blog:sitemap'), HTTP_HOST='blog.example.com')
+        self.assertEqual(write.call_count, 1)
+
+    @override_settings(BLOG_SITEMAP_BASE_URL='https://blog.example.com/')
+    def test_configured_base_url_ignores_the_request_host(self):
+        response = self.client.get(reverse('blog:sitemap'), HTTP_HOST='evil.example.com')
+        locs = self.locs(response)
+        self.assertTrue(locs)
+        self.assertTrue(all(loc.startswith('https://blog.example.com/') for loc in locs))
+        with mock.patch.object(sitemaps, 'write_shards') as write:
+            self.client.get(reverse('blog:sitemap'), HTTP_HOST='other.example.com', secure=True)
+        write.assert_not_called()
+        self.assertEqual(os.listdir(self.dir.name), ['https_blog.example.com'])
+
+    def test_rebuild_command_writes_every_shard(self):
+        out = io.StringIO()
+        call_command('rebuild_sitemaps', '--base-url', 'https://blog.example.com/', stdout=out)
+        shards = {self.shard_of(post) for post in self.posts}
+        self.assertIn(f'Successfully wrote {len(shards)} sitemaps with 5 posts', out.getvalue())
+        directory = os.path.dirname(sitemaps.shard_path(0, 'https://blog.example.com'))
+        self.assertEqual(
+            {name for name in os.listdir(directory) if name.startswith('sitemap-')},
+            {f'sitemap-{shard}.xml' for shard in shards},
+        )
+        with open(sitemaps.shard_path(self.shard_of(self.posts[0]), 'https://blog.example.com'), encoding='utf-8') as stream:
+            self.assertIn(f'<loc>https://blog.example.com/post/{self.posts[0].pk}/</loc>', stream.read())
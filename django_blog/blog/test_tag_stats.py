@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import tag_stats
+from .forms import PostForm
+from .models import TagStat
+
+
+class TagStatsTests(TestCase):
+    """Tests for incrementally maintained tag counts and the tag cloud."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+
+    def create_post(self, tags, **fields):
+        form = PostForm(data={'title': 'Tagged', 'content': 'Body', 'tags': tags}, **fields)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = self.user
+        return form.save()
+
+    def counts(self):
+        return dict(TagStat.objects.filter(post_count__gt=0).values_list('tag__name', 'post_count'))
+
+    def test_counts_follow_form_saves(self):
+        post = self.create_post('django, python')
+        self.create_post('django')
+        self.assertEqual(self.counts(), {'django': 2, 'python': 1})
+        self.create_post('python, web', instance=post)
+        self.assertEqual(self.counts(), {'django': 1, 'python': 1, 'web': 1})
+
+    def test_post_delete_decrements(self):
+        post = self.create_post('django, python')
+        post.delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_counts_match_rebuild(self):
+        first = self.create_post('django, python, web')
+        self.create_post('django, web')
+        first.tags.remove('web')
+        expected = self.counts()
+        call_command('rebuild_tag_stats', stdout=StringIO())
+        self.assertEqual(self.counts(), expected)
+
+    def test_cloud_orders_by_count(self):
+        self.create_post('django, python')
+        self.create_post('django')
+        cloud = tag_stats.cloud()
+        self.assertEqual([(tag['name'], tag['count']) for tag in cloud], [('django', 2), ('python', 1)])
+        self.assertEqual([tag['weight'] for tag in cloud], [5, 1])
+        response = self.client.get(reverse('blog:tag_cloud'))
+        self.assertContains(response, 'tag-weight-5')
+
+    def test_snapshot_is_dropped_when_the_counts_commit(self):
+        self.assertIsNone(tag_stats.lookup('django'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_post('django')
+            # Still the snapshot from before the transaction
+            self.assertIsNone(tag_stats.lookup('django'))
+        self.assertEqual(tag_stats.lookup('django')[1], 1)
+
+    def test_tag_page_lookup_is_cached(self):
+        self.create_post('django')
+        url = reverse('blog:posts_by_tag', args=['django'])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['results_count'], 1)
+        # Only the page of posts and their prefetched tags hit the database
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('blog_tagstat', ' '.join(q['sql'] for q in queries))
+        self.assertEqual(self.client.get(reverse('blog:posts_by_tag', args=['missing'])).status_code, 404)
@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models.signals import m2m_changed
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from taggit.models import Tag
+
+from .models import Post
+from .tagging import resolve_tags, set_tags
+
+
+class SetTagsTests(TestCase):
+    """Tests for diff-based tag updates."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(title='Tagged', content='Body', author=self.user)
+        self.actions = []
+        m2m_changed.connect(self.record, sender=Post.tags.through)
+
+    def tearDown(self):
+        m2m_changed.disconnect(self.record, sender=Post.tags.through)
+
+    def record(self, action, pk_set, **kwargs):
+        self.actions.append((action, set(pk_set or ())))
+
+    def names(self):
+        return sorted(self.post.tags.names())
+
+    def test_unchanged_tags_write_nothing(self):
+        set_tags(self.post, ['django', 'python'])
+        self.actions.clear()
+        with CaptureQueriesContext(connection) as queries:
+            set_tags(self.post, ['python', 'django'])
+        self.assertEqual(self.actions, [])
+        self.assertEqual(len(queries), 1)
+
+    def test_only_differences_are_applied(self):
+        set_tags(self.post, ['django', 'python'])
+        django_id = Tag.objects.get(name='django').pk
+        self.actions.clear()
+        set_tags(self.post, ['python', 'web'])
+        web_id = Tag.objects.get(name='web').pk
+        self.assertEqual(self.names(), ['python', 'web'])
+        self.assertEqual(self.actions, [
+            ('pre_remove', {django_id}), ('post_remove', {django_id}),
+            ('pre_add', {web_id}), ('post_add', {web_id}),
+        ])
+
+    def test_many_new_tags_use_constant_queries(self):
+        names = [f'tag-{i}' for i in range(60)]
+        with CaptureQueriesContext(connection) as queries:
+            set_tags(self.post, names)
+        self.assertEqual(self.names(), sorted(names))
+        self.assertLess(len(queries), 20)
+
+    def test_slug_clash_falls_back_to_unique_slug(self):
+        Tag.objects.create(name='C', slug='c')
+        tags = resolve_tags(['c', 'c++'])
+        self.assertEqual(set(tags), {'c', 'c++'})
+        self.assertEqual(len({tag.slug for tag in tags.values()} | {'c'}), 3)
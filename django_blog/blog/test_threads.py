@@ -0,0 +1,186 @@
+import io
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import threads
+from .comment_queue import CommentQueue
+from .models import Comment, Post, comment_path_segment
+from .ratelimit import get_rate_limit_backend
+
+
+class ThreadTests(TestCase):
+    """Tests for reply paths, depth limits and reply counts."""
+
+    def setUp(self):
+        cache.clear()
+        get_rate_limit_backend().clear()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.post = Post.objects.create(title='Busy', content='Body', author=self.user)
+        self.root = Comment.objects.create(post=self.post, author=self.user, content='Root comment')
+
+    def reply(self, parent, content='A thoughtful reply'):
+        self.client.force_login(self.user)
+        return self.client.post(
+            reverse('blog:comment_create', args=[self.post.pk]), {'content': content, 'parent': parent.pk},
+        )
+
+    def test_replies_extend_their_parents_path(self):
+        self.assertEqual((self.root.path, self.root.depth), (comment_path_segment(self.root.pk), 0))
+        self.reply(self.root)
+        reply = Comment.objects.get(parent=self.root)
+        self.assertEqual(reply.path, self.root.path + comment_path_segment(reply.pk))
+        self.assertEqual(reply.depth, 1)
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.reply_count, 1)
+
+        later = Comment.objects.create(post=self.post, author=self.user, content='Later root')
+        # Depth-first thread order: the reply sorts between its parent and the next root
+        self.assertEqual(
+            list(Comment.objects.filter(post=self.post).order_by('path').values_list('pk', flat=True)),
+            [self.root.pk, reply.pk, later.pk],
+        )
+
+    @override_settings(BLOG_COMMENT_MAX_DEPTH=2)
+    def test_replies_past_the_max_depth_join_the_parents_replies(self):
+        parent = self.root
+        for _ in range(4):
+            self.reply(parent)
+            parent = Comment.objects.filter(post=self.post).latest('pk')
+        depths = list(Comment.objects.order_by('pk').values_list('depth', flat=True))
+        self.assertEqual(depths, [0, 1, 2, 2, 2])
+        deepest = Comment.objects.filter(depth=2).order_by('pk')
+        self.assertEqual({comment.parent_id for comment in deepest}, {deepest[0].parent_id})
+
+    def test_reply_to_another_posts_comment_is_rejected(self):
+        other = Post.objects.create(title='Other', content='Body', author=self.user)
+        foreign = Comment.objects.create(post=other, author=self.user, content='Elsewhere')
+        self.assertEqual(self.reply(foreign).status_code, 404)
+        self.client.force_login(self.user)
+        url = reverse('blog:comment_create', args=[self.post.pk])
+        self.assertEqual(self.client.post(url, {'content': 'A thoughtful reply', 'parent': 'x'}).status_code, 404)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_queued_replies_get_paths_and_counts(self):
+        queue = CommentQueue(worker=False)
+        queue.submit(self.post.pk, self.user.pk, 'Queued reply', self.root.pk)
+        queue.drain()
+        reply = Comment.objects.get(content='Queued reply')
+        self.assertEqual((reply.parent_id, reply.depth), (self.root.pk, 1))
+        self.assertTrue(reply.path.startswith(self.root.path))
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.reply_count, 1)
+
+    def test_editing_a_loaded_comment_keeps_its_reply_count(self):
+        root = Comment.objects.get(pk=self.root.pk)
+        self.reply(self.root)
+        root.content = 'Edited root comment'
+        root.save()
+        self.root.refresh_from_db()
+        self.assertEqual((self.root.content, self.root.reply_count), ('Edited root comment', 1))
+
+    def test_deleting_a_comment_deletes_its_replies(self):
+        self.reply(self.root)
+        self.reply(Comment.objects.get(parent=self.root))
+        self.root.delete()
+        self.assertFalse(Comment.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_existing_comments_are_backfilled_as_roots(self):
+        Comment.objects.create(post=self.post, author=self.user, content='Second root')
+        Comment.objects.update(path='', depth=0)
+        self.assertEqual(list(threads.backfill_paths(batch_size=1)), [1, 2])
+        self.assertEqual(
+            [(path, depth) for pk, path, depth in Comment.objects.order_by('pk').values_list('pk', 'path', 'depth')],
+            [(comment_path_segment(pk), 0) for pk in Comment.objects.order_by('pk').values_list('pk', flat=True)],
+        )
+
+    def test_rebuild_recounts_replies(self):
+        self.reply(self.root)
+        Comment.objects.update(reply_count=7)
+        call_command('rebuild_comment_counts', stdout=io.StringIO())
+        self.assertEqual(
+            list(Comment.objects.order_by('pk').values_list('reply_count', flat=True)), [1, 0],
+        )
+
+
+@override_settings(BLOG_COMMENTS_PER_PAGE=50, BLOG_COMMENT_INLINE_DEPTH=3)
+class LargeThreadTests(TestCase):
+    """Query counts and paging on a 5,000 comment thread."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='pass12345')
+        cls.post = Post.objects.create(title='Busy', content='Body', author=cls.user)
+        cls.quiet = Post.objects.create(title='Quiet', content='Body', author=cls.user)
+        Comment.objects.create(post=cls.quiet, author=cls.user, content='Only comment')
+        # 10 roots with 10 replies each, 10 replies to each of those and 3890 below them
+        level, total = [None] * 10, 0
+        for fanout in (1, 10, 10, None):
+            fanout = fanout or -(-(5000 - total) // len(level))
+            comments = [
+                Comment(post=cls.post, author=cls.user, content=f'Comment {total + i}', parent=parent)
+                for i, parent in enumerate(parent for parent in level for _ in range(fanout))
+            ][:5000 - total]
+            level = Comment.objects.bulk_create(comments)
+            threads.assign_paths(level)
+            total += len(level)
+        call_command('rebuild_comment_counts', stdout=io.StringIO())
+        Post.objects.filter(pk=cls.post.pk).update(comment_count=total)
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_detail_queries_do_not_depend_on_thread_size(self):
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 5000)
+        small, _ = self.count_queries(reverse('blog:post_detail', args=[self.quiet.pk]))
+        large, response = self.count_queries(reverse('blog:post_detail', args=[self.post.pk]))
+        self.assertEqual(large, small)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 50)
+        self.assertEqual(max(comment.depth for comment in comments), 2)
+        self.assertContains(response, 'class="show-replies"')
+        self.assertIsNotNone(response.context['comments_page'].next_cursor)
+
+    def test_fragments_page_through_the_thread(self):
+        url = reverse('blog:comment_thread', args=[self.post.pk])
+        seen, cursor, counts = [], None, set()
+        while True:
+            queries, response = self.count_queries(url, **({'cursor': cursor} if cursor else {}))
+            counts.add(queries)
+            data = json.loads(response.content)
+            seen.extend(int(pk) for pk in re.findall(r'id="comment-(\d+)"', data['html']))
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        # Every comment of the first three levels once, in thread order
+        inline = Comment.objects.filter(post=self.post, depth__lt=3).order_by('path')
+        self.assertEqual(seen, list(inline.values_list('pk', flat=True)))
+        self.assertEqual(len(counts), 1)
+
+    def test_replies_fragment_shows_the_next_levels(self):
+        collapsed = Comment.objects.filter(post=self.post, depth=2).order_by('path').first()
+        small_root = Comment.objects.filter(post=self.post, depth=3).first()
+        small, _ = self.count_queries(reverse('blog:comment_replies', args=[small_root.pk]))
+        queries, response = self.count_queries(reverse('blog:comment_replies', args=[collapsed.pk]))
+        self.assertEqual(queries, small)
+        data = json.loads(response.content)
+        replies = Comment.objects.filter(parent=collapsed).order_by('path')
+        self.assertEqual(data['html'].count('class="comment"'), len(replies))
+        self.assertIn(f'id="comment-{replies[0].pk}"', data['html'])
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(self.client.get(reverse('blog:comment_replies', args=[999999])).status_code, 404)
@@ -0,0 +1,141 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .comment_queue import CommentQueue
+from .models import Comment, Post
+from .page_views import view_counter
+from .trending import DecayedRanking, log_add, trending
+
+HOUR = 60 * 60
+
+
+class DecayedRankingTests(TestCase):
+    """Tests for the forward-decayed sorted ranking."""
+
+    def test_scores_halve_every_half_life(self):
+        now = time.time()
+        ranking = DecayedRanking(HOUR)
+        ranking.add('fresh', now)
+        ranking.add('older', now - HOUR)
+        ranking.add('older', now - HOUR)
+        ranking.add('stale', now - 3 * HOUR, weight=4)
+        self.assertEqual(len(ranking), 3)
+        scores = dict(ranking.top(10, now))
+        self.assertAlmostEqual(scores['fresh'], 1.0)
+        self.assertAlmostEqual(scores['older'], 1.0)
+        self.assertAlmostEqual(scores['stale'], 0.5)
+        # Later, every score has halved and the order is unchanged
+        self.assertAlmostEqual(dict(ranking.top(10, now + HOUR))['fresh'], 0.5)
+
+    def test_new_activity_reorders(self):
+        now = time.time()
+        ranking = DecayedRanking(HOUR, {'a': now / HOUR + 1, 'b': now / HOUR})
+        self.assertEqual([key for key, _ in ranking.top(10, now)], ['a', 'b'])
+        ranking.add('b', now, weight=1.5)
+        self.assertEqual([key for key, _ in ranking.top(1, now)], ['b'])
+        ranking.remove('b')
+        ranking.remove('missing')
+        self.assertEqual([key for key, _ in ranking.top(10, now)], ['a'])
+
+    def test_log_add_does_not_overflow(self):
+        self.assertAlmostEqual(log_add(1e6, 1e6), 1e6 + 1)
+        self.assertEqual(log_add(None, 5.0), 5.0)
+
+
+class TrendingTests(TestCase):
+    """Tests for the trending ranking and page."""
+
+    def setUp(self):
+        cache.clear()
+        trending.reset()
+        view_counter.flush()
+        self.user = User.objects.create_user(username='writer', password='pass12345')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Body', author=self.user) for i in range(3)]
+
+    def comment(self, post, count=1, age=None):
+        for _ in range(count):
+            comment = Comment.objects.create(post=post, author=self.user, content='Comment')
+            if age is not None:
+                Comment.objects.filter(pk=comment.pk).update(created_at=timezone.now() - age)
+
+    def ranked(self):
+        return [pk for pk, _ in trending.top()]
+
+    def test_built_from_recent_comments(self):
+        self.comment(self.posts[0], 3, age=timedelta(hours=12))
+        self.comment(self.posts[1], 1)
+        self.comment(self.posts[2], 5, age=timedelta(days=30))
+        # Three comments two half-lives ago count as 0.75 of one now; a month ago is outside the window
+        self.assertEqual(self.ranked(), [self.posts[1].pk, self.posts[0].pk])
+
+    def test_updated_incrementally_after_commit(self):
+        self.comment(self.posts[0], 2)
+        self.ranked()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.comment(self.posts[1], 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ranked(), [self.posts[1].pk, self.posts[0].pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            queue = CommentQueue(worker=False)
+            for _ in range(4):
+                queue.submit(self.posts[2].pk, self.user.pk, 'Queued')
+            queue.drain()
+        self.assertEqual(self.ranked()[0], self.posts[2].pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[2].delete()
+        self.assertNotIn(self.posts[2].pk, self.ranked())
+
+    @override_settings(BLOG_TRENDING_VIEW_WEIGHT=0.1)
+    def test_flushed_views_count(self):
+        self.comment(self.posts[0], 2)
+        self.ranked()
+        view_counter.add(self.posts[1].pk, 30)
+        view_counter.flush()
+        self.assertEqual(self.ranked(), [self.posts[1].pk, self.posts[0].pk])
+        self.assertAlmostEqual(trending.top()[0][1], 3.0, places=3)
+        # Kept across rebuilds, which only reload comments
+        trending.build()
+        self.assertEqual(self.ranked(), [self.posts[1].pk, self.posts[0].pk])
+
+    @override_settings(BLOG_TRENDING_REFRESH=60)
+    def test_page_is_rebuilt_once_per_refresh_interval(self):
+        self.comment(self.posts[0])
+        url = reverse('blog:trending')
+        self.assertEqual([post['title'] for post in self.client.get(url).context['posts']], ['Post 0'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.comment(self.posts[1], 2)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual([post['title'] for post in response.context['posts']], ['Post 0'])
+        self.assertContains(response, '1 comment, 0 views')
+
+        with mock.patch('blog.trending.time.time', return_value=time.time() + 60):
+            response = self.client.get(url)
+        self.assertEqual([post['title'] for post in response.context['posts']], ['Post 1', 'Post 0'])
+
+    @override_settings(BLOG_TRENDING_REFRESH=0)
+    def test_zero_refresh_interval_rebuilds_every_request(self):
+        self.comment(self.posts[0])
+        url = reverse('blog:trending')
+        self.assertEqual([post['title'] for post in self.client.get(url).context['posts']], ['Post 0'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.comment(self.posts[1], 2)
+        response = self.client.get(url)
+        self.assertEqual([post['title'] for post in response.context['posts']], ['Post 1', 'Post 0'])
+
+    @override_settings(BLOG_TRENDING_REBUILD=60)
+    def test_stale_ranking_is_rebuilt_in_the_background(self):
+        self.ranked()
+        with mock.patch('blog.trending.time.monotonic', return_value=10 ** 9), \
+                mock.patch('blog.trending.threading.Thread') as thread:
+            self.ranked()
+        thread.return_value.start.assert_called_once()
@@ -0,0 +1,131 @@
+"""
+Threaded comments stored as materialized paths.
+
+Each comment stores its ``path``: its parent's path followed by its own
+primary key as a fixed-width base-36 segment (``Comment.set_thread_path``),
+and its ``depth``. Sorting a post's comments by path lists every thread
+depth-first with replies in the order they were written, and a comment's
+replies, at any depth, are the paths between ``path`` and ``path + '~'``.
+A thread or any part of it is therefore one ordered range scan of the
+``(post, path)`` index rather than a query per level of replies. Each
+comment also counts its direct replies (``reply_count``, kept by the
+Comment signals and the comment queue).
+
+Pages show ``BLOG_COMMENT_INLINE_DEPTH`` levels of a thread at a time,
+``BLOG_COMMENTS_PER_PAGE`` comments per page: comments at the last level
+that have replies get a link to the fragment endpoint for their subtree,
+which shows the next levels the same way. Replies deeper than
+``BLOG_COMMENT_MAX_DEPTH`` are attached to the parent's parent, so paths
+stay within the column.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .models import COMMENT_PATH_WIDTH, Comment, comment_path_segment
+from .pagination import decode_cursor, encode_cursor
+
+# Sorts after every path segment character
+PATH_END = '~'
+
+
+def _per_page():
+    return getattr(settings, 'BLOG_COMMENTS_PER_PAGE', 50)
+
+
+def _inline_depth():
+    return getattr(settings, 'BLOG_COMMENT_INLINE_DEPTH', 3)
+
+
+def _max_depth():
+    # 255 characters hold 31 segments
+    return min(getattr(settings, 'BLOG_COMMENT_MAX_DEPTH', 10), 255 // COMMENT_PATH_WIDTH - 1)
+
+
+def reply_parent(post_id, parent_id):
+    """
+    Return the comment a reply to ``parent_id`` on ``post_id`` is attached
+    to, or None if there is no such comment on that post
+    """
+    parent = (
+        Comment.objects.filter(pk=parent_id, post_id=post_id)
+        .only('pk', 'post_id', 'parent_id', 'path', 'depth').first()
+    )
+    if parent is not None and parent.depth >= _max_depth():
+        # Too deep: reply alongside the parent instead
+        parent = Comment(
+            pk=parent.parent_id, post_id=post_id, path=parent.path[:-COMMENT_PATH_WIDTH], depth=parent.depth - 1,
+        )
+    return parent
+
+
+@dataclass
+class ThreadPage:
+    comments: list
+    next_cursor: str = None
+
+
+def thread_page(post_id, root=None, cursor=None, per_page=None):
+    """
+    One page of a post's comments in thread order, or of the replies under
+    ``root``: ``BLOG_COMMENT_INLINE_DEPTH`` levels, after ``cursor``.
+    Comments whose replies are left for the next level get ``collapsed``.
+    """
+    per_page = per_page or _per_page()
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    if root is None:
+        last_depth = _inline_depth() - 1
+    else:
+        comments = comments.filter(path__gt=root.path, path__lt=root.path + PATH_END)
+        last_depth = root.depth + _inline_depth()
+    values, _ = decode_cursor(cursor)
+    if values and isinstance(values[0], str):
+        comments = comments.filter(path__gt=values[0])
+    comments = list(comments.filter(depth__lte=last_depth).order_by('path')[:per_page + 1])
+    next_cursor = None
+    if len(comments) > per_page:
+        comments = comments[:per_page]
+        next_cursor = encode_cursor([comments[-1].path])
+    for comment in comments:
+        comment.collapsed = comment.depth == last_depth and comment.reply_count > 0
+    return ThreadPage(comments, next_cursor)
+
+
+def assign_paths(comments, using=None):
+    """
+    Set and store ``path`` and ``depth`` for freshly bulk inserted
+    ``comments``, reading their parents' paths with one query
+    """
+    using = using or router.db_for_write(Comment)
+    parent_ids = {comment.parent_id for comment in comments if comment.parent_id}
+    parent_paths = dict(
+        Comment._base_manager.using(using).filter(pk__in=parent_ids).values_list('pk', 'path')
+    ) if parent_ids else {}
+    for comment in comments:
+        comment.set_thread_path(parent_paths.get(comment.parent_id, ''))
+    Comment._base_manager.using(using).bulk_update(comments, ['path', 'depth'])
+
+
+def backfill_paths(model=Comment, batch_size=1000, using=None):
+    """
+    Give every comment without a path a root path, ``batch_size`` rows per
+    UPDATE batch. Yields the running number of rows updated after each batch.
+    """
+    connection = connections[using or router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} = %s, {} = 0 WHERE {} = %s'.format(
+        quote(model._meta.db_table), quote('path'), quote('depth'), quote(model._meta.pk.column),
+    )
+    rows = model._base_manager.using(connection.alias).filter(path='').order_by('pk').values_list('pk', flat=True)
+    last = None
+    updated = 0
+    while True:
+        batch = list((rows if last is None else rows.filter(pk__gt=last))[:batch_size])
+        if not batch:
+            return
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.executemany(sql, [(comment_path_segment(pk), pk) for pk in batch])
+        last = batch[-1]
+        updated += len(batch)
+        yield updated
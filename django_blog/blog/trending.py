@@ -0,0 +1,249 @@
+"""
+Trending posts: comment and view activity with exponential time decay.
+
+Each comment adds 1 to its post's score and each view
+``BLOG_TRENDING_VIEW_WEIGHT``, and every contribution halves every
+``BLOG_TRENDING_HALF_LIFE`` seconds. Decaying all scores as time passes
+would reorder nothing but rewrite everything, so ``DecayedRanking`` uses
+forward decay instead: an event at time ``t`` is stored as
+``w * 2 ** (t / half_life)``, which keeps growing with ``t``, and the
+current score is that sum times ``2 ** (-now / half_life)``, the same
+factor for every post. The order of posts therefore only changes when a
+post gets new activity, so the ranking is one sorted list updated in
+O(log n) per event. Sums are kept as base-2 logarithms so they never
+overflow.
+
+The ranking is loaded once per process (``warm()`` or the first read)
+from the comments of the last ``WINDOW_HALF_LIVES`` half-lives, streamed
+from ``Comment.created_at`` and sorted once, and then updated in place:
+by the Comment signals and the comment queue after each commit, and by
+``blog.page_views`` after each view count flush. Every
+``BLOG_TRENDING_REBUILD`` seconds it is reloaded in the background to pick
+up comments made by other processes; views are not stored per event, so
+each process keeps the view activity it has seen.
+
+The trending page reads the top ``BLOG_TRENDING_SIZE`` posts through the
+fragment cache, rebuilt at most once per ``BLOG_TRENDING_REFRESH`` seconds
+(0 builds it on every request).
+"""
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .caching import fragment_cache
+from .models import Comment, Post
+from .routing import primary_reads
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'blog-trending'
+# Activity older than this many half-lives counts less than 0.1%
+WINDOW_HALF_LIVES = 10
+
+
+def _half_life():
+    return getattr(settings, 'BLOG_TRENDING_HALF_LIFE', 6 * 60 * 60)
+
+
+def _view_weight():
+    return getattr(settings, 'BLOG_TRENDING_VIEW_WEIGHT', 0.05)
+
+
+def _size():
+    return getattr(settings, 'BLOG_TRENDING_SIZE', 20)
+
+
+def _refresh_interval():
+    return getattr(settings, 'BLOG_TRENDING_REFRESH', 60)
+
+
+def _rebuild_interval():
+    return getattr(settings, 'BLOG_TRENDING_REBUILD', 15 * 60)
+
+
+def log_add(a, b):
+    """``log2(2 ** a + 2 ** b)`` without overflowing; ``a`` may be None for an empty sum"""
+    if a is None:
+        return b
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(2.0 ** (b - a)) / math.log(2)
+
+
+class DecayedRanking:
+    """Keys ordered by forward-decayed score, highest first"""
+
+    def __init__(self, half_life, scores=None):
+        self.half_life = half_life
+        self._scores = dict(scores or {})
+        self._order = sorted((-score, key) for key, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._order)
+
+    def event_score(self, when, weight=1.0):
+        """The log2 score of an event of ``weight`` at unix time ``when``"""
+        return when / self.half_life + math.log2(weight)
+
+    def add(self, key, when, weight=1.0):
+        self.merge(key, self.event_score(when, weight))
+
+    def merge(self, key, score):
+        """Add the activity with log2 score ``score`` to ``key``"""
+        old = self._scores.get(key)
+        if old is not None:
+            self._discard(old, key)
+        new = self._scores[key] = log_add(old, score)
+        insort(self._order, (-new, key))
+
+    def remove(self, key):
+        score = self._scores.pop(key, None)
+        if score is not None:
+            self._discard(score, key)
+
+    def _discard(self, score, key):
+        i = bisect_left(self._order, (-score, key))
+        if i < len(self._order) and self._order[i] == (-score, key):
+            del self._order[i]
+
+    def top(self, limit, now):
+        """Return up to ``limit`` (key, score at ``now``) pairs, highest first"""
+        offset = now / self.half_life
+        return [(key, 2.0 ** (-neg - offset)) for neg, key in self._order[:limit]]
+
+
+class Trending:
+    """The process-wide ranking of posts by decayed activity"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._ranking = None
+        self._views = {}
+        self._built_at = 0.0
+        self._refreshing = False
+
+    @staticmethod
+    def _load(half_life):
+        """Return {post id: log2 score} for the comments inside the window"""
+        now = time.time()
+        since = now - WINDOW_HALF_LIVES * half_life
+        # Plain sums relative to now stay between 2 ** -WINDOW_HALF_LIVES and
+        # the comment count, and cost less per row than log_add()
+        sums = defaultdict(float)
+        # Kept for the life of the process, so read the primary
+        with primary_reads():
+            rows = Comment.objects.filter(
+                created_at__gte=datetime.fromtimestamp(since, timezone.utc),
+            ).order_by().values_list('post_id', 'created_at').iterator(chunk_size=10000)
+            for post_id, created_at in rows:
+                sums[post_id] += 2.0 ** ((created_at.timestamp() - now) / half_life)
+        return {post_id: now / half_life + math.log2(total) for post_id, total in sums.items()}
+
+    def build(self):
+        half_life = _half_life()
+        scores = self._load(half_life)
+        with self._lock:
+            # Views seen by this process, minus those that have decayed away
+            floor = time.time() / half_life - WINDOW_HALF_LIVES
+            self._views = {pk: score for pk, score in self._views.items() if score >= floor}
+            for post_id, score in self._views.items():
+                scores[post_id] = log_add(scores.get(post_id), score)
+            self._ranking = DecayedRanking(half_life, scores)
+            self._built_at = time.monotonic()
+            self._refreshing = False
+
+    def _refresh(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Rebuilding the trending ranking failed')
+            with self._lock:
+                self._refreshing = False
+        finally:
+            close_old_connections()
+
+    def _ensure_built(self):
+        if self._ranking is None:
+            with self._build_lock:
+                if self._ranking is None:
+                    self.build()
+            return
+        interval = _rebuild_interval()
+        with self._lock:
+            if not interval or self._refreshing or time.monotonic() - self._built_at < interval:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name='blog-trending-refresh', daemon=True).start()
+
+    def top(self, limit=None):
+        """Return up to ``limit`` (post id, current score) pairs, highest first"""
+        self._ensure_built()
+        with self._lock:
+            return self._ranking.top(limit or _size(), time.time())
+
+    def add_comments(self, events):
+        """Count (post id, created_at) pairs of newly committed comments"""
+        with self._lock:
+            # Not loaded yet: the first build reads the comments from the database
+            if self._ranking is not None:
+                for post_id, created_at in events:
+                    self._ranking.add(post_id, created_at.timestamp())
+
+    def add_views(self, counts, when=None):
+        """Count ``{post id: views}`` flushed at unix time ``when``"""
+        weight = _view_weight()
+        if not weight:
+            return
+        when = time.time() if when is None else when
+        with self._lock:
+            for post_id, count in counts.items():
+                score = when / _half_life() + math.log2(count * weight)
+                self._views[post_id] = log_add(self._views.get(post_id), score)
+                if self._ranking is not None:
+                    self._ranking.merge(post_id, score)
+
+    def remove_post(self, pk):
+        with self._lock:
+            self._views.pop(pk, None)
+            if self._ranking is not None:
+                self._ranking.remove(pk)
+
+    def reset(self):
+        with self._lock:
+            self._ranking = None
+            self._views = {}
+
+
+trending = Trending()
+
+
+def _build_listing():
+    top = trending.top()
+    with primary_reads():
+        posts = Post.objects.filter(pk__in=[pk for pk, _ in top]).values('pk', 'title', 'comment_count', 'view_count')
+        by_pk = {post['pk']: post for post in posts}
+    return [{**by_pk[pk], 'score': score} for pk, score in top if pk in by_pk]
+
+
+def trending_posts():
+    """The trending posts as dicts with a ``score``, rebuilt at most once per refresh interval"""
+    interval = _refresh_interval()
+    if interval <= 0:
+        return _build_listing()
+    # The stamp changes once per interval, so every process shares one copy per interval
+    stamp = int(time.time() // interval)
+    return fragment_cache.get_or_build('trending', CACHE_KEY, stamp, _build_listing, timeout=2 * interval)
+
+
+def warm():
+    """Load the ranking in a background thread so the first trending page is fast"""
+    if getattr(settings, 'BLOG_TRENDING_WARM', True):
+        threading.Thread(target=trending._refresh, name='blog-trending-warm', daemon=True).start()
@@ -7,6 +7,8 @@ app_name = 'blog'
 urlpatterns = [
     path('', views.home, name='home'),
     path('posts/', views.PostListView.as_view(), name='post_list'),
+    path('posts/popular/', views.most_viewed, name='most_viewed'),
+    path('posts/trending/', views.trending_posts, name='trending'),
     path('post/<int:pk>/', views.PostDetailView.as_view(), name='post_detail'),
     path('post/new/', views.PostCreateView.as_view(), name='post_create'),
     path('post/<int:pk>/update/', views.PostUpdateView.as_view(), name='post_update'),
@@ -14,13 +16,27 @@ urlpatterns = [
     
     # Search and Tag URLs
     path('search/', views.search_posts, name='search'),
+    path('search/suggest/', views.search_suggestions, name='search_suggest'),
+    path('tags/', views.tag_cloud, name='tag_cloud'),
     path('tags/<str:tag_name>/', views.posts_by_tag, name='posts_by_tag'),
     
+    # Feeds (fmt is rss, atom or json)
+    path('feeds/<str:fmt>/', views.post_feed, name='feed'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap'),
+    path('sitemap-<int:shard>.xml', views.sitemap_shard, name='sitemap_shard'),
+    path('tags/<str:tag_name>/feeds/<str:fmt>/', views.post_feed, name='tag_feed'),
+    path('authors/<str:username>/feeds/<str:fmt>/', views.post_feed, name='author_feed'),
+    
     # Comment URLs - Class-based views
     path('post/<int:post_id>/comments/new/', views.CommentCreateView.as_view(), name='comment_create'),
+    path('post/<int:post_id>/comments/', views.comment_thread, name='comment_thread'),
+    path('comments/<int:pk>/replies/', views.comment_replies, name='comment_replies'),
     path('comments/<int:pk>/edit/', views.CommentUpdateView.as_view(), name='comment_update'),
     path('comments/<int:pk>/delete/', views.CommentDeleteView.as_view(), name='comment_delete'),
     
+    # Queued comment submission (BLOG_COMMENT_INGEST = 'async')
+    path('post/<int:post_id>/comments/queue/', views.enqueue_comment, name='enqueue_comment'),
+    
     # Legacy function-based comment URLs (keeping for backward compatibility)
     path('post/<int:post_id>/comments/add/', views.add_comment, name='add_comment'),
     path('comments/<int:comment_id>/edit_old/', views.edit_comment, name='edit_comment'),
@@ -31,4 +47,8 @@ urlpatterns = [
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='blog:home'), name='logout'),
     path('profile/', views.profile, name='profile'),
+    path('profile/posts/', views.profile_posts, name='profile_posts'),
+    
+    # Monitoring
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
 ]
@@ -1,75 +1,206 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import login, logout
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
 from django.contrib.auth.models import User
-from django.db.models import Q
-from taggit.models import Tag
 from .models import Post, Comment
 from .forms import CustomUserCreationForm, UserProfileForm, PostForm, CommentForm
+from . import author_stats, feeds, page_views, related, sitemaps, tag_stats, threads, trending
+from .autocomplete import autocomplete
+from .caching import fragment_cache
+from .comment_queue import comment_queue
+from .conditional import conditional_listing, conditional_post
+from .page_cache import cache_anonymous_page
+from .pagination import CursorPaginator
+from .ratelimit import rate_limit
+from .routing import replica_reads
+from .search import SearchPaginator
 
 # Create your views here.
 
+PROFILE_POSTS_PER_PAGE = 20
+
+class SingleObjectCacheMixin:
+    """Load the view's object once per request, even though test_func needs it before the handler"""
+    
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_cached_object'):
+            self._cached_object = super().get_object()
+        return self._cached_object
+
+@replica_reads
+@conditional_listing
+@cache_anonymous_page
 def home(request):
     """Home view that displays the latest posts"""
-    posts = Post.objects.all()[:6]  # Get latest 6 posts
+    # Lazy: only evaluated when the cached posts fragment is rebuilt
+    posts = Post.objects.for_listing()[:6]  # Get latest 6 posts
     context = {
         'posts': posts,
     }
     return render(request, 'home.html', context)
 
+@method_decorator(replica_reads, name='dispatch')
+@method_decorator(conditional_listing, name='dispatch')
 class PostListView(ListView):
     """View for listing all blog posts"""
     model = Post
     template_name = 'post_list.html'
     context_object_name = 'posts'
-    paginate_by = 10
+    page_size = 10
+    
+    def get_queryset(self):
+        return Post.objects.for_listing()
+    
+    def get_context_data(self, **kwargs):
+        # Keyset pagination: every page costs the same and no COUNT(*) runs
+        page_obj = CursorPaginator(self.object_list, self.page_size).page(self.request.GET.get('cursor'))
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'posts': page_obj.object_list,
+            'object_list': page_obj.object_list,
+            'page_obj': page_obj,
+            'is_paginated': page_obj.has_other_pages(),
+        })
+        return context
 
+@replica_reads
 def search_posts(request):
-    """View for searching blog posts"""
-    query = request.GET.get('q', '')
-    posts = []
-    
-    if query:
-        posts = Post.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct().order_by('-published_date')
+    """View for searching blog posts through the full-text search index"""
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, 10, queryset=Post.objects.for_listing())
+    page_obj = paginator.page(request.GET.get('cursor'))
     
     context = {
-        'posts': posts,
+        'posts': page_obj.object_list,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
         'query': query,
-        'results_count': posts.count()
+        'results_count': page_obj.approximate_count
     }
     return render(request, 'search_results.html', context)
 
+def search_suggestions(request):
+    """Autocomplete JSON for the search box, served from the in-memory prefix index"""
+    query = request.GET.get('q', '').strip()[:100]
+    found = autocomplete.suggest(query) if query else {'tags': [], 'posts': []}
+    response = JsonResponse({
+        'query': query,
+        'tags': [
+            {'name': name, 'url': reverse('blog:posts_by_tag', args=[name])}
+            for _, name in found['tags']
+        ],
+        'posts': [
+            {'title': title, 'url': reverse('blog:post_detail', args=[pk])}
+            for pk, title in found['posts']
+        ],
+    })
+    # Backspacing repeats earlier prefixes
+    patch_cache_control(response, private=True, max_age=60)
+    return response
+
+@replica_reads
+@conditional_listing
 def posts_by_tag(request, tag_name):
     """View for displaying posts by tag"""
-    tag = get_object_or_404(Tag, name=tag_name)
-    posts = Post.objects.filter(tags=tag).order_by('-published_date')
+    found = tag_stats.lookup(tag_name)
+    if found is None:
+        raise Http404('No tag matches the given query.')
+    tag, results_count = found
+    paginator = CursorPaginator(Post.objects.for_listing().filter(tags=tag), 10)
+    page_obj = paginator.page(request.GET.get('cursor'))
     
     context = {
         'tag': tag,
-        'posts': posts,
-        'results_count': posts.count()
+        'posts': page_obj.object_list,
+        'page_obj': page_obj,
+        'results_count': results_count
     }
     return render(request, 'posts_by_tag.html', context)
 
+@conditional_listing
+def post_feed(request, fmt, tag_name=None, username=None):
+    """Streaming RSS/Atom/JSON feed of all posts, one tag's or one author's"""
+    return feeds.feed_response(request, fmt, tag_name=tag_name, username=username)
+
+@sitemaps.conditional_sitemap
+def sitemap_index(request):
+    """Sitemap index listing one sitemap per shard of posts"""
+    manifest = sitemaps.manifest_for(request)
+    return HttpResponse(sitemaps.render_index(manifest), content_type='application/xml')
+
+@sitemaps.conditional_sitemap
+def sitemap_shard(request, shard):
+    """One shard of the post sitemap, served from its file"""
+    manifest = sitemaps.manifest_for(request)
+    if str(shard) not in manifest['shards']:
+        raise Http404('No sitemap matches the given query.')
+    try:
+        stream = open(sitemaps.shard_path(shard, manifest['base_url']), 'rb')
+    except FileNotFoundError:
+        # Removed by a concurrent sync after the post it listed was deleted
+        raise Http404('No sitemap matches the given query.')
+    return FileResponse(stream, content_type='application/xml')
+
+def tag_cloud(request):
+    """View for displaying every tag sized by how many posts use it"""
+    context = {
+        'tags': tag_stats.cloud(),
+    }
+    return render(request, 'tag_cloud.html', context)
+
+def most_viewed(request):
+    """View for listing the most viewed posts, as of the last view count flush"""
+    context = {
+        'posts': page_views.most_viewed(),
+    }
+    return render(request, 'most_viewed.html', context)
+
+def trending_posts(request):
+    """View for listing posts by recent comment and view activity"""
+    context = {
+        'posts': trending.trending_posts(),
+    }
+    return render(request, 'trending.html', context)
+
+@method_decorator(page_views.count_view, name='dispatch')
+@method_decorator(replica_reads, name='dispatch')
+@method_decorator(conditional_post, name='dispatch')
 class PostDetailView(DetailView):
     """View for displaying individual blog posts"""
     model = Post
     template_name = 'post_detail.html'
     context_object_name = 'post'
+    related_count = 5
+    
+    def get_queryset(self):
+        return Post.objects.for_listing()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['comment_form'] = CommentForm()
+        context['related_posts'] = related.related_posts(self.object, self.related_count)
+        context['comment_url'] = _comment_url(self.object.pk)
+        # One range query for the first page of the threads, authors joined in
+        context['comments_page'] = threads.thread_page(self.object.pk, cursor=self.request.GET.get('comments'))
+        context['comments'] = context['comments_page'].comments
         return context
 
+@method_decorator(rate_limit('post'), name='dispatch')
 class PostCreateView(LoginRequiredMixin, CreateView):
     """View for creating new blog posts"""
     model = Post
@@ -82,7 +213,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         messages.success(self.request, 'Post created successfully!')
         return super().form_valid(form)
 
-class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class PostUpdateView(SingleObjectCacheMixin, LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     """View for updating blog posts"""
     model = Post
     form_class = PostForm
@@ -90,13 +221,13 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     
     def test_func(self):
         post = self.get_object()
-        return self.request.user == post.author
+        return post.author_id == self.request.user.pk
     
     def form_valid(self, form):
         messages.success(self.request, 'Post updated successfully!')
         return super().form_valid(form)
 
-class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class PostDeleteView(SingleObjectCacheMixin, LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     """View for deleting blog posts"""
     model = Post
     template_name = 'post_confirm_delete.html'
@@ -104,12 +235,13 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     
     def test_func(self):
         post = self.get_object()
-        return self.request.user == post.author
+        return post.author_id == self.request.user.pk
     
     def delete(self, request, *args, **kwargs):
         messages.success(request, 'Post deleted successfully!')
         return super().delete(request, *args, **kwargs)
 
+@method_decorator(rate_limit('comment'), name='dispatch')
 class CommentCreateView(LoginRequiredMixin, CreateView):
     """View for creating new comments"""
     model = Comment
@@ -119,6 +251,7 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.author = self.request.user
         form.instance.post_id = self.kwargs['post_id']
+        form.instance.parent = _reply_parent(self.request, self.kwargs['post_id'])
         messages.success(self.request, 'Comment added successfully!')
         return super().form_valid(form)
     
@@ -130,7 +263,7 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
         context['post'] = get_object_or_404(Post, pk=self.kwargs['post_id'])
         return context
 
-class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class CommentUpdateView(SingleObjectCacheMixin, LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     """View for updating comments"""
     model = Comment
     form_class = CommentForm
@@ -138,14 +271,14 @@ class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     
     def test_func(self):
         comment = self.get_object()
-        return self.request.user == comment.author
+        return comment.author_id == self.request.user.pk
     
     def form_valid(self, form):
         messages.success(self.request, 'Comment updated successfully!')
         return super().form_valid(form)
     
     def get_success_url(self):
-        return reverse_lazy('blog:post_detail', kwargs={'pk': self.object.post.pk})
+        return reverse_lazy('blog:post_detail', kwargs={'pk': self.object.post_id})
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -153,22 +286,23 @@ class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         context['post'] = self.object.post
         return context
 
-class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class CommentDeleteView(SingleObjectCacheMixin, LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     """View for deleting comments"""
     model = Comment
     template_name = 'comment_confirm_delete.html'
     
     def test_func(self):
         comment = self.get_object()
-        return self.request.user == comment.author
+        return comment.author_id == self.request.user.pk
     
     def get_success_url(self):
-        return reverse_lazy('blog:post_detail', kwargs={'pk': self.object.post.pk})
+        return reverse_lazy('blog:post_detail', kwargs={'pk': self.object.post_id})
     
     def delete(self, request, *args, **kwargs):
         messages.success(request, 'Comment deleted successfully!')
         return super().delete(request, *args, **kwargs)
 
+@rate_limit('comment')
 @login_required
 def add_comment(request, post_id):
     """View for adding comments to blog posts"""
@@ -180,6 +314,7 @@ def add_comment(request, post_id):
             comment = form.save(commit=False)
             comment.post = post
             comment.author = request.user
+            comment.parent = _reply_parent(request, post_id)
             comment.save()
             messages.success(request, 'Comment added successfully!')
             return redirect('blog:post_detail', pk=post_id)
@@ -188,22 +323,46 @@ def add_comment(request, post_id):
     
     return redirect('blog:post_detail', pk=post_id)
 
+@rate_limit('comment')
+async def enqueue_comment(request, post_id):
+    """Async view that hands a comment to the background comment writer"""
+    if request.method != 'POST':
+        return redirect('blog:post_detail', pk=post_id)
+    # Session and user loading are synchronous database work
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    if not await Post.objects.filter(pk=post_id).aexists():
+        raise Http404('No Post matches the given query.')
+    
+    form = CommentForm(request.POST)
+    if not form.is_valid():
+        await sync_to_async(messages.error)(request, form.errors['content'][0])
+        return redirect('blog:post_detail', pk=post_id)
+    parent = await sync_to_async(_reply_parent)(request, post_id)
+    if not comment_queue.submit(post_id, user.pk, form.cleaned_data['content'], parent and parent.pk):
+        response = HttpResponse('Too many comments right now, please try again shortly.', status=503)
+        response['Retry-After'] = '5'
+        return response
+    await sync_to_async(messages.success)(request, 'Comment received! It will appear shortly.')
+    return redirect('blog:post_detail', pk=post_id)
+
 @login_required
 def edit_comment(request, comment_id):
     """View for editing comments"""
     comment = get_object_or_404(Comment, pk=comment_id)
     
     # Check if user is the author of the comment
-    if comment.author != request.user:
+    if comment.author_id != request.user.pk:
         messages.error(request, 'You can only edit your own comments.')
-        return redirect('blog:post_detail', pk=comment.post.pk)
+        return redirect('blog:post_detail', pk=comment.post_id)
     
     if request.method == 'POST':
         form = CommentForm(request.POST, instance=comment)
         if form.is_valid():
             form.save()
             messages.success(request, 'Comment updated successfully!')
-            return redirect('blog:post_detail', pk=comment.post.pk)
+            return redirect('blog:post_detail', pk=comment.post_id)
     else:
         form = CommentForm(instance=comment)
     
@@ -219,15 +378,21 @@ def delete_comment(request, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id)
     
     # Check if user is the author of the comment
-    if comment.author != request.user:
+    if comment.author_id != request.user.pk:
         messages.error(request, 'You can only delete your own comments.')
-        return redirect('blog:post_detail', pk=comment.post.pk)
+        return redirect('blog:post_detail', pk=comment.post_id)
     
-    post_pk = comment.post.pk
+    post_pk = comment.post_id
     comment.delete()
     messages.success(request, 'Comment deleted successfully!')
     return redirect('blog:post_detail', pk=post_pk)
 
+@staff_member_required
+def cache_stats(request):
+    """Fragment cache hit/miss counters for this process (staff only)"""
+    return JsonResponse(fragment_cache.stats())
+
+@rate_limit('register')
 def register(request):
     """User registration view"""
     if request.method == 'POST':
@@ -254,10 +419,54 @@ def profile(request):
     else:
         form = UserProfileForm(instance=request.user)
     
-    user_posts = Post.objects.filter(author=request.user).order_by('-published_date')
-    
+    page_obj = _profile_posts_page(request)
     context = {
         'form': form,
-        'user_posts': user_posts,
+        'stats': author_stats.for_user(request.user),
+        'user_posts': page_obj.object_list,
+        'page_obj': page_obj,
     }
     return render(request, 'registration/profile.html', context)
+
+def _profile_posts_page(request):
+    # Only what a history row shows; the author index serves the ordering
+    posts = Post.objects.filter(author=request.user).only('pk', 'title', 'published_date')
+    return CursorPaginator(posts, PROFILE_POSTS_PER_PAGE).page(request.GET.get('cursor'))
+
+def _comment_url(post_id):
+    if getattr(settings, 'BLOG_COMMENT_INGEST', 'sync') == 'async':
+        return reverse('blog:enqueue_comment', args=[post_id])
+    return reverse('blog:comment_create', args=[post_id])
+
+def _reply_parent(request, post_id):
+    """The comment a submitted reply is attached to, None for a new thread"""
+    parent_id = request.POST.get('parent')
+    if not parent_id:
+        return None
+    parent = threads.reply_parent(post_id, parent_id) if parent_id.isdigit() else None
+    if parent is None:
+        raise Http404('No Comment matches the given query.')
+    return parent
+
+def _thread_fragment(request, post_id, page):
+    context = {'comments': page.comments, 'comment_url': _comment_url(post_id)}
+    html = render_to_string('comment_thread.html', context, request=request)
+    return JsonResponse({'html': html, 'next_cursor': page.next_cursor})
+
+def comment_thread(request, post_id):
+    """Next page of a post's comment threads as an HTML fragment in JSON"""
+    page = threads.thread_page(post_id, cursor=request.GET.get('cursor'))
+    return _thread_fragment(request, post_id, page)
+
+def comment_replies(request, pk):
+    """A page of the replies under one comment, the next levels down, as an HTML fragment in JSON"""
+    root = get_object_or_404(Comment.objects.only('pk', 'post_id', 'path', 'depth'), pk=pk)
+    page = threads.thread_page(root.post_id, root=root, cursor=request.GET.get('cursor'))
+    return _thread_fragment(request, root.post_id, page)
+
+@login_required
+def profile_posts(request):
+    """Next page of the profile post history as an HTML fragment in JSON, for infinite scroll"""
+    page_obj = _profile_posts_page(request)
+    html = render_to_string('profile_posts.html', {'user_posts': page_obj.object_list}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': page_obj.next_cursor})
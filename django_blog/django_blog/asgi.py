@@ -14,3 +14,15 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_blog.settings')
 
 application = get_asgi_application()
+
+# Load the search suggestion index and the trending ranking in the
+# background while the first requests are served
+from blog import autocomplete, trending  # noqa: E402
+
+autocomplete.warm()
+trending.warm()
+
+# Write post view counts in batches from a background thread
+from blog.page_views import view_counter  # noqa: E402
+
+view_counter.start()
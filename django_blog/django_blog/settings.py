@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Packages shared by the projects in this repository (request_instrumentation)
+REPO_DIR = BASE_DIR.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -42,12 +48,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'request_instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'blog.routing.ReplicaPinMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -79,9 +87,132 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    # Read replica of 'default', used only when listed in BLOG_READ_REPLICAS
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+    },
+}
+
+# Read-only views decorated with blog.routing.replica_reads read from one of
+# these aliases; clients that just wrote stay on 'default' for a few seconds
+DATABASE_ROUTERS = ['blog.routing.ReplicaRouter']
+BLOG_READ_REPLICAS = []
+BLOG_REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django-blog',
     }
 }
 
+# Rendered post fragments (blog/caching.py). Point this at a shared cache
+# alias (Redis/Memcached) when running several processes.
+BLOG_FRAGMENT_CACHE = 'default'
+BLOG_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Anonymous full-page cache (blog/page_cache.py); pages are also replaced
+# whenever a post, its tags or an author name changes
+BLOG_PAGE_CACHE_TIMEOUT = 10 * 60
+
+# Author display fields used by templates (blog/authors.py)
+BLOG_AUTHOR_CACHE_TIMEOUT = 5 * 60
+
+# Comment ingestion (blog/comment_queue.py). 'async' posts comment forms to a
+# bounded queue drained in batches by a background writer thread.
+BLOG_COMMENT_INGEST = 'sync'
+BLOG_COMMENT_QUEUE_SIZE = 1000
+BLOG_COMMENT_BATCH_SIZE = 100
+BLOG_COMMENT_FLUSH_INTERVAL = 0.05
+
+# Related posts (blog/related.py): matches stored per post, and tags used by
+# more posts than this are ignored when looking for candidates
+BLOG_RELATED_POSTS = 10
+BLOG_RELATED_MAX_TAG_POSTS = 1000
+
+# Feeds (blog/feeds.py): posts fetched and rendered per chunk, and how long
+# rendered chunks stay cached (they are replaced on the next post change)
+BLOG_FEED_CHUNK_SIZE = 200
+BLOG_FEED_CACHE_TIMEOUT = 60 * 60
+
+# Rendered post and comment bodies (blog/rendering.py). Markdown needs the
+# `markdown` package; its output is sanitized. Run rebuild_rendered_content
+# after changing either setting.
+BLOG_MARKDOWN = False
+BLOG_EXCERPT_WORDS = 30
+
+# Write rate limits (blog/ratelimit.py): token buckets per session ('user')
+# and per client address ('ip'), as 'N/s', 'N/m', 'N/h' or 'N/d'. Use
+# blog.ratelimit.CacheBackend with a shared cache alias to limit across
+# processes; behind proxies, read the client address from their header,
+# taking the entry added by the outermost of TRUSTED_PROXIES proxies.
+BLOG_RATE_LIMITS = {
+    'comment': {'user': '10/m', 'ip': '30/m'},
+    'post': {'user': '5/m', 'ip': '10/m'},
+    'register': {'ip': '5/h'},
+}
+BLOG_RATE_LIMIT_BACKEND = 'blog.ratelimit.MemoryBackend'
+BLOG_RATE_LIMIT_CACHE = 'default'
+BLOG_RATE_LIMIT_IP_HEADER = 'REMOTE_ADDR'
+BLOG_RATE_LIMIT_TRUSTED_PROXIES = 1
+
+# Search suggestions (blog/autocomplete.py): matches returned per kind, and
+# how often each process reloads the in-memory index to pick up changes
+# made by other processes (it is updated in place for its own changes).
+BLOG_AUTOCOMPLETE_LIMIT = 8
+BLOG_AUTOCOMPLETE_REFRESH = 5 * 60
+BLOG_AUTOCOMPLETE_WARM = True
+
+# Post view counts (blog/page_views.py): views are counted in memory and
+# written every flush interval (seconds), this many posts per UPDATE; the
+# most viewed ranking keeps this many posts and is refreshed on each flush.
+BLOG_PAGE_VIEW_FLUSH_INTERVAL = 10
+BLOG_PAGE_VIEW_BATCH_SIZE = 100
+BLOG_MOST_VIEWED = 10
+BLOG_MOST_VIEWED_TIMEOUT = 60 * 60
+
+# Trending posts (blog/trending.py): a comment scores 1 and a view this much,
+# halving every half-life (seconds). The page is rebuilt at most once per
+# refresh interval (0: on every request); each process reloads recent comments every rebuild
+# interval to see those made by other processes.
+BLOG_TRENDING_HALF_LIFE = 6 * 60 * 60
+BLOG_TRENDING_VIEW_WEIGHT = 0.05
+BLOG_TRENDING_SIZE = 20
+BLOG_TRENDING_REFRESH = 60
+BLOG_TRENDING_REBUILD = 15 * 60
+BLOG_TRENDING_WARM = True
+
+# Threaded comments (blog/threads.py). Pages show this many comments and
+# levels of replies; deeper levels load from a fragment endpoint, and replies
+# nested deeper than the maximum are attached to the parent's parent.
+BLOG_COMMENTS_PER_PAGE = 50
+BLOG_COMMENT_INLINE_DEPTH = 3
+BLOG_COMMENT_MAX_DEPTH = 10
+
+# Sitemaps (blog/sitemaps.py): posts per sitemap file (the protocol allows
+# at most 50,000) and where the files are cached. Only shards whose posts
+# changed are written again. Set the canonical scheme and host, e.g.
+# 'https://blog.example.com', so every request shares one set of files;
+# left empty, each requested scheme and host gets its own.
+BLOG_SITEMAP_SHARD_SIZE = 50000
+BLOG_SITEMAP_DIR = BASE_DIR / 'sitemaps'
+BLOG_SITEMAP_BASE_URL = ''
+
+# Per-request query/template/latency instrumentation (the shared
+# request_instrumentation package). Queries repeated this many times in one
+# request are reported as duplicates; set the token to let a Prometheus
+# scraper read /metrics without a staff login.
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_BUFFER_SIZE = 1000
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 3
+INSTRUMENTATION_METRICS_TOKEN = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
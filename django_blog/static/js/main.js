@@ -50,6 +50,210 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Search suggestions
+    const searchInput = document.querySelector('.search-input[data-suggest-url]');
+    if (searchInput) {
+        const list = searchInput.form.querySelector('.search-suggestions');
+        let timer = null;
+        let latest = '';
+
+        function showSuggestions(data) {
+            list.innerHTML = '';
+            const entries = data.tags.map(function(tag) {
+                return {label: tag.name, url: tag.url, className: 'suggestion-tag'};
+            }).concat(data.posts.map(function(post) {
+                return {label: post.title, url: post.url, className: 'suggestion-post'};
+            }));
+            entries.forEach(function(entry) {
+                const item = document.createElement('li');
+                const link = document.createElement('a');
+                link.href = entry.url;
+                link.className = entry.className;
+                link.textContent = entry.label;
+                item.appendChild(link);
+                list.appendChild(item);
+            });
+            list.hidden = entries.length === 0;
+        }
+
+        searchInput.addEventListener('input', function() {
+            const query = searchInput.value.trim();
+            clearTimeout(timer);
+            if (!query) {
+                list.hidden = true;
+                return;
+            }
+            timer = setTimeout(function() {
+                latest = query;
+                fetch(searchInput.dataset.suggestUrl + '?q=' + encodeURIComponent(query))
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) {
+                        // Ignore answers to prefixes the user has typed past
+                        if (data.query === latest) {
+                            showSuggestions(data);
+                        }
+                    })
+                    .catch(function() { list.hidden = true; });
+            }, 120);
+        });
+
+        searchInput.addEventListener('keydown', function(e) {
+            if (e.key === 'Escape') {
+                list.hidden = true;
+            }
+        });
+
+        document.addEventListener('click', function(e) {
+            if (!searchInput.form.contains(e.target)) {
+                list.hidden = true;
+            }
+        });
+    }
+
+    // Infinite scroll for the profile post history
+    const postHistory = document.getElementById('profile-posts');
+    const loadMore = document.querySelector('.load-more[data-cursor]');
+    if (postHistory && loadMore && 'IntersectionObserver' in window) {
+        let loading = false;
+
+        function loadNextPage() {
+            if (loading || !loadMore.dataset.cursor) {
+                return;
+            }
+            loading = true;
+            fetch(postHistory.dataset.moreUrl + '?cursor=' + encodeURIComponent(loadMore.dataset.cursor))
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    postHistory.insertAdjacentHTML('beforeend', data.html);
+                    if (data.next_cursor) {
+                        loadMore.dataset.cursor = data.next_cursor;
+                        loadMore.href = '?cursor=' + encodeURIComponent(data.next_cursor);
+                    } else {
+                        observer.disconnect();
+                        loadMore.remove();
+                    }
+                })
+                .finally(function() {
+                    loading = false;
+                    // Short pages can leave the link in view, which fires no new intersection
+                    if (loadMore.isConnected && loadMore.getBoundingClientRect().top < window.innerHeight + 400) {
+                        loadNextPage();
+                    }
+                });
+        }
+
+        const observer = new IntersectionObserver(function(entries) {
+            if (entries.some(function(entry) { return entry.isIntersecting; })) {
+                loadNextPage();
+            }
+        }, {rootMargin: '400px'});
+        observer.observe(loadMore);
+        loadMore.addEventListener('click', function(e) {
+            e.preventDefault();
+            loadNextPage();
+        });
+    }
+
+    // Comment threads: load replies and further pages, collapse loaded replies
+    const commentThreads = document.querySelector('.comment-threads');
+    if (commentThreads) {
+        // A comment's loaded replies are the following comments whose path extends its path
+        function replies(comment) {
+            const found = [];
+            let next = comment.nextElementSibling;
+            while (next && next.dataset.path.startsWith(comment.dataset.path)) {
+                found.push(next);
+                next = next.nextElementSibling;
+            }
+            return found;
+        }
+
+        function showToggle(comment) {
+            const toggle = comment.querySelector('.toggle-replies');
+            if (toggle) {
+                toggle.hidden = false;
+            }
+        }
+
+        commentThreads.querySelectorAll('.comment').forEach(function(comment) {
+            showToggle(comment);
+        });
+
+        commentThreads.addEventListener('click', function(e) {
+            const showReplies = e.target.closest('.show-replies');
+            const toggle = e.target.closest('.toggle-replies');
+            if (showReplies) {
+                e.preventDefault();
+                if (showReplies.dataset.loading) {
+                    return;
+                }
+                showReplies.dataset.loading = 'true';
+                const comment = showReplies.closest('.comment');
+                const cursor = showReplies.dataset.cursor;
+                fetch(showReplies.href + (cursor ? '?cursor=' + encodeURIComponent(cursor) : ''))
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) {
+                        const loaded = replies(comment);
+                        (loaded.length ? loaded[loaded.length - 1] : comment).insertAdjacentHTML('afterend', data.html);
+                        replies(comment).forEach(showToggle);
+                        if (data.next_cursor) {
+                            showReplies.dataset.cursor = data.next_cursor;
+                            showReplies.textContent = 'Show more replies';
+                        } else {
+                            const toggleButton = document.createElement('button');
+                            toggleButton.type = 'button';
+                            toggleButton.className = 'btn btn-sm btn-secondary toggle-replies';
+                            toggleButton.textContent = 'Hide replies';
+                            showReplies.replaceWith(toggleButton);
+                        }
+                    })
+                    .finally(function() {
+                        delete showReplies.dataset.loading;
+                    });
+            } else if (toggle) {
+                const comment = toggle.closest('.comment');
+                const hide = toggle.textContent === 'Hide replies';
+                replies(comment).forEach(function(reply) {
+                    reply.hidden = hide;
+                    // Expanding restores nested replies that were collapsed separately
+                    const nested = reply.querySelector('.toggle-replies');
+                    if (!hide && nested) {
+                        nested.textContent = 'Hide replies';
+                    }
+                });
+                toggle.textContent = hide ? 'Show replies' : 'Hide replies';
+            }
+        });
+
+        const moreComments = document.querySelector('.load-more-comments[data-cursor]');
+        if (moreComments) {
+            moreComments.addEventListener('click', function(e) {
+                e.preventDefault();
+                if (moreComments.dataset.loading) {
+                    return;
+                }
+                moreComments.dataset.loading = 'true';
+                fetch(commentThreads.dataset.moreUrl + '?cursor=' + encodeURIComponent(moreComments.dataset.cursor))
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) {
+                        commentThreads.insertAdjacentHTML('beforeend', data.html);
+                        commentThreads.querySelectorAll('.toggle-replies[hidden]').forEach(function(button) {
+                            button.hidden = false;
+                        });
+                        if (data.next_cursor) {
+                            moreComments.dataset.cursor = data.next_cursor;
+                            moreComments.href = '?comments=' + encodeURIComponent(data.next_cursor) + '#comments';
+                        } else {
+                            moreComments.remove();
+                        }
+                    })
+                    .finally(function() {
+                        delete moreComments.dataset.loading;
+                    });
+            });
+        }
+    }
+
     // Add loading state to buttons
     const buttons = document.querySelectorAll('.btn');
     buttons.forEach(function(button) {
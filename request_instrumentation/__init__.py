@@ -0,0 +1,282 @@
+"""
+Per-request database and timing instrumentation.
+
+``InstrumentationMiddleware`` records, for every request, the number of
+queries and the time spent in the database (through
+``connection.execute_wrapper`` on every configured alias), the time spent
+rendering templates and the total latency, keyed by URL name. Template
+time includes queries that lazy querysets run while rendering.
+
+A query whose SQL (with placeholders, so different parameters count as
+the same query) runs ``INSTRUMENTATION_DUPLICATE_THRESHOLD`` times or more
+in one request is flagged as a duplicate, the usual sign of an N+1
+pattern, together with the stack that issued its second execution.
+
+The last ``INSTRUMENTATION_BUFFER_SIZE`` requests are kept in an
+in-process ring buffer, summarized per URL name at the staff-only
+``instrumentation`` endpoint; running totals since the process started are
+exposed in the Prometheus text format at ``metrics``. Scrapers authenticate
+with ``Authorization: Bearer <INSTRUMENTATION_METRICS_TOKEN>``; without a
+token the endpoint is staff-only as well. Both are per process, so with
+several workers each one reports its own numbers. Set
+``INSTRUMENTATION_ENABLED = False`` to remove the middleware entirely.
+
+Every project in the repository installs ``InstrumentationMiddleware``
+first in ``MIDDLEWARE`` and includes ``request_instrumentation.urls`` in
+its root URLconf; each project's settings put the repository root on
+``sys.path`` so this package is importable.
+"""
+import logging
+import statistics
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.template.backends.django import Template
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+# URL names of the endpoints below, which are not recorded themselves
+EXCLUDED = {'instrumentation', 'metrics'}
+STACK_LIMIT = 12
+
+_current = ContextVar('instrumentation_request', default=None)
+
+
+def _buffer_size():
+    return getattr(settings, 'INSTRUMENTATION_BUFFER_SIZE', 1000)
+
+
+def _duplicate_threshold():
+    return getattr(settings, 'INSTRUMENTATION_DUPLICATE_THRESHOLD', 3)
+
+
+def _stack():
+    """The calling stack without Django, library and instrumentation frames"""
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if 'site-packages' not in frame.filename and frame.filename != __file__
+    ]
+    return traceback.format_list(frames[-STACK_LIMIT:])
+
+
+class RequestStats:
+    """Counters for one request; also the execute wrapper installed on each connection"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = 0
+        self.seen = Counter()
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.seen[sql] += 1
+            if self.seen[sql] == 2:
+                self.stacks[sql] = _stack()
+
+    def duplicates(self, threshold):
+        return [
+            {'sql': sql, 'count': count, 'stack': self.stacks.get(sql, [])}
+            for sql, count in self.seen.most_common()
+            if count >= threshold
+        ]
+
+
+class Recorder:
+    """Ring buffer of recent requests plus running totals per URL name"""
+
+    def __init__(self, size=None):
+        self._lock = threading.Lock()
+        self._size = size
+        self._recent = None
+        self._totals = defaultdict(Counter)
+
+    @property
+    def recent(self):
+        if self._recent is None:
+            self._recent = deque(maxlen=self._size or _buffer_size())
+        return self._recent
+
+    def add(self, record):
+        with self._lock:
+            self.recent.append(record)
+            totals = self._totals[record['url_name']]
+            totals['requests'] += 1
+            totals['queries'] += record['queries']
+            totals['duplicate_queries'] += sum(dup['count'] for dup in record['duplicates'])
+            totals['db_seconds'] += record['db_ms'] / 1000
+            totals['template_seconds'] += record['template_ms'] / 1000
+            totals['duration_seconds'] += record['total_ms'] / 1000
+            totals[f'status_{record["status"] // 100}xx'] += 1
+
+    def summary(self):
+        """Per URL name aggregates over the requests in the ring buffer"""
+        with self._lock:
+            records = list(self.recent)
+        groups = defaultdict(list)
+        for record in records:
+            groups[record['url_name']].append(record)
+        summary = {}
+        for name, group in sorted(groups.items()):
+            latencies = sorted(record['total_ms'] for record in group)
+            summary[name] = {
+                'requests': len(group),
+                'queries_mean': statistics.fmean(record['queries'] for record in group),
+                'queries_max': max(record['queries'] for record in group),
+                'db_ms_mean': statistics.fmean(record['db_ms'] for record in group),
+                'template_ms_mean': statistics.fmean(record['template_ms'] for record in group),
+                'total_ms_p50': latencies[len(latencies) // 2],
+                'total_ms_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'total_ms_max': latencies[-1],
+                'requests_with_duplicates': sum(1 for record in group if record['duplicates']),
+            }
+        return {
+            'buffer': {'size': self.recent.maxlen, 'used': len(records)},
+            'urls': summary,
+            'duplicates': [
+                {'url_name': record['url_name'], 'path': record['path'], **duplicate}
+                for record in records[-50:]
+                for duplicate in record['duplicates']
+            ],
+        }
+
+    def prometheus(self):
+        """Running totals in the Prometheus text exposition format"""
+        with self._lock:
+            totals = {name: dict(counts) for name, counts in self._totals.items()}
+        metrics = [
+            ('requests', 'counter', 'Requests handled'),
+            ('queries', 'counter', 'Database queries executed'),
+            ('duplicate_queries', 'counter', 'Queries repeated at least the duplicate threshold within a request'),
+            ('db_seconds', 'counter', 'Time spent executing database queries'),
+            ('template_seconds', 'counter', 'Time spent rendering templates'),
+            ('duration_seconds', 'counter', 'Total request latency'),
+        ]
+        lines = []
+        for key, kind, help_text in metrics:
+            name = f'django_http_{key}_total'
+            lines += [f'# HELP {name} {help_text}.', f'# TYPE {name} {kind}']
+            for url_name, counts in sorted(totals.items()):
+                lines.append(f'{name}{{url_name="{_escape(url_name)}"}} {counts.get(key, 0):g}')
+        name = 'django_http_responses_total'
+        lines += [f'# HELP {name} Responses by status class.', f'# TYPE {name} counter']
+        for url_name, counts in sorted(totals.items()):
+            for key, value in sorted(counts.items()):
+                if key.startswith('status_'):
+                    status = key[len('status_'):]
+                    lines.append(f'{name}{{url_name="{_escape(url_name)}",status="{status}"}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._recent = None
+            self._totals.clear()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+recorder = Recorder()
+
+
+_original_render = Template.render
+
+
+def _timed_render(self, context=None, request=None):
+    stats = _current.get()
+    if stats is None or stats.rendering:
+        # Not instrumented, or nested inside an outer render already timed
+        return _original_render(self, context, request)
+    stats.rendering += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        stats.template_time += time.perf_counter() - start
+        stats.rendering -= 1
+
+
+class InstrumentationMiddleware:
+    """Record query, template and latency figures for each request"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if Template.render is not _timed_render:
+            Template.render = _timed_render
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+                # Streaming bodies are produced after this returns and not timed
+                if hasattr(response, 'render') and not response.is_rendered:
+                    response.render()
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        url_name = (match.view_name if match else None) or 'unresolved'
+        if url_name.rsplit(':', 1)[-1] in EXCLUDED:
+            return response
+        duplicates = stats.duplicates(_duplicate_threshold())
+        for duplicate in duplicates:
+            logger.warning(
+                'Query repeated %d times in %s (%s): %s',
+                duplicate['count'], url_name, request.path, duplicate['sql'][:200],
+            )
+        recorder.add({
+            'url_name': url_name,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'db_ms': stats.db_time * 1000,
+            'template_ms': stats.template_time * 1000,
+            'total_ms': elapsed * 1000,
+            'duplicates': duplicates,
+            'time': time.time(),
+        })
+        return response
+
+
+@staff_member_required
+def instrumentation(request):
+    """Per URL name aggregates and recent duplicate queries (staff only)"""
+    return JsonResponse(recorder.summary())
+
+
+def metrics(request):
+    """Prometheus scrape endpoint"""
+    token = getattr(settings, 'INSTRUMENTATION_METRICS_TOKEN', None)
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    elif not (request.user.is_active and request.user.is_staff):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(recorder.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,12 @@
+"""
+The staff summary and Prometheus endpoints, for a project's root URLconf:
+``path('', include('request_instrumentation.urls'))``.
+"""
+from django.urls import path
+
+from . import instrumentation, metrics
+
+urlpatterns = [
+    path('_instrumentation/', instrumentation, name='instrumentation'),
+    path('metrics', metrics, name='metrics'),
+]